@@ -0,0 +1,81 @@
+'''Compare CGH.computeMany with sequential CGH.compute.
+
+Builds a sequence of trap states in which some of the traps move
+between states, computes their holograms one at a time with
+``compute`` and all together with ``computeMany``, and reports the
+time taken by each and the largest difference between their
+holograms.
+
+Usage::
+
+    python -m QHOT.benchmarks.computemany -s 1152 1920 -t 32 -k 200 -m 1
+'''
+import argparse
+from time import perf_counter
+
+import numpy as np
+
+from QHOT.lib.holograms.CGH import CGH
+from QHOT.lib.traps.TrapSnapshot import TrapSnapshot
+from QHOT.traps.QTweezer import QTweezer
+
+
+def states(nstates: int, ntraps: int, moving: int,
+           seed: int = 0) -> list[TrapSnapshot]:
+    '''Return snapshots of ``ntraps`` traps, ``moving`` of which move.'''
+    rng = np.random.default_rng(seed)
+
+    def position():
+        return (*rng.uniform(-300, 300, 2), rng.uniform(-20, 20))
+
+    traps = [QTweezer(r=position(), phase=rng.uniform(0, 2 * np.pi))
+             for _ in range(ntraps)]
+    snapshots = []
+    for _ in range(nstates):
+        for trap in traps[:moving]:
+            trap.r = position()
+        snapshots.append(TrapSnapshot.of(traps))
+    return snapshots
+
+
+def benchmark(shape: tuple[int, int], nstates: int, ntraps: int,
+              moving: int) -> tuple[float, float, int]:
+    '''Return the sequential and batched times and the largest difference.
+
+    Each run starts from a new ``CGH``, so that neither benefits from
+    the geometry or ramps cached by the other.
+    '''
+    snapshots = states(nstates, ntraps, moving)
+    cgh = CGH(shape=shape)
+    start = perf_counter()
+    sequential = np.array([cgh.compute(s).copy() for s in snapshots])
+    tsequential = perf_counter() - start
+    cgh = CGH(shape=shape)
+    start = perf_counter()
+    batched = cgh.computeMany(snapshots)
+    tbatched = perf_counter() - start
+    diff = np.abs(batched.astype(np.int16) - sequential.astype(np.int16))
+    return tsequential, tbatched, int(np.minimum(diff, 256 - diff).max())
+
+
+def main() -> None:  # pragma: no cover
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-s', '--shape', type=int, nargs=2,
+                        default=(1152, 1920), metavar=('HEIGHT', 'WIDTH'))
+    parser.add_argument('-t', '--states', type=int, default=32)
+    parser.add_argument('-k', '--traps', type=int, default=200)
+    parser.add_argument('-m', '--moving', type=int, nargs='+',
+                        default=(1, 10, 200))
+    args = parser.parse_args()
+    for moving in args.moving:
+        tsequential, tbatched, diff = benchmark(
+            tuple(args.shape), args.states, args.traps, moving)
+        print(f'{args.shape[0]}x{args.shape[1]} T={args.states} '
+              f'K={args.traps} moving={moving}: '
+              f'compute {tsequential:.3f} s  '
+              f'computeMany {tbatched:.3f} s  '
+              f'max diff {diff}')
+
+
+if __name__ == '__main__':  # pragma: no cover
+    main()
@@ -45,10 +45,27 @@ class QSaveFile(QtCore.QObject):
         classname = type(self.parent()).__name__.lower()
         self.classname = classname
         self.datadir = Path.home() / 'data'
-        self.configdir = Path.home() / f'.{classname}'
+        self.configdir = self.configDir(classname)
         self.datadir.mkdir(parents=True, exist_ok=True)
         self.configdir.mkdir(parents=True, exist_ok=True)
 
+    @staticmethod
+    def configDir(classname: str) -> Path:
+        '''Return the configuration directory of an application class.
+
+        Parameters
+        ----------
+        classname : str
+            Name of the application main-window class, such as
+            ``'QHOT'``.
+
+        Returns
+        -------
+        Path
+            ``~/.{classname}``, with ``classname`` in lower case.
+        '''
+        return Path.home() / f'.{classname.lower()}'
+
     @staticmethod
     def timestamp() -> str:
         '''Return the current date and time as a compact string.'''
@@ -50,6 +50,14 @@ _CGH_BACKENDS: dict[str, _CGHEntry] = {
     'cupy':  _CGHEntry('-u', 'QHOT.lib.holograms.cupyCGH', 'cupyCGH',
                        'CuPy',
                        'CuPy CUDA backend (NVIDIA only)'),
+    'threaded': _CGHEntry('-j', 'QHOT.lib.holograms.ThreadedCGH',
+                          'ThreadedCGH', 'multi-threaded CPU',
+                          'multi-threaded CPU backend '
+                          '(one thread per core)'),
+    'numba': _CGHEntry('-n', 'QHOT.lib.holograms.NumbaCGH', 'NumbaCGH',
+                       'Numba',
+                       'Numba-compiled CPU backend '
+                       '(fused per-pixel kernel)'),
 }
 
 _AUTO_DETECT_ORDER = ('torch', 'cupy')
@@ -58,10 +66,15 @@ _AUTO_DETECT_ORDER = ('torch', 'cupy')
 def cgh_parser(parser: ArgumentParser | None = None) -> ArgumentParser:
     '''Return a parser extended with a titled CGH backend option group.
 
-    Adds ``-t`` (TorchCGH) and ``-u`` (cupyCGH) as a mutually
-    exclusive group under a ``CGH backend`` section heading.  If
-    either flag is already registered on ``parser``, the group is
-    left unchanged.
+    Adds ``-t`` (TorchCGH), ``-u`` (cupyCGH), ``-j`` (ThreadedCGH) and
+    ``-n`` (NumbaCGH) as a mutually exclusive group under a ``CGH
+    backend`` section heading, together with ``--cache-budget`` to
+    limit the memory used by the CGH field caches,
+    ``--geometry-cache`` to store geometry tables on disk,
+    ``--hologram-cache`` to store computed holograms on disk and
+    ``--cgh-rate`` to set the hologram computation rate.  If the first
+    backend flag is already registered on ``parser``, the group is left
+    unchanged.
 
     Parameters
     ----------
@@ -75,9 +88,15 @@ def cgh_parser(parser: ArgumentParser | None = None) -> ArgumentParser:
 
             -t  PyTorch (MPS / CUDA / ROCm / CPU auto-select)
             -u  CuPy CUDA (NVIDIA only)
-
-        When neither flag is given, ``choose_cgh`` probes the same
-        order automatically.
+            -j  multi-threaded CPU
+            -n  Numba-compiled CPU
+            --cache-budget MB  memory budget of the CGH caches
+            --geometry-cache   reuse geometry tables stored on disk
+            --hologram-cache   reuse holograms stored on disk
+            --cgh-rate HZ      maximum holograms computed per second
+
+        When no flag is given, ``choose_cgh`` probes the GPU backends
+        automatically.
     '''
     parser = parser or ArgumentParser()
     first_flag = next(iter(_CGH_BACKENDS.values())).flag
@@ -87,6 +106,22 @@ def cgh_parser(parser: ArgumentParser | None = None) -> ArgumentParser:
         for dest, entry in _CGH_BACKENDS.items():
             mutex.add_argument(entry.flag, dest=dest, help=entry.help,
                                action='store_true')
+        group.add_argument('--cache-budget', dest='cachebudget',
+                           type=float, metavar='MB',
+                           help='memory budget of the CGH field and '
+                                'structure caches (0: unlimited)')
+        group.add_argument('--geometry-cache', dest='geometrycache',
+                           action='store_true',
+                           help='store CGH geometry tables on disk and '
+                                'reuse them in later sessions')
+        group.add_argument('--hologram-cache', dest='hologramcache',
+                           action='store_true',
+                           help='store computed holograms on disk and '
+                                'reuse them in later sessions')
+        group.add_argument('--cgh-rate', dest='cghrate',
+                           type=float, metavar='HZ',
+                           help='maximum number of holograms computed '
+                                'per second (default: 30)')
     return parser
 
 
@@ -112,7 +147,7 @@ def build_parser(description: str = 'QHOT holographic optical trapping'
             camera backend:
                 -b  Basler  -c  OpenCV  -f  Flir ...
             CGH backend:
-                -t  PyTorch  -u  CuPy
+                -t  PyTorch  -u  CuPy  -j  multi-threaded CPU  -n  Numba
     '''
     from QVideo.lib.chooser import _CAMERAS
     parser = ArgumentParser(description=description)
@@ -140,7 +175,8 @@ def choose_cgh(parser: ArgumentParser | None = None,
 
     When no flag is given the function probes backends in priority
     order (TorchCGH → cupyCGH → CGH) and returns the first that
-    succeeds.
+    succeeds.  The CPU backends ``ThreadedCGH`` and ``NumbaCGH`` are
+    used only when requested with ``-j`` or ``-n``.
 
     Parameters
     ----------
@@ -151,7 +187,9 @@ def choose_cgh(parser: ArgumentParser | None = None,
         are parsed in one pass.
     **kwargs
         Forwarded verbatim to the CGH constructor (e.g.
-        ``shape=(512, 512)``).
+        ``shape=(512, 512)``).  A ``--cache-budget`` value given on
+        the command line is forwarded as ``cachebudget`` unless that
+        keyword is supplied explicitly.
 
     Returns
     -------
@@ -159,6 +197,8 @@ def choose_cgh(parser: ArgumentParser | None = None,
         An initialised CGH instance on the best available backend.
     '''
     args, _ = cgh_parser(parser).parse_known_args()
+    if getattr(args, 'cachebudget', None) is not None:
+        kwargs.setdefault('cachebudget', args.cachebudget)
 
     # Explicit selection: try the requested backend, warn on failure.
     for dest, entry in _CGH_BACKENDS.items():
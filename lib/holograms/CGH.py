@@ -2,18 +2,88 @@ from __future__ import annotations
 
 import logging
 import weakref
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import contextmanager
 from functools import partial
+from pathlib import Path
+from time import perf_counter
+from typing import NamedTuple
 
 import numpy as np
+import numpy.typing as npt
 from pyqtgraph.Qt import QtCore, QtGui
+from scipy.linalg.blas import get_blas_funcs
+from scipy.special import jv
 
 from QHOT.lib.types import Field, Hologram, Shape
-from QHOT.lib.traps import QTrap, QTrapGroup
+from QHOT.lib.traps import QTrap, QTrapGroup, TrapSnapshot
+from .FieldCache import CacheBudget, FieldCache, SharedFieldCache, nbytes
+from .GeometryCache import GeometryCache
+from .HologramCache import HologramCache
+from .RampCache import RampCache
 
 
 logger = logging.getLogger(__name__)
 
 
+def _power(base: Field, n: int) -> Field:
+    '''Return ``base**n`` for an integer ``n >= 1`` by repeated squaring.
+
+    Uses only multiplication, so ``base`` may be a NumPy array or a
+    tensor.  The result is ``base`` itself when ``n == 1``.
+    '''
+    power = None
+    while True:
+        if n & 1:
+            power = base if power is None else power * base
+        n >>= 1
+        if not n:
+            return power
+        base = base * base
+
+
+class Rank1(NamedTuple):
+
+    '''Factorized field ``coefficient * outer(ey, ex)``.
+
+    The displacement field of every trap and group is the outer product
+    of a row and a column phase-ramp vector, so it is cached in this
+    form and materialized as a full frame only when needed.  Storage
+    scales as ``height + width`` rather than ``height * width``.
+
+    The vectors may be NumPy arrays or on-device tensors; ``full``
+    uses only broadcasting, which both support.
+
+    Attributes
+    ----------
+    ey : Field
+        Phase-ramp vector along the SLM rows, shape ``(height,)``.
+    ex : Field
+        Phase-ramp vector along the SLM columns, shape ``(width,)``.
+    coefficient : complex
+        Complex amplitude of the field.
+    '''
+
+    ey: Field
+    ex: Field
+    coefficient: complex
+
+    def full(self, rows: slice = slice(None)) -> Field:
+        '''Materialize the field, or a band of its rows, as an array.'''
+        return (self.coefficient * self.ey[rows])[:, None] * self.ex[None, :]
+
+
+class ComputeCancelled(BaseException):
+
+    '''Raised inside ``CGH.compute`` when ``CGH.cancelled`` returns True.
+
+    Like ``asyncio.CancelledError``, it derives from ``BaseException``
+    so that handlers for ordinary errors neither log nor swallow it.
+    A cancelled computation leaves every cache consistent and emits
+    nothing.
+    '''
+
+
 class CGH(QtCore.QObject):
 
     '''Base class for computing computer-generated holograms.
@@ -44,6 +114,35 @@ class CGH(QtCore.QObject):
         NumPy dtype used for complex field arrays. Defaults to
         ``np.complex128``. Subclasses (e.g. GPU-accelerated variants)
         may override this to use an alternative complex type.
+    batched : bool
+        If ``True`` (default), ``compute`` superposes the fields of all
+        plain tweezers with a single matrix product instead of adding
+        them one at a time.  Groups and structured traps are always
+        accumulated individually.
+    incremental : bool
+        If ``True`` (default), ``compute`` maintains a running sum of
+        the trap fields.  Each snapshot is compared with the one from
+        which the sum was built (``TrapSnapshot.changedSince``), and
+        items that changed have their stale contributions subtracted
+        and their fresh ones added; unchanged items cost nothing.
+        The sum is rebuilt from scratch when more than half of the
+        items changed and every ``rebuild_interval`` updates, which
+        bounds the accumulation of single-precision round-off.
+    rebuild_interval : int
+        Maximum number of incremental updates between full rebuilds
+        of the running sum.  Default: 100.
+    stack_size : int
+        Number of holograms that ``computeMany`` computes together.
+        Default: 16.
+    strip_rows : int
+        Height of the row strips in which ``computeMany`` sweeps its
+        stacks.  Default: 128.
+    cancelled : Callable[[], bool] or None
+        Polled before the contribution of each trap or group is
+        computed.  If it returns True, ``compute`` abandons the
+        hologram by raising ``ComputeCancelled``.  Set by
+        ``QCGHScheduler`` while a compute can be superseded by a
+        newer trap state.  Default: ``None``.
     phase : np.ndarray
         Quantized phase hologram from the most recent ``compute()`` call.
         Undefined before the first call to ``compute()``.
@@ -73,6 +172,44 @@ class CGH(QtCore.QObject):
         Coordinates of the optical axis in the camera plane [pixels].
     thetac : float
         Rotation of the camera relative to the SLM [degrees].
+    cachebudget : float
+        Memory budget shared by the field and structure caches [MB].
+        Least-recently-used entries are evicted when the budget is
+        exceeded; ``0`` means unlimited.  Arrays held by the running
+        sum of the current hologram stay alive until their trap is
+        next updated, even if their cache entries are evicted.
+    geometrycache : GeometryCache or None
+        Optional persistent store of the full-frame geometry tables.
+        When set, ``theta``, ``qr`` and ``exp(i theta)`` are loaded as
+        memory maps from files keyed by a hash of the geometry
+        settings, and computed only if no stored table matches.
+        Default: ``None``.
+    hologramcache : HologramCache or None
+        Optional cache of finished holograms.  When set, ``compute``
+        looks up the canonical digest of the scene and the current
+        calibration, and returns a stored hologram without computing
+        it.  Scenes with structured traps that lack ``structureFrom``
+        are not cached.  Default: ``None``.
+    ramp_step : float
+        Quantization of the SLM-plane coordinates under which phase-ramp
+        vectors are cached [pixels].  Coordinates are rounded to
+        multiples of ``ramp_step`` before their vectors are computed,
+        so that nearby positions share vectors.  ``0`` (the default)
+        keys vectors by their exact single-precision coordinates.
+    ramp_cache_size : int
+        Maximum number of phase-ramp vectors kept for reuse by traps
+        that return to visited coordinates.  ``0`` disables the
+        cache.  Default: 4096.
+    bessel_step : float
+        Sampling interval of the radial table from which ``bessel``
+        interpolates.  Default: 0.01.
+    geometry_version : int
+        Counter incremented by every ``updateGeometry``.  Part of the
+        key under which structure fields are shared.
+    statistics : dict[str, dict]
+        Hit, miss and eviction counters and sizes of the caches, the
+        hit rate of ``hologramcache``, and the duration of each stage
+        of the most recent ``compute``.
 
     Signals
     -------
@@ -94,15 +231,29 @@ class CGH(QtCore.QObject):
     recalculate = QtCore.pyqtSignal()
 
     dtype = np.complex64
+    batched = True
+    incremental = True
+    rebuild_interval = 100
+    stack_size = 16
+    strip_rows = 128
+    cancelled: Callable[[], bool] | None = None
+    bessel_step = 0.01
+    ramp_step = 0.
+    geometrycache: GeometryCache | None = None
+    hologramcache: HologramCache | None = None
 
     _fields = ('shape', 'wavelength', 'n_m', 'magnification', 'focallength',
                'camerapitch', 'slmpitch', 'scale', 'splay',
-               'xs', 'ys', 'phis', 'xc', 'yc', 'zc', 'thetac')
+               'xs', 'ys', 'phis', 'xc', 'yc', 'zc', 'thetac',
+               'cachebudget')
 
     _matrix_attrs = frozenset({'xc', 'yc', 'zc', 'thetac'})
-    _geometry_attrs = frozenset(_fields) - _matrix_attrs
+    _cache_attrs = frozenset({'cachebudget'})
+    _geometry_attrs = frozenset(_fields) - _matrix_attrs - _cache_attrs
     assert _matrix_attrs <= frozenset(_fields), \
         '_matrix_attrs contains entries not in _fields'
+    assert _cache_attrs <= frozenset(_fields), \
+        '_cache_attrs contains entries not in _fields'
 
     def __init__(self, *,
                  shape: Shape = (512, 512),
@@ -121,6 +272,7 @@ class CGH(QtCore.QObject):
                  yc: float = 240.,
                  zc: float = 0.,
                  thetac: float = 0.,
+                 cachebudget: float = 1024.,
                  parent: QtCore.QObject | None = None) -> None:
         '''Initialize the CGH pipeline.
 
@@ -152,6 +304,9 @@ class CGH(QtCore.QObject):
             Coordinates of the optical axis in the camera plane [pixels].
         thetac : float
             Rotation of the camera relative to the SLM [degrees].
+        cachebudget : float
+            Memory budget of the field and structure caches [MB].
+            ``0`` means unlimited.  Default: 1024.
         parent : QtCore.QObject or None
             Qt parent object.
         '''
@@ -159,12 +314,30 @@ class CGH(QtCore.QObject):
         # Use object.__setattr__ to set all attributes without triggering
         # __setattr__ dispatch before initialization is complete.
         object.__setattr__(self, 'matrix', QtGui.QMatrix4x4())
-        object.__setattr__(self, '_field_cache',
-                           weakref.WeakKeyDictionary())
+        object.__setattr__(self, '_budget', CacheBudget())
+        object.__setattr__(self, '_field_cache', FieldCache(self._budget))
+        object.__setattr__(self, '_shared_structures',
+                           SharedFieldCache(self._budget))
         object.__setattr__(self, '_structure_cache',
-                           weakref.WeakKeyDictionary())
+                           FieldCache(self._budget,
+                                      sizeof=self._structureSize,
+                                      release=self._shared_structures.release))
+        object.__setattr__(self, '_ramp_cache', RampCache())
+        object.__setattr__(self, 'geometry_version', 0)
+        object.__setattr__(self, '_tables', {})
+        object.__setattr__(self, '_tables_version', None)
+        object.__setattr__(self, '_pending', None)
         object.__setattr__(self, '_connected_traps',
                            weakref.WeakSet())
+        object.__setattr__(self, '_snapshot', None)
+        object.__setattr__(self, '_field_sources',
+                           weakref.WeakKeyDictionary())
+        object.__setattr__(self, '_structure_sources',
+                           weakref.WeakKeyDictionary())
+        object.__setattr__(self, '_contributions', None)
+        object.__setattr__(self, '_summed', None)
+        object.__setattr__(self, '_updates', 0)
+        object.__setattr__(self, '_timing', {})
         for attr, val in (('shape', shape),
                           ('wavelength', wavelength),
                           ('n_m', n_m),
@@ -180,28 +353,48 @@ class CGH(QtCore.QObject):
                           ('xc', xc),
                           ('yc', yc),
                           ('zc', zc),
-                          ('thetac', thetac)):
+                          ('thetac', thetac),
+                          ('cachebudget', cachebudget)):
             object.__setattr__(self, attr, val)
+        self.updateCacheBudget()
         self.blockSignals(True)
         self.updateTransformationMatrix()
         self.updateGeometry()
         self.blockSignals(False)
 
     def __setattr__(self, key: str, value: object) -> None:
-        if key in self._matrix_attrs or key in self._geometry_attrs:
+        if key in self._fields:
             if getattr(self, key, None) == value:
                 return
         super().__setattr__(key, value)
-        if key in self._matrix_attrs:
+        if key not in self._fields:
+            return
+        if self._pending is not None:
+            self._pending.add(key)
+        elif key in self._matrix_attrs:
             self.updateTransformationMatrix()
         elif key in self._geometry_attrs:
             self.updateGeometry()
+        elif key in self._cache_attrs:
+            self.updateCacheBudget()
+
+    def updateCacheBudget(self) -> None:
+        '''Apply ``cachebudget`` to the field and structure caches.
+
+        Evicts least-recently-used entries immediately if the caches
+        exceed the new budget.  Does not emit ``recalculate``, because
+        the budget does not affect the hologram.
+        '''
+        self._budget.limit = int(float(self.cachebudget) * 2**20)
 
     def updateTransformationMatrix(self) -> None:
         '''Rebuild the camera-to-SLM transformation matrix.
 
         Accounts for the position (xc, yc, zc) and orientation (thetac)
-        of the camera relative to the SLM. Clears only the field cache
+        of the camera relative to the SLM.  The rigid transformation is
+        stored both as the ``QMatrix4x4`` ``matrix`` and as float64
+        NumPy matrices for ``transformPoints`` and its exact inverse,
+        ``inverseTransformPoints``.  Clears only the field cache
         (structure arrays are independent of the transformation) and
         emits ``recalculate``.
         '''
@@ -209,29 +402,42 @@ class CGH(QtCore.QObject):
         self.matrix.setToIdentity()
         self.matrix.rotate(self.thetac, 0., 0., 1.)
         self.matrix.translate(-self.rc)
+        c, s = np.cos(np.radians(self.thetac)), np.sin(np.radians(self.thetac))
+        rotation = np.array([[c, -s, 0.], [s, c, 0.], [0., 0., 1.]])
+        rc = np.array([self.xc, self.yc, self.zc], dtype=float)
+        self._matrix = np.identity(4)
+        self._matrix[:3, :3] = rotation
+        self._matrix[:3, 3] = -rotation @ rc
+        self._inverse = np.identity(4)
+        self._inverse[:3, :3] = rotation.T
+        self._inverse[:3, 3] = rc
         self._field_cache.clear()
+        self._contributions = None
         self.recalculate.emit()
 
     def updateGeometry(self) -> None:
         '''Recompute position-dependent phase factors in the SLM plane.
 
-        Rebuilds ``iqx``, ``iqy``, ``iqxz``, ``iqyz``, ``theta``, and
-        ``qr`` from the current calibration parameters. Also resets the
-        accumulation ``field`` buffer, clears the field cache, and emits
-        ``recalculate``.
+        Rebuilds ``iqx``, ``iqy``, ``iqxz`` and ``iqyz`` from the
+        current calibration parameters and increments
+        ``geometry_version``, which invalidates the full-frame tables
+        ``theta``, ``qr`` and ``exp(i theta)``.  These are rebuilt
+        only when a structured trap next asks for them.  Also resets
+        the accumulation ``field`` buffer and the hologram output
+        buffers, clears the field cache, and emits ``recalculate``.
         '''
         logger.debug('updating geometry')
         self.field = np.zeros(self.shape, dtype=self.dtype)
+        self._holograms = [np.zeros(self.shape, dtype=np.uint8)
+                           for _ in range(2)]
         alpha = np.cos(np.radians(self.phis))
-        x = alpha*(np.arange(self.width) - self.xs)
-        y = np.arange(self.height) - self.ys
-        self.iqx = (1j * self.qprp * x).astype(self.dtype)
-        self.iqy = (-1j * self.qprp * y).astype(self.dtype)
-        self.iqxz = (1j * self.qpar * x * x).astype(self.dtype)
-        self.iqyz = (1j * self.qpar * y * y).astype(self.dtype)
-        self.theta = np.arctan2.outer(y, x).astype(np.float32)
-        self.qr = np.hypot.outer(
-            self.qprp * y, self.qprp * x).astype(np.float32)
+        self._x = alpha*(np.arange(self.width) - self.xs)
+        self._y = np.arange(self.height) - self.ys
+        self.iqx = (1j * self.qprp * self._x).astype(self.dtype)
+        self.iqy = (-1j * self.qprp * self._y).astype(self.dtype)
+        self.iqxz = (1j * self.qpar * self._x**2).astype(self.dtype)
+        self.iqyz = (1j * self.qpar * self._y**2).astype(self.dtype)
+        self.geometry_version += 1
         self._clearCache()
         self.recalculate.emit()
 
@@ -239,10 +445,14 @@ class CGH(QtCore.QObject):
         '''Discard all cached per-trap and per-group fields and structures.
 
         Called automatically when CGH geometry is updated. All entries
-        will be recomputed on the next call to ``fieldOf`` or ``compute``.
+        will be recomputed on the next call to ``fieldOf`` or ``compute``,
+        and the running sum is rebuilt from scratch.
         '''
         self._field_cache.clear()
         self._structure_cache.clear()
+        self._shared_structures.clear()
+        self._ramp_cache.clear()
+        self._contributions = None
 
     def _invalidateField(self, trap_ref: weakref.ref) -> None:
         '''Discard the cached displacement field for one trap or group.
@@ -250,7 +460,9 @@ class CGH(QtCore.QObject):
         Connected to ``trap.changed`` so that position, amplitude, or
         phase changes are reflected in the next computation.  If the
         trap belongs to a group, the group's structure cache is also
-        invalidated up the full ancestor chain.
+        invalidated up the full ancestor chain.  The running sum of
+        ``incremental`` mode does not depend on this callback: its
+        stale contributions are found by comparing snapshots.
 
         Parameters
         ----------
@@ -266,6 +478,35 @@ class CGH(QtCore.QObject):
         if isinstance(parent, QTrapGroup):
             self._invalidateStructureChain(parent)
 
+    def _invalidateFields(self, group_ref: weakref.ref,
+                          traps: list[QTrap]) -> None:
+        '''Discard the cached displacement fields of many traps at once.
+
+        Connected to ``group.descendantsChanged``, which reports every
+        descendant of a group after a rotation.  Each trap's field is
+        dropped, and the structure caches of their parents and the
+        ancestors above them are cleared once, not once per trap.
+
+        Parameters
+        ----------
+        group_ref : weakref.ref
+            Weak reference to the group that emitted the changeset.
+        traps : list[QTrap]
+            Descendants whose fields should be removed.
+        '''
+        if group_ref() is None:
+            return
+        parents = set()
+        for trap in traps:
+            self._field_cache.pop(trap, None)
+            parent = trap.parent()
+            if isinstance(parent, QTrapGroup):
+                parents.add(parent)
+        for group in parents:
+            self._structure_cache.pop(group, None)
+        for group in parents:
+            self._invalidateStructureChain(group.parent())
+
     def _invalidateStructure(self, trap_ref: weakref.ref) -> None:
         '''Discard the cached structure field for one trap.
 
@@ -325,9 +566,9 @@ class CGH(QtCore.QObject):
     def settings(self, settings: dict[str, object]) -> None:
         '''Apply calibration settings from a dictionary.
 
-        Updates all recognized attributes first, then calls
-        ``updateTransformationMatrix`` and/or ``updateGeometry`` once
-        each as needed, rather than once per attribute.
+        The settings are applied in one ``batch``, so that
+        ``updateTransformationMatrix`` and ``updateGeometry`` run at
+        most once each and ``recalculate`` is emitted once.
 
         Parameters
         ----------
@@ -335,22 +576,149 @@ class CGH(QtCore.QObject):
             Mapping of attribute name to value. Unknown keys are ignored
             with a warning.
         '''
-        needs_geometry = False
-        needs_matrix = False
-        for key, value in settings.items():
-            if key in self._fields:
-                if getattr(self, key, None) != value:
-                    object.__setattr__(self, key, value)
-                    if key in self._geometry_attrs:
-                        needs_geometry = True
-                    elif key in self._matrix_attrs:
-                        needs_matrix = True
-            else:
-                logger.warning(f'Unsupported property: {key}')
-        if needs_matrix:
-            self.updateTransformationMatrix()
-        if needs_geometry:
-            self.updateGeometry()
+        with self.batch():
+            for key, value in settings.items():
+                if key in self._fields:
+                    setattr(self, key, value)
+                else:
+                    logger.warning(f'Unsupported property: {key}')
+
+    @contextmanager
+    def batch(self) -> Iterator[CGH]:
+        '''Apply a group of calibration changes as one transaction.
+
+        Calibration attributes assigned inside the ``with`` block take
+        their new values immediately, but the updates they require are
+        deferred until the outermost block exits.  Then
+        ``updateCacheBudget``, ``updateTransformationMatrix`` and
+        ``updateGeometry`` each run at most once, and ``recalculate``
+        is emitted once if the hologram is affected.  If the block
+        raises, every calibration attribute is restored to its value
+        on entry and no update is performed.
+
+        Yields
+        ------
+        CGH
+            This instance.
+
+        Examples
+        --------
+        >>> with cgh.batch():
+        ...     cgh.xs = 320.
+        ...     cgh.ys = 240.
+        ...     cgh.thetac = 5.
+        '''
+        if self._pending is not None:
+            yield self
+            return
+        snapshot = self.settings
+        self._pending = set()
+        try:
+            yield self
+        except BaseException:
+            self._pending = None
+            for key, value in snapshot.items():
+                object.__setattr__(self, key, value)
+            raise
+        changed, self._pending = self._pending, None
+        self._applyChanges(changed)
+
+    def _applyChanges(self, changed: set[str]) -> None:
+        '''Run the updates required by changes to calibration fields.
+
+        Parameters
+        ----------
+        changed : set[str]
+            Names of the calibration attributes that were changed.
+        '''
+        if changed & self._cache_attrs:
+            self.updateCacheBudget()
+        matrix = bool(changed & self._matrix_attrs)
+        geometry = bool(changed & self._geometry_attrs)
+        if not (matrix or geometry):
+            return
+        blocked = self.blockSignals(True)
+        try:
+            if matrix:
+                self.updateTransformationMatrix()
+            if geometry:
+                self.updateGeometry()
+        finally:
+            self.blockSignals(blocked)
+        self.recalculate.emit()
+
+    @property
+    def statistics(self) -> dict[str, dict]:
+        '''Usage counters and sizes of the field and structure caches.
+
+        Returns
+        -------
+        dict[str, dict]
+            ``field_cache``, ``structure_cache`` and
+            ``shared_structures`` entries, each as returned by the
+            cache's ``stats``, ``ramp_cache`` with the usage of the
+            phase-ramp vector cache, ``budget`` with the
+            total cache size and the limit [bytes], and ``timing``
+            with the duration of each stage of the most recent
+            ``compute`` [s], e.g. ``accumulate`` and ``quantize``.
+            If ``hologramcache`` is set, ``hologram_cache`` holds its
+            ``stats``, including the ``hitrate``.
+        '''
+        statistics = dict(field_cache=self._field_cache.stats,
+                          structure_cache=self._structure_cache.stats,
+                          shared_structures=self._shared_structures.stats,
+                          ramp_cache=self._ramp_cache.stats,
+                          budget=dict(nbytes=self._budget.nbytes,
+                                      limit=self._budget.limit),
+                          timing=dict(self._timing))
+        if self.hologramcache is not None:
+            statistics['hologram_cache'] = self.hologramcache.stats
+        return statistics
+
+    @property
+    def calibration(self) -> dict[str, object]:
+        '''Settings that determine the hologram of a given scene.
+
+        Returns
+        -------
+        dict[str, object]
+            ``settings`` without ``cachebudget``, together with the
+            backend class, its ``dtype`` and ``bessel_step``.  Part of
+            the key under which ``hologramcache`` stores holograms.
+            ``ramp_step`` is included, because it rounds the positions
+            of the traps.
+        '''
+        calibration = {name: getattr(self, name) for name in self._fields
+                       if name not in self._cache_attrs}
+        calibration.update(backend=type(self).__name__,
+                           dtype=str(self.dtype),
+                           bessel_step=self.bessel_step,
+                           ramp_step=self.ramp_step)
+        return calibration
+
+    @contextmanager
+    def _timed(self, stage: str):
+        '''Record the duration of a stage of ``compute`` in ``statistics``.
+
+        Parameters
+        ----------
+        stage : str
+            Name of the stage.
+        '''
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self._timing[stage] = perf_counter() - start
+
+    @property
+    def ramp_cache_size(self) -> int:
+        '''Maximum number of cached phase-ramp vectors.'''
+        return self._ramp_cache.size
+
+    @ramp_cache_size.setter
+    def ramp_cache_size(self, size: int) -> None:
+        self._ramp_cache.size = size
 
     @property
     def height(self) -> int:
@@ -409,6 +777,111 @@ class CGH(QtCore.QObject):
         sfactor = self.slmpitch/self.scale             # [um/phixel]
         return self.qprp * sfactor / (2.*self.focallength)
 
+    # Geometry tables
+
+    def _geometryTables(self) -> dict[str, Field]:
+        '''Return the table cache, emptied if the geometry has changed.'''
+        if self._tables_version != self.geometry_version:
+            self._tables = {}
+            self._tables_version = self.geometry_version
+        return self._tables
+
+    def _table(self, name: str, build: Callable[[], Field]) -> Field:
+        '''Return a full-frame geometry table, building it if necessary.
+
+        Tables are cached until ``geometry_version`` changes.
+
+        Parameters
+        ----------
+        name : str
+            Name of the table.
+        build : Callable[[], Field]
+            Computes the table for the current geometry.
+        '''
+        tables = self._geometryTables()
+        table = tables.get(name)
+        if table is None:
+            logger.debug(f'building {name} table')
+            table = tables[name] = build()
+        return table
+
+    @property
+    def theta(self) -> Field:
+        '''Azimuthal angle of each SLM pixel about the optical axis.
+
+        Built on first use after each geometry change.
+
+        Returns
+        -------
+        Field
+            float32 array of shape ``self.shape`` [radians].
+        '''
+        return self._table('theta', self._buildTheta)
+
+    @theta.setter
+    def theta(self, theta: Field) -> None:
+        self._geometryTables()['theta'] = theta
+
+    @property
+    def qr(self) -> Field:
+        '''Radial wavenumber of each SLM pixel.
+
+        Built on first use after each geometry change.
+
+        Returns
+        -------
+        Field
+            float32 array of shape ``self.shape`` [radians/pixel].
+        '''
+        return self._table('qr', self._buildQr)
+
+    @qr.setter
+    def qr(self, qr: Field) -> None:
+        self._geometryTables()['qr'] = qr
+
+    @property
+    def _phasor(self) -> Field:
+        '''Unit phasor ``exp(i theta)`` from which ``helical`` is built.'''
+        return self._table('phasor', self._buildPhasor)
+
+    @property
+    def _qrmax(self) -> float:
+        '''Largest value of ``qr``, computed without building ``qr``.'''
+        return float(self.qprp * np.hypot(np.abs(self._y).max(),
+                                          np.abs(self._x).max()))
+
+    def _stored(self, name: str, build: Callable[[], Field]) -> Field:
+        '''Return a table from ``geometrycache``, or build it.
+
+        Parameters
+        ----------
+        name : str
+            Name of the table.
+        build : Callable[[], Field]
+            Computes the table for the current geometry.
+        '''
+        if self.geometrycache is None:
+            return build()
+        settings = {attr: getattr(self, attr)
+                    for attr in self._geometry_attrs}
+        settings['dtype'] = np.dtype(self.dtype).str
+        key = self.geometrycache.key(settings)
+        return self.geometrycache.fetch(key, name, build)
+
+    def _buildTheta(self) -> Field:
+        return self._stored('theta', lambda: np.arctan2.outer(
+            self._y, self._x).astype(np.float32))
+
+    def _buildQr(self) -> Field:
+        return self._stored('qr', lambda: np.hypot.outer(
+            self.qprp * self._y, self.qprp * self._x).astype(np.float32))
+
+    def _buildPhasor(self) -> Field:
+        def build() -> Field:
+            theta = np.arctan2.outer(self._y, self._x)
+            return np.exp(1j * theta).astype(self.dtype)
+        return self._stored('phasor', build)
+
     # Slots for threaded operation
 
     @QtCore.pyqtSlot()
@@ -436,20 +909,177 @@ class CGH(QtCore.QObject):
     # Methods for computing holograms
 
     @staticmethod
-    def quantize(field: Field) -> Hologram:
+    def quantize(field: Field, out: Hologram | None = None,
+                 rows: int = 64) -> Hologram:
         '''Scale the phase of a complex field to an 8-bit integer array.
 
+        The phase is computed with ``arctan2`` into a scratch strip of
+        ``rows`` rows, scaled and offset in place, and cast directly
+        into ``out``.  Working strip by strip keeps the intermediate
+        values in cache and avoids the full-frame temporaries of
+        ``np.angle(field)``.  The result is bit-identical to
+        ``((128/pi)*np.angle(field) + 127).astype(np.uint8)``.
+
         Parameters
         ----------
         field : Field
-            Complex-valued field array.
+            Complex-valued field array, shape ``(height, width)``.
+        out : Hologram or None
+            Preallocated uint8 array with the shape of ``field`` that
+            receives the result.  A new array is allocated if ``None``.
+        rows : int
+            Number of rows processed per strip.  Default: 64.
 
         Returns
         -------
         Hologram
             Phase encoded as uint8 in the range [0, 255].
+
+        Notes
+        -----
+        Phase is truncated, not rounded, so the encoded phase lies
+        within one least-significant bit (pi/128 radians) below the
+        true phase.  ``quantizationError`` measures the error achieved
+        for a particular field.
+        '''
+        if out is None:
+            out = np.empty(field.shape, dtype=np.uint8)
+        scratch = np.empty((min(rows, len(field)),) + field.shape[1:],
+                           dtype=field.real.dtype)
+        for start in range(0, len(field), rows):
+            strip = field[start:start+rows]
+            phase = scratch[:len(strip)]
+            np.arctan2(strip.imag, strip.real, out=phase)
+            phase *= 128./np.pi
+            phase += 127.
+            out[start:start+rows] = phase
+        return out
+
+    @staticmethod
+    def quantizationError(field: Field, hologram: Hologram) -> float:
+        '''Return the largest phase error of a quantized hologram.
+
+        Parameters
+        ----------
+        field : Field
+            Complex-valued field that was quantized.
+        hologram : Hologram
+            Result of ``quantize(field)``.
+
+        Returns
+        -------
+        float
+            Maximum absolute difference between the phase of ``field``
+            and the phase encoded in ``hologram``, wrapped to
+            [-pi, pi) [radians].  ``quantize`` guarantees a value
+            smaller than pi/128.
+        '''
+        encoded = (hologram.astype(float) - 127.) * (np.pi/128.)
+        error = np.angle(field).astype(float) - encoded
+        error = np.remainder(error + np.pi, 2.*np.pi) - np.pi
+        return float(np.abs(error).max(initial=0.))
+
+    def _hologramBuffer(self) -> Hologram:
+        '''Return the preallocated output buffer for the next hologram.
+
+        Two buffers alternate so that the hologram handed to the SLM
+        by the previous ``compute`` is not overwritten while the next
+        one is being quantized.
         '''
-        return ((128./np.pi)*np.angle(field) + 127.).astype(np.uint8)
+        self._holograms.reverse()
+        return self._holograms[0]
+
+    # Structure primitives
+
+    def helical(self, ell: float) -> Field:
+        '''Return the helical phase ``exp(i ell theta)``.
+
+        Structured trap types build their ``structure`` from this and
+        ``bessel`` so that each backend can generate the arrays where
+        it computes holograms.
+
+        For integer ``ell`` the mask is the ``|ell|``-th power of the
+        unit phasor ``exp(i theta)``, a geometry table that is built on
+        first use and kept until ``geometry_version`` changes.  The
+        power is computed with about ``2 log2|ell|`` complex
+        multiplications instead of a complex exponential at every
+        pixel.  Rounding errors accumulate linearly with the order,
+        to about ``1.2e-7 |ell|`` for complex64.  Other orders are
+        evaluated directly.
+
+        Parameters
+        ----------
+        ell : float
+            Topological charge.
+
+        Returns
+        -------
+        Field
+            Complex phase mask of shape ``self.shape``.
+        '''
+        if ell == 0 or ell != int(ell):
+            return np.exp(1j * ell * self.theta)
+        power = _power(self._phasor, abs(int(ell)))
+        if ell < 0:
+            return power.conj()
+        return power.copy() if power is self._phasor else power
+
+    def _besselTable(self, ell: float,
+                     radius: float) -> tuple[np.ndarray, float]:
+        '''Tabulate ``J_ell(radius * q)`` on a uniform radial grid.
+
+        The grid spans ``0 <= q <= max(qr)`` with at most
+        ``bessel_step`` between samples of the argument
+        ``radius * q``.
+
+        Returns
+        -------
+        table : np.ndarray
+            float32 samples of the Bessel profile.
+        scale : float
+            Samples per unit of ``qr``, so that pixel ``qr`` falls at
+            fractional index ``scale * qr``.
+        '''
+        xmax = radius * self._qrmax
+        n = max(int(np.ceil(abs(xmax) / self.bessel_step)), 1) + 1
+        table = jv(ell, np.linspace(0., xmax, n)).astype(np.float32)
+        scale = (n - 1) / self._qrmax if self._qrmax else 0.
+        return table, scale
+
+    def bessel(self, ell: float, radius: float) -> Field:
+        '''Return the Bessel amplitude ``J_ell(radius * qr)``.
+
+        ``J_ell`` is evaluated once per sample of a one-dimensional
+        radial table (see ``_besselTable``) and interpolated linearly
+        into the frame, which is more than an order of magnitude
+        faster than evaluating it at every pixel.  For integer orders
+        and for ``ell >= 2``, ``|J_ell''| <= 1``, so the interpolation
+        error is at most ``bessel_step**2 / 8`` (1.25e-5 by default)
+        plus float32 round-off.  For other orders the error is larger
+        only within a few samples of ``qr = 0``, where ``J_ell`` is not
+        smooth.
+
+        Parameters
+        ----------
+        ell : float
+            Order of the Bessel function.
+        radius : float
+            Radius of the ring in the focal plane [pixels].
+
+        Returns
+        -------
+        Field
+            Real float32 amplitude mask of shape ``self.shape``.
+        '''
+        table, scale = self._besselTable(ell, radius)
+        t = self.qr * np.float32(scale)
+        index = t.astype(np.int32)
+        np.minimum(index, len(table) - 2, out=index)
+        t -= index
+        amplitude = np.diff(table).take(index)
+        amplitude *= t
+        amplitude += table.take(index)
+        return amplitude
 
     def window(self, r: QtGui.QVector3D) -> float:
         '''Compute the sinc-aperture amplitude correction for a trap position.
@@ -473,7 +1103,8 @@ class CGH(QtCore.QObject):
         '''Map camera-plane coordinates to SLM-plane coordinates.
 
         Applies the calibrated rotation/translation matrix and the
-        axial splay correction.
+        axial splay correction.  Equivalent to ``transformPoints`` for
+        a single position.
 
         Parameters
         ----------
@@ -485,30 +1116,90 @@ class CGH(QtCore.QObject):
         QtGui.QVector3D
             Position in SLM coordinates.
         '''
-        r = self.matrix * r
-        fac = 1. / (1. + self.splay*(r.z() - self.zc))
-        r *= QtGui.QVector3D(fac, fac, 1.)
-        return r
+        r = self.transformPoints([[r.x(), r.y(), r.z()]])[0]
+        return QtGui.QVector3D(*r)
 
-    @staticmethod
-    def _topLevel(trap: QTrap) -> QTrap:
-        '''Return the topmost ancestor, walking up through QTrapGroup parents.
+    def transformPoints(self, r: npt.ArrayLike) -> np.ndarray:
+        '''Map many camera-plane positions to SLM-plane coordinates.
+
+        Applies the float64 rigid transformation built by
+        ``updateTransformationMatrix`` and the axial splay correction
+        to all positions at once.
 
         Parameters
         ----------
-        trap : QTrap
-            Starting trap or group.
+        r : array_like
+            Positions in camera coordinates, shape ``(N, 3)``.
 
         Returns
         -------
-        QTrap
-            The highest ancestor that is not itself a child of a
-            ``QTrapGroup``, i.e. the top-level item registered with
-            the overlay.
+        np.ndarray
+            float64 positions in SLM coordinates, shape ``(N, 3)``.
+        '''
+        r = np.asarray(r, dtype=float).reshape(-1, 3)
+        s = r @ self._matrix[:3, :3].T + self._matrix[:3, 3]
+        s[:, :2] /= (1. + self.splay*(s[:, 2:] - self.zc))
+        return s
+
+    def inverseTransformPoints(self, s: npt.ArrayLike) -> np.ndarray:
+        '''Map SLM-plane positions back to camera-plane coordinates.
+
+        Exact inverse of ``transformPoints``: the splay correction is
+        undone using the axial coordinate, which it leaves unchanged,
+        and the rigid transformation is inverted analytically.
+
+        Parameters
+        ----------
+        s : array_like
+            Positions in SLM coordinates, shape ``(N, 3)``.
+
+        Returns
+        -------
+        np.ndarray
+            float64 positions in camera coordinates, shape ``(N, 3)``.
+        '''
+        s = np.array(s, dtype=float).reshape(-1, 3)
+        s[:, :2] *= (1. + self.splay*(s[:, 2:] - self.zc))
+        return s @ self._inverse[:3, :3].T + self._inverse[:3, 3]
+
+    @staticmethod
+    def _isPlain(trap: QTrap) -> bool:
+        '''Return True if the trap's field is a pure rank-1 phase ramp.
+
+        Plain traps are leaves without a ``structure`` method (e.g.
+        ``QTweezer``).  Their fields are outer products of a row and
+        a column phase-ramp vector, so any number of them can be
+        superposed with a single matrix product.
+        '''
+        return not (isinstance(trap, QTrapGroup)
+                    or hasattr(trap, 'structure'))
+
+    @contextmanager
+    def _reading(self, traps: list[QTrap] | TrapSnapshot
+                 ) -> Iterator[TrapSnapshot]:
+        '''Read the state of traps from a snapshot while computing.
+
+        Positions, coefficients, structural parameters and the group
+        hierarchy are all read from the snapshot, never from the live
+        traps, which may be changed by another thread meanwhile.
+
+        Parameters
+        ----------
+        traps : list[QTrap] or TrapSnapshot
+            Snapshot to read, or traps of which to take one.
+
+        Yields
+        ------
+        TrapSnapshot
+            The snapshot being read.
         '''
-        while isinstance(trap.parent(), QTrapGroup):
-            trap = trap.parent()
-        return trap
+        if not isinstance(traps, TrapSnapshot):
+            traps = TrapSnapshot.of(traps)
+        previous, self._snapshot = self._snapshot, traps
+        try:
+            yield traps
+        finally:
+            self._snapshot = previous
 
     def _connectTrap(self, trap: QTrap) -> None:
         '''Connect cache-invalidation slots for a trap if not already done.
@@ -526,6 +1217,9 @@ class CGH(QtCore.QObject):
             return
         trap_ref = weakref.ref(trap)
         trap.changed.connect(partial(self._invalidateField, trap_ref))
+        if isinstance(trap, QTrapGroup):
+            trap.descendantsChanged.connect(
+                partial(self._invalidateFields, trap_ref))
         if (not isinstance(trap, QTrapGroup)
                 and hasattr(trap, 'structureChanged')):
             trap.structureChanged.connect(
@@ -535,10 +1229,12 @@ class CGH(QtCore.QObject):
     def fieldOf(self, trap: QTrap) -> Field:
         '''Compute the complex field contribution of a trap or group.
 
-        For leaf traps the displacement field and structure field are
-        cached separately.  ``trap.changed`` invalidates the displacement
+        The displacement field of a trap or group is cached as a
+        ``Rank1`` factorization; its structure field is cached
+        separately.  ``trap.changed`` invalidates the displacement
         cache; ``trap.structureChanged`` (if present) invalidates only
-        the structure cache.
+        the structure cache.  Full frames are cached only for structure
+        fields, which are not separable.
 
         For groups the displacement field is the phase ramp evaluated at
         the group center and the structure is the position-independent
@@ -547,6 +1243,9 @@ class CGH(QtCore.QObject):
         the cost of a group move is one outer product regardless of the
         number of leaves.
 
+        Called outside ``compute``, ``fieldOf`` takes a snapshot of the
+        trap's current state and reads it.
+
         Parameters
         ----------
         trap : QTrap
@@ -557,68 +1256,804 @@ class CGH(QtCore.QObject):
         Field
             Complex field array with shape equal to ``self.shape``.
         '''
+        if self._snapshot is None or trap not in self._snapshot:
+            with self._reading([trap]):
+                return self.fieldOf(trap)
         self._connectTrap(trap)
-        if trap not in self._field_cache:
-            r = self.transform(QtGui.QVector3D(*trap.r))
-            rx = np.float32(r.x())
-            ry = np.float32(r.y())
-            rz = np.float32(r.z())
-            ex = np.exp(self.iqx * rx + self.iqxz * rz)
-            ey = np.exp(self.iqy * ry + self.iqyz * rz)
-            if isinstance(trap, QTrapGroup):
-                self._field_cache[trap] = np.outer(ey, ex).astype(self.dtype)
-            else:
-                amplitude = np.dtype(self.dtype).type(
-                    trap.amplitude * np.exp(1j * trap.phase))
-                self._field_cache[trap] = np.outer(amplitude * ey, ex)
-        if trap not in self._structure_cache:
+        factor, structure = self._contributionOf(trap)
+        if structure is None:
+            return factor.full()
+        return factor.full() * structure
+
+    def _contributionOf(self, trap: QTrap) -> tuple[Rank1, Field | None]:
+        '''Return the cached displacement factor and structure of a trap.
+
+        Missing cache entries, and entries computed from a state other
+        than the one in the snapshot being read, are computed and
+        stored.  For a group, the children's fields are summed.
+
+        Parameters
+        ----------
+        trap : QTrap
+            The trap or group.
+
+        Returns
+        -------
+        factor : Rank1
+            Factorized displacement field.
+        structure : Field or None
+            Full-frame structure field, or ``None`` for plain traps,
+            whose field is ``factor`` alone.
+
+        Raises
+        ------
+        ComputeCancelled
+            If ``cancelled`` returns True.
+        '''
+        if self.cancelled is not None and self.cancelled():
+            raise ComputeCancelled
+        factor = self._factorsOf([trap])[0]
+        if self._isPlain(trap):
+            return factor, None
+        source = self._snapshot.structureOf(trap)
+        structure = self._structure_cache.get(trap)
+        if (structure is None or
+                self._structure_sources.get(trap) != source):
             if isinstance(trap, QTrapGroup):
-                child_sum = sum(
-                    (self.fieldOf(child) for child in trap),
-                    np.zeros(self.shape, dtype=self.dtype))
-                self._structure_cache[trap] = (
-                    child_sum * self._field_cache[trap].conj())
-            elif hasattr(trap, 'structure'):
-                self._structure_cache[trap] = trap.structure(self)
+                children = self._snapshot.children(trap)
+                child_sum = self._sum(children, self._newField())
+                structure = child_sum * factor.full().conj()
             else:
-                self._structure_cache[trap] = 1.
-        return self._field_cache[trap] * self._structure_cache[trap]
+                structure, cacheable = self._leafStructure(trap)
+                if not cacheable:
+                    return factor, structure
+            self._structure_cache[trap] = structure
+            self._structure_sources[trap] = source
+        return factor, structure
+
+    def _structureKey(self, trap: QTrap) -> tuple | None:
+        '''Return the content address of a trap's structure field.
+
+        Traps that implement ``structureKey`` are identified by their
+        class, the structural parameters returned by that method and
+        recorded in the snapshot being read, and ``geometry_version``.
+        Traps with equal keys have identical structures.
+
+        Returns
+        -------
+        tuple or None
+            Hashable key, or ``None`` if the trap's structure cannot be
+            shared.
+        '''
+        parameters = self._snapshot.structureOf(trap)
+        if parameters is None:
+            return None
+        return (type(trap), parameters, self.geometry_version)
+
+    def _leafStructure(self, trap: QTrap) -> tuple[Field, bool]:
+        '''Return the structure of a leaf trap and whether to cache it.
+
+        Traps whose class implements ``structureFrom`` have their
+        structure built from the parameters recorded in the snapshot
+        being read, so edits made to the trap after the snapshot was
+        taken do not reach the hologram.  These structures are looked
+        up in ``_shared_structures`` and computed only if no trap with
+        the same key is cached.  Each call takes a reference that is
+        dropped when the trap's ``_structure_cache`` entry is removed.
+
+        Other traps are asked for ``trap.structure``, which reads their
+        live parameters.  If these no longer match the ``structureKey``
+        recorded in the snapshot, the structure does not describe the
+        snapshot and must not be cached under its parameters.
+
+        Returns
+        -------
+        structure : Field
+            Structure field of the trap.
+        cacheable : bool
+            False if the structure was built from parameters other than
+            those recorded in the snapshot.
+        '''
+        key = self._structureKey(trap)
+        if key is not None and hasattr(trap, 'structureFrom'):
+            structure = self._shared_structures.acquire(key)
+            if structure is None:
+                structure = self._asStructure(
+                    trap.structureFrom(self, key[1]))
+                structure = self._shared_structures.add(key, structure)
+            return structure, True
+        structure = self._asStructure(trap.structure(self))
+        if key is None:
+            return structure, True
+        return structure, tuple(trap.structureKey()) == key[1]
+
+    def _structureSize(self, structure: Field) -> int:
+        '''Bytes charged to ``_structure_cache`` for a structure.
+
+        Shared structures are charged once, to ``_shared_structures``.
+        '''
+        if self._shared_structures.holds(structure):
+            return 0
+        return nbytes(structure)
+
+    def _factorsOf(self, traps: list[QTrap]) -> list[Rank1]:
+        '''Return the cached displacement factors of traps or groups.
+
+        Factors missing from the cache, or computed from a state other
+        than the one in the snapshot being read, are assembled from
+        phase-ramp vectors by ``_cachedRamps`` and stored in
+        ``_field_cache``.  Their positions and coefficients are read
+        from the snapshot.
+
+        Parameters
+        ----------
+        traps : list[QTrap]
+            Traps or groups.
+
+        Returns
+        -------
+        list[Rank1]
+            One factorized displacement field per entry of ``traps``.
+        '''
+        snapshot = self._snapshot
+        states = [snapshot.state(trap) for trap in traps]
+        factors = [self._field_cache.get(trap) for trap in traps]
+        sources = self._field_sources
+        missing = [n for n, factor in enumerate(factors)
+                   if factor is None or sources.get(traps[n]) != states[n]]
+        if missing:
+            rows = snapshot.rows(traps[n] for n in missing)
+            r = self.transformPoints(snapshot.positions[rows])
+            coefficients = snapshot.coefficients[rows].tolist()
+            ey, ex = self._cachedRamps(r.astype(np.float32))
+            for n, y, x, c in zip(missing, ey, ex, coefficients):
+                trap = traps[n]
+                self._connectTrap(trap)
+                factors[n] = Rank1(y, x, c)
+                self._field_cache[trap] = factors[n]
+                sources[trap] = states[n]
+        return factors
+
+    def _cachedRamps(self, r: np.ndarray
+                     ) -> tuple[list[Field], list[Field]]:
+        '''Return phase-ramp vectors, reusing those of visited positions.
+
+        Row vectors are keyed by the ``(y, z)`` coordinates and column
+        vectors by the ``(x, z)`` coordinates of each position, rounded
+        to multiples of ``ramp_step``.  Vectors missing from the
+        ``RampCache`` are computed together by one vectorized call to
+        ``_ramps`` and cached.  A trap that returns to a position it
+        visited before, as in a periodic motion, therefore costs two
+        lookups.
+
+        Parameters
+        ----------
+        r : np.ndarray
+            SLM-plane coordinates, shape ``(N, 3)``, dtype float32.
 
-    @QtCore.pyqtSlot(list)
-    def compute(self, traps: list[QTrap]) -> Hologram:
-        '''Compute the phase hologram for a list of traps.
+        Returns
+        -------
+        ey : list[Field]
+            Row vectors, one per position.
+        ex : list[Field]
+            Column vectors, one per position.
+        '''
+        step = float(self.ramp_step)
+        if step > 0.:
+            index = np.round(r / step)
+            r = (index * step).astype(np.float32)
+        else:
+            index = r
+        cache = self._ramp_cache
+        if not cache.size:
+            ey, ex = self._ramps(r)
+            return self._split(ey), self._split(ex)
+        keys = index.tolist()
+        ey = [cache.get(('y', step, y, z)) for _, y, z in keys]
+        ex = [cache.get(('x', step, x, z)) for x, _, z in keys]
+        missing = [n for n in range(len(keys))
+                   if ey[n] is None or ex[n] is None]
+        if missing:
+            fresh = map(self._split, self._ramps(r[missing]))
+            for n, y, x in zip(missing, *fresh):
+                kx, ky, kz = keys[n]
+                if ey[n] is None:
+                    ey[n] = cache[('y', step, ky, kz)] = y
+                if ex[n] is None:
+                    ex[n] = cache[('x', step, kx, kz)] = x
+        return ey, ex
+
+    def _ramps(self, r: np.ndarray) -> tuple[Field, Field]:
+        '''Compute the phase-ramp vectors for many SLM positions.
+
+        Parameters
+        ----------
+        r : np.ndarray
+            SLM-plane coordinates, shape ``(N, 3)``, dtype float32.
+
+        Returns
+        -------
+        ey : Field
+            Row vectors, shape ``(N, height)``.
+        ex : Field
+            Column vectors, shape ``(N, width)``.
+        '''
+        rx, ry, rz = r[:, 0:1], r[:, 1:2], r[:, 2:3]
+        ex = self._phasors(rx * self.iqx.imag + rz * self.iqxz.imag)
+        ey = self._phasors(ry * self.iqy.imag + rz * self.iqyz.imag)
+        return ey, ex
+
+    def _split(self, vectors: Field) -> list[Field]:
+        '''Split stacked vectors into rows that own their memory.
+
+        A row that is a view would keep the whole stacked array alive
+        from the ``RampCache`` or ``_field_cache`` while being charged
+        only for its own bytes.
+        '''
+        return [vector.copy() for vector in vectors]
+
+    def _phasors(self, phase: np.ndarray) -> Field:
+        '''Return ``exp(i phase)`` for a real phase array.
+
+        The real and imaginary parts are written by ``cos`` and ``sin``
+        directly, which is an order of magnitude faster than the
+        complex ``exp`` of a purely imaginary argument and equally
+        accurate.
+        '''
+        phasors = np.empty(phase.shape, dtype=self.dtype)
+        np.cos(phase, out=phasors.real)
+        np.sin(phase, out=phasors.imag)
+        return phasors
+
+    def _newField(self) -> Field:
+        '''Return an uninitialized full-frame field buffer.'''
+        return np.empty(self.shape, dtype=self.dtype)
+
+    def _asStructure(self, structure: Field) -> Field:
+        '''Convert a structure returned by ``trap.structure`` for caching.
+
+        The CPU pipeline uses structure arrays as they are.
+        '''
+        return structure
+
+    @property
+    def _accumulator(self) -> Field:
+        '''Complex field buffer into which trap fields are summed.'''
+        return self.field
 
-        Each trap is resolved to its topmost ancestor (a group or an
-        ungrouped leaf) and deduplicated before calling ``fieldOf``,
-        so groups are processed as a single unit regardless of how many
-        leaves appear in ``traps``.
+    def _superpose(self, traps: list[QTrap], out: Field) -> None:
+        '''Overwrite ``out`` with the sum of plain trap fields.
 
         Parameters
         ----------
         traps : list[QTrap]
-            Traps (or group members) to include in the hologram.
+            Plain leaf traps.  If empty, ``out`` is zeroed.
+        out : Field
+            Full-frame buffer that receives the sum.
+        '''
+        if not traps:
+            out[...] = 0
+            return
+        self._product(self._factorsOf(traps), out)
+
+    def _product(self, factors: list[Rank1], out: Field) -> None:
+        '''Overwrite ``out`` with the sum of factorized fields.
+
+        Each factor contributes ``outer(a * ey, ex)``, so the sum over
+        ``N`` factors is the single matrix product ``EY.T @ EX``,
+        evaluated by BLAS without per-trap full-frame temporaries.
+
+        Parameters
+        ----------
+        factors : list[Rank1]
+            Non-empty list of factorized fields.
+        out : Field
+            Full-frame buffer that receives the sum.
+        '''
+        ey, ex = self._stack(factors)
+        np.matmul(ey, ex, out=out)
+
+    def _stack(self, factors: list[Rank1]) -> tuple[Field, Field]:
+        '''Stack factorized fields into weighted row and column matrices.
+
+        The row vectors are stacked as columns, so that any band of
+        rows of the product ``ey @ ex`` is computed from a contiguous
+        band of ``ey``.
+
+        Returns
+        -------
+        ey : Field
+            Row vectors scaled by their coefficients, as columns,
+            shape ``(height, N)``.
+        ex : Field
+            Column vectors, shape ``(N, width)``.
+        '''
+        if not factors:
+            return (np.empty((self.height, 0), dtype=self.dtype),
+                    np.empty((0, self.width), dtype=self.dtype))
+        ey = np.stack([f.ey for f in factors], axis=1)
+        ey *= np.array([f.coefficient for f in factors], dtype=self.dtype)
+        ex = np.stack([f.ex for f in factors])
+        return ey, ex
+
+    def _sum(self, items: list[QTrap], out: Field) -> Field:
+        '''Sum the fields of traps or groups into ``out``.
+
+        In ``batched`` mode plain tweezers are superposed together by
+        ``_superpose``; all other items are added through ``fieldOf``.
+
+        Parameters
+        ----------
+        items : list[QTrap]
+            Distinct traps or groups.
+        out : Field
+            Full-frame buffer that receives the sum.
+
+        Returns
+        -------
+        Field
+            ``out``, for convenience.
+        '''
+        plain = []
+        if self.batched:
+            plain = [item for item in items if self._isPlain(item)]
+            items = [item for item in items if not self._isPlain(item)]
+        self._superpose(plain, out)
+        for item in items:
+            out += self.fieldOf(item)
+        return out
+
+    def _accumulate(self, traps: list[QTrap] | TrapSnapshot) -> Field:
+        '''Sum the fields of all top-level items into the accumulator.
+
+        The fields of the top-level items of the snapshot (groups and
+        ungrouped leaves) are summed, so groups are processed as a
+        single unit regardless of how many leaves they contain.  In
+        ``incremental`` mode the accumulator is updated in place by
+        ``_updateRunningSum`` whenever possible.
+
+        Parameters
+        ----------
+        traps : list[QTrap] or TrapSnapshot
+            Snapshot of the traps to include in the hologram, or traps
+            (or group members) of which to take one.
+
+        Returns
+        -------
+        Field
+            The accumulated complex field.
+        '''
+        with self._reading(traps) as snapshot:
+            items = snapshot.topLevelItems
+            out = self._accumulator
+            if not self.incremental:
+                self._contributions = None
+                return self._sum(items, out)
+            if not self._updateRunningSum(items, out):
+                logger.debug('rebuilding running sum')
+                self._contributions = None
+                self._sum(items, out)
+                self._contributions = self._contributionsOf(items)
+                self._updates = 0
+            self._summed = snapshot
+            return out
+
+    def _contributionsOf(self, items: list[QTrap]
+                         ) -> dict[QTrap, tuple[Rank1, Field | None]]:
+        '''Return the contributions of items to a new running sum.
+
+        The factors of all plain traps are looked up together by one
+        call to ``_factorsOf``; the other items are resolved by
+        ``_contributionOf``.
+        '''
+        plain = [item for item in items if self._isPlain(item)]
+        contributions = {item: (factor, None) for item, factor
+                         in zip(plain, self._factorsOf(plain))}
+        return {item: contributions.get(item) or self._contributionOf(item)
+                for item in items}
+
+    def _updateRunningSum(self, items: list[QTrap], out: Field) -> bool:
+        '''Apply the changes since the previous call to the running sum.
+
+        Parameters
+        ----------
+        items : list[QTrap]
+            Distinct top-level items of the current hologram.
+        out : Field
+            Accumulator holding the running sum of the previous call.
+
+        Returns
+        -------
+        bool
+            ``False`` if the running sum should be rebuilt instead,
+            in which case ``out`` is left untouched.
+        '''
+        changes = self._runningChanges(items)
+        if changes is None:
+            return False
+        factors, terms = changes
+        if factors:
+            self._addProduct(factors, out)
+        self._addStructured(terms, out)
+        return True
+
+    def _runningChanges(self, items: list[QTrap]) -> tuple[
+            list[Rank1], list[tuple[Rank1, Field | None]]] | None:
+        '''Return the changes to the running sum since the previous call.
+
+        Items are compared with the snapshot from which the running
+        sum was built.  Stale contributions of changed or removed items
+        are returned with negated coefficients, followed by the fresh
+        contributions of changed or added items, and ``_contributions``
+        is updated to match.  Fresh contributions are computed before
+        anything is modified, so a cancelled update leaves the running
+        sum intact.
+
+        Parameters
+        ----------
+        items : list[QTrap]
+            Distinct top-level items of the current hologram.
+
+        Returns
+        -------
+        tuple[list[Rank1], list[tuple[Rank1, Field or None]]] or None
+            Factors of the plain traps, to be superposed with one
+            matrix product, and terms of the structured traps and
+            groups, as for ``_addStructured``.  ``None`` if the running
+            sum should be rebuilt instead.
+        '''
+        previous = self._contributions
+        if previous is None or self._updates >= self.rebuild_interval:
+            return None
+        snapshot, summed = self._snapshot, self._summed
+        rows = snapshot.rows(items)
+        changed = snapshot.changedSince(summed)[rows]
+        for n in np.flatnonzero(~(changed | snapshot.records['leaf'][rows])):
+            group = items[n]
+            if snapshot.structureOf(group) != summed.structureOf(group):
+                changed[n] = True
+        fresh = [item for item, flag in zip(items, changed.tolist())
+                 if flag or item not in previous]
+        current = dict.fromkeys(items)
+        stale = {item: previous[item] for item in fresh if item in previous}
+        stale.update((item, c) for item, c in previous.items()
+                     if item not in current)
+        if 2 * (len(stale) + len(fresh)) > len(items):
+            return None
+        if not (stale or fresh):
+            return [], []
+        fresh = {item: self._contributionOf(item) for item in fresh}
+        for item in stale:
+            del previous[item]
+        previous.update(fresh)
+        self._updates += 1
+        return self._partition(
+            [(factor._replace(coefficient=-factor.coefficient), structure)
+             for factor, structure in stale.values()] +
+            list(fresh.values()))
+
+    @staticmethod
+    def _partition(terms: list[tuple[Rank1, Field | None]]) -> tuple[
+            list[Rank1], list[tuple[Rank1, Field | None]]]:
+        '''Separate the factors of plain traps from structured terms.'''
+        factors = [factor for factor, structure in terms
+                   if structure is None]
+        return factors, [term for term in terms if term[1] is not None]
+
+    def _addProduct(self, factors: list[Rank1], out: Field) -> None:
+        '''Add the sum of factorized fields to ``out``.
+
+        Parameters
+        ----------
+        factors : list[Rank1]
+            Non-empty list of factorized fields.
+        out : Field
+            Full-frame buffer to which the sum is added.
+        '''
+        change = self._newField()
+        self._product(factors, change)
+        out += change
+
+    def _addStructured(self, terms: list[tuple[Rank1, Field | None]],
+                       out: Field) -> None:
+        '''Add the fields of structured traps and groups to ``out``.
+
+        Parameters
+        ----------
+        terms : list[tuple[Rank1, Field or None]]
+            Displacement factor and structure of each item, as returned
+            by ``_contributionOf``.  A structure of ``None`` stands for
+            a plain trap.
+        out : Field
+            Full-frame buffer to which the fields are added.
+        '''
+        for factor, structure in terms:
+            if structure is None:
+                out += factor.full()
+            else:
+                out += factor.full() * structure
+
+    @QtCore.pyqtSlot(object)
+    def compute(self, traps: list[QTrap] | TrapSnapshot) -> Hologram:
+        '''Compute the phase hologram for a snapshot or list of traps.
+
+        The state of the traps is read only from the snapshot, so it
+        may be taken in another thread while the traps keep changing.
+        If ``hologramcache`` holds the hologram of an equal scene with
+        the current calibration, it is copied into the output buffer
+        instead of being computed.  Only holograms that depend on
+        nothing but the snapshot are cached (see ``_reproducible``).
+
+        Parameters
+        ----------
+        traps : list[QTrap] or TrapSnapshot
+            Snapshot of the traps to include in the hologram, or traps
+            (or group members) of which to take one.
 
         Returns
         -------
         Hologram
-            Quantized phase hologram as a uint8 array.
+            Quantized phase hologram as a uint8 array.  The array is one
+            of two preallocated buffers that alternate between calls, so
+            it is overwritten by the next-but-one call to ``compute``.
+
+        Raises
+        ------
+        ComputeCancelled
+            If ``cancelled`` returns True before the hologram is
+            complete.
         '''
+        if not isinstance(traps, TrapSnapshot):
+            traps = TrapSnapshot.of(traps)
         logger.debug(f'computing hologram for {len(traps)} traps')
         try:
-            self.field.fill(0j)
-            seen: set = set()
-            for trap in traps:
-                item = self._topLevel(trap)
-                if item not in seen:
-                    self.field += self.fieldOf(item)
-                    seen.add(item)
-            self.phase = self.quantize(self.field)
+            cache, key = self.hologramcache, None
+            if cache is not None and self._reproducible(traps):
+                with self._timed('lookup'):
+                    key = cache.key(traps, self.calibration)
+                    stored = cache.get(key)
+                if stored is not None:
+                    self.phase = self._hologramBuffer()
+                    np.copyto(self.phase, stored)
+                    self.hologramReady.emit(self.phase)
+                    return self.phase
+            self.phase = self._render(traps)
+            if key is not None:
+                cache.put(key, self.phase)
             self.hologramReady.emit(self.phase)
             return self.phase
         except Exception:
             logger.exception('hologram computation failed')
             raise
 
+    def _reproducible(self, snapshot: TrapSnapshot) -> bool:
+        '''Return True if a snapshot fully determines its hologram.
+
+        The structures of trap types with ``structureFrom`` are built
+        from the parameters recorded in the snapshot.  Other structured
+        traps are computed from their live state, which may have
+        changed since the snapshot was taken, so holograms that contain
+        them must not be stored under the snapshot's digest.
+        '''
+        kinds = {type(item): item for item in snapshot.items}
+        return all(isinstance(item, QTrapGroup) or self._isPlain(item) or
+                   (hasattr(item, 'structureFrom') and
+                    hasattr(item, 'structureKey'))
+                   for item in kinds.values())
+
+    def _render(self, snapshot: TrapSnapshot) -> Hologram:
+        '''Compute and quantize the hologram of a snapshot.
+
+        Backends override this method to compute holograms their own
+        way; ``compute`` handles caching and emits the result.
+
+        Parameters
+        ----------
+        snapshot : TrapSnapshot
+            State of the traps to include in the hologram.
+
+        Returns
+        -------
+        Hologram
+            Quantized phase hologram in the next output buffer.
+        '''
+        with self._timed('accumulate'):
+            field = self._accumulate(snapshot)
+        with self._timed('quantize'):
+            return self.quantize(field, out=self._hologramBuffer())
+
+    def computeMany(self, states: Iterable[list[QTrap] | TrapSnapshot],
+                    out: Hologram | str | Path | None = None) -> Hologram:
+        '''Compute the holograms of many trap states as one stack.
+
+        Intended for offline work such as precomputing trajectories,
+        calibration scans and pattern libraries.  Consecutive states
+        are related by the incremental running sum of ``compute``:
+        each state costs only the contributions of the items that
+        changed since the previous one, found by comparing snapshots,
+        and the running sum is rebuilt when more than half of the
+        items changed.  The changes of ``stack_size`` states are then
+        applied together, sweeping the frame in strips of
+        ``strip_rows`` rows: each strip of the running sum stays in
+        the processor's cache while the changes of all states of the
+        stack are added to it and the holograms are quantized, so the
+        full frame is neither rewritten nor reread for every state.
+
+        Unlike ``compute``, ``computeMany`` neither emits
+        ``hologramReady`` nor changes ``phase``, the running sum of
+        ``compute`` or ``hologramcache``.  It needs one complex frame
+        of working memory.
+
+        Parameters
+        ----------
+        states : Iterable[list[QTrap] or TrapSnapshot]
+            Snapshots of the traps, or lists of traps (or group
+            members) of which snapshots are taken.
+        out : Hologram, str, Path or None
+            uint8 array of shape ``(T, height, width)`` that receives
+            the holograms, such as a ``np.memmap``, or the name of an
+            ``.npy`` file that is created and memory-mapped.  A new
+            array is allocated if ``None``.
+
+        Returns
+        -------
+        Hologram
+            Stack of quantized phase holograms, shape
+            ``(T, height, width)``; ``out`` if it is an array.
+
+        Raises
+        ------
+        ValueError
+            If ``out`` does not have the shape and dtype of the stack.
+
+        Examples
+        --------
+        >>> holograms = cgh.computeMany(states, out='trajectory.npy')
+        '''
+        snapshots = [state if isinstance(state, TrapSnapshot)
+                     else TrapSnapshot.of(state) for state in states]
+        shape = (len(snapshots), *self.shape)
+        if out is None:
+            out = np.empty(shape, dtype=np.uint8)
+        elif isinstance(out, (str, Path)):
+            out = np.lib.format.open_memmap(out, mode='w+',
+                                            dtype=np.uint8, shape=shape)
+        elif out.shape != shape or out.dtype != np.uint8:
+            raise ValueError(f'out must be a uint8 array of shape {shape}, '
+                             f'not {out.dtype} {out.shape}')
+        logger.debug(f'computing {len(snapshots)} holograms')
+        running = self._contributions, self._summed, self._updates
+        self._contributions = None
+        try:
+            field = self._newField()
+            for start in range(0, len(snapshots), self.stack_size):
+                stack = snapshots[start:start + self.stack_size]
+                steps = [self._stepTo(snapshot) for snapshot in stack]
+                self._renderMany(steps, field, out[start:start + len(stack)])
+        finally:
+            self._contributions, self._summed, self._updates = running
+        return out
+
+    def _stepTo(self, snapshot: TrapSnapshot) -> tuple[
+            bool, Field, Field, list[tuple[Rank1, Field | None]]]:
+        '''Find the changes of the running sum for the next state.
+
+        Parameters
+        ----------
+        snapshot : TrapSnapshot
+            Next state of the traps.
+
+        Returns
+        -------
+        restart : bool
+            True if the running sum is replaced instead of updated.
+        ey, ex : Field
+            Stacked factors of the plain traps, as returned by
+            ``_stack``.
+        terms : list[tuple[Rank1, Field or None]]
+            Terms of the structured traps and groups.
+        '''
+        with self._reading(snapshot):
+            items = snapshot.topLevelItems
+            changes = self._runningChanges(items) if self.incremental else None
+            restart = changes is None
+            if restart:
+                self._contributions = self._contributionsOf(items)
+                self._updates = 0
+                changes = self._partition(list(self._contributions.values()))
+            self._summed = snapshot
+        factors, terms = changes
+        return (restart, *self._stack(factors), terms)
+
+    def _renderMany(self, steps: list[tuple[
+                        bool, Field, Field, list[tuple[Rank1, Field | None]]]],
+                    field: Field, out: Hologram) -> None:
+        '''Apply the changes of a stack of states and quantize them.
+
+        Parameters
+        ----------
+        steps : list[tuple]
+            Changes of the running sum for each state, as returned by
+            ``_stepTo``.
+        field : Field
+            Running sum, which holds the field of the state before the
+            stack and is left holding the field of its last state.
+        out : Hologram
+            uint8 array of shape ``(len(steps), height, width)``.
+
+        Notes
+        -----
+        The stack is split into runs that begin at each restart.
+        A restart does not depend on the preceding field, so its
+        product, which dominates when it has many factors, is formed
+        over the full frame in one call before the run is swept in
+        strips.  Within a run, each strip is updated for every state
+        and quantized while it is still in cache.
+        '''
+        bounds = sorted({0, len(steps),
+                         *(n for n, step in enumerate(steps) if step[0])})
+        for first, last in zip(bounds, bounds[1:]):
+            run = steps[first:last]
+            restart, ey, ex, terms = run[0]
+            if restart:
+                self._stripProduct(ey, ex, field, True)
+                run[0] = (False, ey[:, :0], ex[:0], terms)
+            self._sweep(run, field, out[first:last])
+
+    def _sweep(self, steps: list[tuple[
+                   bool, Field, Field, list[tuple[Rank1, Field | None]]]],
+               field: Field, out: Hologram) -> None:
+        '''Apply a run of changes strip by strip and quantize them.'''
+        for rows in self._strips():
+            strip = field[rows]
+            for (restart, ey, ex, terms), hologram in zip(steps, out):
+                self._stripProduct(ey[rows], ex, strip, restart)
+                for factor, structure in terms:
+                    part = factor.full(rows)
+                    if getattr(structure, 'ndim', 0):
+                        part *= structure[rows]
+                    elif structure is not None:
+                        part *= structure
+                    strip += part
+                self._quantizeStrip(strip, hologram[rows])
+
+    def _stripProduct(self, ey: Field, ex: Field, strip: Field,
+                      restart: bool) -> None:
+        '''Add, or assign if ``restart``, the product ``ey @ ex``.
+
+        The product is accumulated into ``strip`` in place by the BLAS
+        ``gemm`` routine, without a temporary strip.
+
+        Parameters
+        ----------
+        ey : Field
+            Band of stacked row vectors, shape ``(rows, N)``.
+        ex : Field
+            Stacked column vectors, shape ``(N, width)``.
+        strip : Field
+            C-contiguous band of the running sum, shape
+            ``(rows, width)``.
+        restart : bool
+            True to overwrite ``strip`` instead of adding to it.
+        '''
+        if not ex.shape[0]:
+            if restart:
+                strip[...] = 0
+            return
+        gemm = get_blas_funcs('gemm', dtype=self.dtype)
+        gemm(1., ex.T, ey.T, beta=0. if restart else 1.,
+             c=strip.T, overwrite_c=True)
+
+    def _strips(self) -> list[slice]:
+        '''Return the row strips in which ``computeMany`` sweeps.'''
+        step = max(1, int(self.strip_rows))
+        return [slice(start, start + step)
+                for start in range(0, self.height, step)]
+
+    def _quantizeStrip(self, strip: Field, out: Hologram) -> None:
+        '''Quantize a strip of the running sum of ``computeMany``.'''
+        self.quantize(strip, out=out, rows=len(strip))
+
     def bless(self, field: Field | None) -> Field | None:
         '''Cast a field array to ``self.dtype``, or return None.
 
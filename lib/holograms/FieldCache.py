@@ -0,0 +1,386 @@
+'''Byte-budgeted LRU caches for CGH fields and structures.'''
+from __future__ import annotations
+
+import logging
+import weakref
+from collections import OrderedDict
+from collections.abc import Callable, Hashable, Iterator
+from itertools import count
+
+
+__all__ = 'CacheBudget FieldCache SharedFieldCache'.split()
+
+logger = logging.getLogger(__name__)
+
+
+def nbytes(value: object) -> int:
+    '''Return the number of bytes held by a cached value.
+
+    Arrays and tensors report their ``nbytes``; tuples (e.g.
+    ``Rank1`` factors) report the sum over their elements; scalars
+    count as zero.
+    '''
+    if isinstance(value, tuple):
+        return sum(nbytes(v) for v in value)
+    return int(getattr(value, 'nbytes', 0))
+
+
+class CacheBudget:
+
+    '''Memory budget shared by one or more ``FieldCache`` instances.
+
+    Every cache entry is stamped with a tick from a shared counter
+    when it is stored or read.  While the total size of the registered
+    caches exceeds ``limit``, the evictable entry with the oldest stamp
+    is evicted, regardless of which cache holds it.  The most recently
+    used entry is never evicted, so a single entry larger than the
+    budget is still cached until it is displaced.
+
+    Parameters
+    ----------
+    limit : int or None
+        Maximum total size of the registered caches [bytes].
+        ``None`` or ``0`` means unlimited.
+
+    Attributes
+    ----------
+    limit : int or None
+        Current budget [bytes].  Assigning a smaller value evicts
+        entries immediately.
+    nbytes : int
+        Total size of all registered caches [bytes].
+    '''
+
+    def __init__(self, limit: int | None = None) -> None:
+        self._caches: list[FieldCache] = []
+        self._ticks = count()
+        self._limit = limit or None
+
+    @property
+    def limit(self) -> int | None:
+        return self._limit
+
+    @limit.setter
+    def limit(self, limit: int | None) -> None:
+        self._limit = limit or None
+        self.enforce()
+
+    @property
+    def nbytes(self) -> int:
+        return sum(cache.nbytes for cache in self._caches)
+
+    def tick(self) -> int:
+        '''Return the next recency stamp.'''
+        return next(self._ticks)
+
+    def register(self, cache: FieldCache) -> None:
+        '''Account for the entries of ``cache`` in this budget.'''
+        self._caches.append(cache)
+
+    def enforce(self) -> None:
+        '''Evict least-recently-used entries until within budget.'''
+        if self._limit is None:
+            return
+        while self.nbytes > self._limit:
+            candidates = [c for c in self._caches if c.evictable]
+            if sum(c.evictable for c in candidates) <= 1:
+                return
+            oldest = min(candidates, key=lambda c: c.oldest)
+            oldest.evict()
+
+
+class FieldCache:
+
+    '''Weak-keyed mapping with LRU ordering and a byte budget.
+
+    Behaves like ``weakref.WeakKeyDictionary``: entries disappear when
+    their key is garbage-collected.  In addition, the size of every
+    stored value is recorded, entries are kept in least-recently-used
+    order, and the shared ``CacheBudget`` evicts the oldest entries
+    when the total size exceeds its limit.
+
+    Reads through ``[]`` or ``get`` count as hits and refresh the
+    entry's recency; storing a new entry counts as a miss.  Membership
+    tests have no side effects.
+
+    Parameters
+    ----------
+    budget : CacheBudget or None
+        Budget shared with other caches.  A private, unlimited budget
+        is created if ``None``.
+    sizeof : Callable[[object], int] or None
+        Returns the number of bytes charged for a value.  Values owned
+        by another cache, such as a ``SharedFieldCache``, can be
+        charged as zero.  Defaults to the value's ``nbytes``.
+    release : Callable[[object], None] or None
+        Called with every value that leaves the cache, whether it is
+        popped, evicted, overwritten, cleared, or its key is collected.
+
+    Attributes
+    ----------
+    budget : CacheBudget
+        Budget that governs eviction.
+    nbytes : int
+        Total size of the cached values [bytes].
+    hits, misses, evictions : int
+        Usage counters since construction or ``resetStats``.
+    '''
+
+    def __init__(self, budget: CacheBudget | None = None,
+                 sizeof: Callable[[object], int] | None = None,
+                 release: Callable[[object], None] | None = None) -> None:
+        self.budget = budget or CacheBudget()
+        self.budget.register(self)
+        self._sizeof = sizeof or nbytes
+        self._release = release
+        self._data: OrderedDict[weakref.ref, list] = OrderedDict()
+        self.nbytes = 0
+        self.resetStats()
+
+    def _ref(self, key: Hashable) -> weakref.ref:
+        return weakref.ref(key, self._discard)
+
+    def _remove(self, entry: list) -> object:
+        '''Account for an entry that has left the cache.'''
+        self.nbytes -= entry[1]
+        if self._release is not None:
+            self._release(entry[0])
+        return entry[0]
+
+    def _discard(self, ref: weakref.ref) -> None:
+        '''Remove the entry of a garbage-collected key.'''
+        entry = self._data.pop(ref, None)
+        if entry is not None:
+            self._remove(entry)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    @property
+    def evictable(self) -> int:
+        '''Number of entries that may be evicted.'''
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        try:
+            return weakref.ref(key) in self._data
+        except TypeError:
+            return False
+
+    def __iter__(self) -> Iterator[Hashable]:
+        for ref in list(self._data):
+            key = ref()
+            if key is not None:
+                yield key
+
+    def __getitem__(self, key: Hashable) -> object:
+        ref = weakref.ref(key)
+        entry = self._data[ref]
+        entry[2] = self.budget.tick()
+        self._data.move_to_end(ref)
+        self.hits += 1
+        return entry[0]
+
+    def get(self, key: Hashable, default: object = None) -> object:
+        '''Return the value for ``key``, or ``default`` if not cached.'''
+        try:
+            return self[key]
+        except (KeyError, TypeError):
+            return default
+
+    def __setitem__(self, key: Hashable, value: object) -> None:
+        size = self._sizeof(value)
+        ref = self._ref(key)
+        old = self._data.pop(ref, None)
+        if old is None:
+            self.misses += 1
+        else:
+            self._remove(old)
+        self._data[ref] = [value, size, self.budget.tick()]
+        self.nbytes += size
+        self.budget.enforce()
+
+    def pop(self, key: Hashable, default: object = None) -> object:
+        '''Remove ``key`` and return its value, or ``default``.'''
+        try:
+            entry = self._data.pop(weakref.ref(key))
+        except (KeyError, TypeError):
+            return default
+        return self._remove(entry)
+
+    def clear(self) -> None:
+        '''Remove all entries.'''
+        entries = list(self._data.values())
+        self._data.clear()
+        for entry in entries:
+            self._remove(entry)
+        self.nbytes = 0
+
+    @property
+    def oldest(self) -> int:
+        '''Recency stamp of the least-recently-used entry.'''
+        return next(iter(self._data.values()))[2]
+
+    def evict(self) -> None:
+        '''Remove the least-recently-used entry.'''
+        _, entry = self._data.popitem(last=False)
+        self._remove(entry)
+        self.evictions += 1
+
+    def resetStats(self) -> None:
+        '''Reset the hit, miss, and eviction counters.'''
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def stats(self) -> dict[str, int]:
+        '''Usage counters and current size of the cache.
+
+        Returns
+        -------
+        dict[str, int]
+            ``entries``, ``nbytes``, ``hits``, ``misses`` and
+            ``evictions``.
+        '''
+        return dict(entries=len(self),
+                    nbytes=self.nbytes,
+                    hits=self.hits,
+                    misses=self.misses,
+                    evictions=self.evictions)
+
+
+class SharedFieldCache:
+
+    '''Content-addressed, reference-counted cache of fields.
+
+    Entries are keyed by a hashable description of their content, so
+    that every consumer asking for the same content shares one value.
+    Each ``acquire`` or ``add`` takes a reference, and each ``release``
+    drops one.  Entries that are still referenced are never evicted;
+    unreferenced entries stay cached, in least-recently-used order,
+    until the shared ``CacheBudget`` evicts them.
+
+    Parameters
+    ----------
+    budget : CacheBudget or None
+        Budget shared with other caches.  A private, unlimited budget
+        is created if ``None``.
+
+    Attributes
+    ----------
+    budget : CacheBudget
+        Budget that governs eviction.
+    nbytes : int
+        Total size of the cached values [bytes].
+    hits, misses, evictions : int
+        Usage counters since construction or ``resetStats``.
+    '''
+
+    def __init__(self, budget: CacheBudget | None = None) -> None:
+        self.budget = budget or CacheBudget()
+        self.budget.register(self)
+        self._data: OrderedDict[Hashable, list] = OrderedDict()
+        self._keys: dict[int, Hashable] = {}
+        self.nbytes = 0
+        self.resetStats()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def holds(self, value: object) -> bool:
+        '''Return True if ``value`` is an entry of this cache.'''
+        return id(value) in self._keys
+
+    def references(self, key: Hashable) -> int:
+        '''Return the number of references held to ``key``.'''
+        entry = self._data.get(key)
+        return 0 if entry is None else entry[3]
+
+    def acquire(self, key: Hashable) -> object:
+        '''Return the value for ``key`` and take a reference to it.
+
+        Returns ``None`` without taking a reference if ``key`` is not
+        cached.
+        '''
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        entry[2] = self.budget.tick()
+        entry[3] += 1
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def add(self, key: Hashable, value: object) -> object:
+        '''Store ``value`` under ``key`` with one reference and return it.'''
+        size = nbytes(value)
+        self._data[key] = [value, size, self.budget.tick(), 1]
+        self._keys[id(value)] = key
+        self.nbytes += size
+        self.misses += 1
+        self.budget.enforce()
+        return value
+
+    def release(self, value: object) -> None:
+        '''Drop one reference to ``value``.
+
+        Values that are not entries of this cache are ignored.
+        '''
+        key = self._keys.get(id(value))
+        if key is not None:
+            self._data[key][3] -= 1
+
+    def clear(self) -> None:
+        '''Remove all entries, whether or not they are referenced.'''
+        self._data.clear()
+        self._keys.clear()
+        self.nbytes = 0
+
+    def _unreferenced(self) -> Iterator[tuple[Hashable, list]]:
+        return ((key, entry) for key, entry in self._data.items()
+                if entry[3] <= 0)
+
+    @property
+    def evictable(self) -> int:
+        '''Number of unreferenced entries.'''
+        return sum(1 for _ in self._unreferenced())
+
+    @property
+    def oldest(self) -> int:
+        '''Recency stamp of the least-recently-used evictable entry.'''
+        return next(self._unreferenced())[1][2]
+
+    def evict(self) -> None:
+        '''Remove the least-recently-used unreferenced entry.'''
+        key, entry = next(self._unreferenced())
+        del self._data[key]
+        del self._keys[id(entry[0])]
+        self.nbytes -= entry[1]
+        self.evictions += 1
+
+    def resetStats(self) -> None:
+        '''Reset the hit, miss, and eviction counters.'''
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def stats(self) -> dict[str, int]:
+        '''Usage counters and current size of the cache.
+
+        Returns
+        -------
+        dict[str, int]
+            ``entries``, ``referenced`` (entries in use), ``nbytes``,
+            ``hits``, ``misses`` and ``evictions``.
+        '''
+        return dict(entries=len(self),
+                    referenced=len(self) - self.evictable,
+                    nbytes=self.nbytes,
+                    hits=self.hits,
+                    misses=self.misses,
+                    evictions=self.evictions)
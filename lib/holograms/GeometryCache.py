@@ -0,0 +1,129 @@
+'''Persistent on-disk cache of CGH geometry tables.'''
+from __future__ import annotations
+
+import logging
+from collections.abc import Callable, Mapping
+from pathlib import Path
+
+import numpy as np
+
+from QHOT.lib.QSaveFile import QSaveFile
+from .diskcache import save_npy, settings_key
+
+
+__all__ = ['GeometryCache']
+
+logger = logging.getLogger(__name__)
+
+
+class GeometryCache:
+
+    '''Directory of memory-mapped geometry tables.
+
+    Full-frame tables such as ``CGH.theta`` and ``CGH.qr`` depend only
+    on the calibration of the instrument, which rarely changes between
+    sessions.  Each table is stored as an ``.npy`` file whose name
+    contains a hash of the settings it was computed from, and is
+    loaded as a read-only memory map, so reusing it costs neither
+    computation nor a copy.
+
+    Parameters
+    ----------
+    directory : str, Path or None
+        Directory in which tables are stored.  Created if necessary.
+        Default: the ``geometry`` subdirectory of the configuration
+        directory of ``QHOT`` (``QSaveFile.configDir``).
+
+    Attributes
+    ----------
+    directory : Path
+        Directory in which tables are stored.
+    hits, misses : int
+        Numbers of tables loaded from and written to disk.
+    '''
+
+    version = 1
+
+    def __init__(self, directory: str | Path | None = None) -> None:
+        self.directory = Path(directory or
+                              QSaveFile.configDir('QHOT') / 'geometry')
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def key(cls, settings: Mapping[str, object]) -> str:
+        '''Return the hash that identifies a set of settings.
+
+        Parameters
+        ----------
+        settings : Mapping[str, object]
+            Settings that determine the tables, such as the geometry
+            fields of ``CGH.settings`` and the table dtype.
+
+        Returns
+        -------
+        str
+            Hexadecimal digest, independent of the order of
+            ``settings``.
+        '''
+        return settings_key(settings, cls.version)
+
+    def path(self, key: str, name: str) -> Path:
+        '''Return the file in which table ``name`` is stored.'''
+        return self.directory / f'{name}-{key}.npy'
+
+    def load(self, key: str, name: str) -> np.ndarray | None:
+        '''Return a stored table as a read-only memory map.
+
+        Returns ``None`` if the table is missing or cannot be read.
+        '''
+        path = self.path(key, name)
+        if not path.exists():
+            return None
+        try:
+            return np.load(path, mmap_mode='r')
+        except (OSError, ValueError) as error:
+            logger.warning(f'could not load {path}: {error}')
+            return None
+
+    def save(self, key: str, name: str, table: np.ndarray) -> None:
+        '''Store a table.
+
+        The file is written under a temporary name and then renamed,
+        so readers never see a partial table.  Failures are logged
+        and otherwise ignored.
+        '''
+        save_npy(self.path(key, name), table)
+
+    def fetch(self, key: str, name: str,
+              build: Callable[[], np.ndarray]) -> np.ndarray:
+        '''Return a stored table, building and storing it if necessary.
+
+        Parameters
+        ----------
+        key : str
+            Hash of the settings, from ``key``.
+        name : str
+            Name of the table.
+        build : Callable[[], np.ndarray]
+            Computes the table.
+
+        Returns
+        -------
+        np.ndarray
+            The table, memory-mapped if it was found on disk.
+        '''
+        table = self.load(key, name)
+        if table is not None:
+            self.hits += 1
+            return table
+        self.misses += 1
+        table = build()
+        self.save(key, name, table)
+        return table
+
+    def clear(self) -> None:
+        '''Delete all stored tables.'''
+        for path in self.directory.glob('*.npy'):
+            path.unlink(missing_ok=True)
@@ -0,0 +1,211 @@
+'''LRU cache of computed holograms with an optional disk tier.'''
+from __future__ import annotations
+
+import logging
+from collections import OrderedDict
+from collections.abc import Mapping
+from pathlib import Path
+
+import numpy as np
+
+from QHOT.lib.traps.TrapSnapshot import TrapSnapshot
+from .diskcache import save_npy, settings_key
+
+
+__all__ = ['HologramCache']
+
+logger = logging.getLogger(__name__)
+
+
+class HologramCache:
+
+    '''Least-recently-used cache of finished holograms.
+
+    Undoing, redoing, repeating and loading trap configurations often
+    returns to a scene whose hologram was computed before.  Holograms
+    are stored under a key that combines the canonical digest of the
+    trap state (``TrapSnapshot.digest``) with a hash of the
+    calibration, so an equal scene finds its hologram whichever trap
+    objects it is made of and in whatever order they are stored.
+
+    Holograms are kept in memory up to ``budget`` megabytes.  If a
+    ``directory`` is given, every hologram is also written there as an
+    ``.npy`` file named by its key, and holograms that are not in
+    memory are looked up on disk, so they are reused in later
+    sessions.  The disk tier is not bounded; ``clear`` empties it.
+
+    Parameters
+    ----------
+    budget : float
+        Memory budget of the in-memory tier [MB].  ``0`` means
+        unlimited.  Default: 64.
+    directory : str, Path or None
+        Directory of the disk tier, created if necessary.  Default:
+        ``None``, which keeps holograms in memory only.
+
+    Attributes
+    ----------
+    budget : float
+        Memory budget of the in-memory tier [MB].
+    directory : Path or None
+        Directory of the disk tier.
+    nbytes : int
+        Total size of the holograms held in memory [bytes].
+    hits, loads, misses, evictions : int
+        Numbers of holograms found in memory, found on disk, not
+        found, and evicted from memory, since construction or
+        ``resetStats``.
+    '''
+
+    version = 1
+
+    def __init__(self, budget: float = 64.,
+                 directory: str | Path | None = None) -> None:
+        self.budget = float(budget)
+        self.directory = None if directory is None else Path(directory)
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+        self._data: OrderedDict[str, np.ndarray] = OrderedDict()
+        self.nbytes = 0
+        self.resetStats()
+
+    @classmethod
+    def key(cls, snapshot: TrapSnapshot,
+            calibration: Mapping[str, object]) -> str:
+        '''Return the key of the hologram of a scene.
+
+        Parameters
+        ----------
+        snapshot : TrapSnapshot
+            State of the traps.
+        calibration : Mapping[str, object]
+            Settings that determine the hologram of a given scene,
+            such as ``CGH.settings``, the backend and its dtype.
+
+        Returns
+        -------
+        str
+            Hexadecimal digest, independent of the order of
+            ``calibration`` and of the rows of ``snapshot``.
+        '''
+        return settings_key(calibration, cls.version, snapshot.digest)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._data
+
+    @property
+    def limit(self) -> int | None:
+        '''Memory budget [bytes], or ``None`` if unlimited.'''
+        return int(self.budget * 2**20) or None
+
+    def path(self, key: str) -> Path | None:
+        '''Return the file in which a hologram is stored on disk.'''
+        if self.directory is None:
+            return None
+        return self.directory / f'hologram-{key}.npy'
+
+    def get(self, key: str) -> np.ndarray | None:
+        '''Return a stored hologram, or ``None`` if there is none.
+
+        Holograms found on disk are loaded into memory.  The returned
+        array must not be modified.
+        '''
+        hologram = self._data.get(key)
+        if hologram is not None:
+            self._data.move_to_end(key)
+            self.hits += 1
+            return hologram
+        hologram = self._load(key)
+        if hologram is None:
+            self.misses += 1
+            return None
+        self.loads += 1
+        self._remember(key, hologram)
+        return hologram
+
+    def put(self, key: str, hologram: np.ndarray) -> None:
+        '''Store a copy of a hologram in memory and, if set, on disk.'''
+        hologram = np.array(hologram, dtype=np.uint8)
+        hologram.flags.writeable = False
+        self._remember(key, hologram)
+        self._save(key, hologram)
+
+    def _remember(self, key: str, hologram: np.ndarray) -> None:
+        '''Keep a hologram in memory, evicting the oldest if needed.'''
+        old = self._data.pop(key, None)
+        if old is not None:
+            self.nbytes -= old.nbytes
+        self._data[key] = hologram
+        self.nbytes += hologram.nbytes
+        limit = self.limit
+        while limit is not None and self.nbytes > limit and len(self) > 1:
+            _, oldest = self._data.popitem(last=False)
+            self.nbytes -= oldest.nbytes
+            self.evictions += 1
+
+    def _load(self, key: str) -> np.ndarray | None:
+        '''Read a hologram from the disk tier, if it is there.'''
+        path = self.path(key)
+        if path is None or not path.exists():
+            return None
+        try:
+            hologram = np.load(path)
+        except (OSError, ValueError) as error:
+            logger.warning(f'could not load {path}: {error}')
+            return None
+        hologram.flags.writeable = False
+        return hologram
+
+    def _save(self, key: str, hologram: np.ndarray) -> None:
+        '''Write a hologram to the disk tier, if there is one.
+
+        The file is written under a temporary name and then renamed,
+        so readers never see a partial hologram.  Failures are logged
+        and otherwise ignored.
+        '''
+        path = self.path(key)
+        if path is None or path.exists():
+            return
+        save_npy(path, hologram)
+
+    def clear(self) -> None:
+        '''Discard all holograms, in memory and on disk.'''
+        self._data.clear()
+        self.nbytes = 0
+        if self.directory is not None:
+            for path in self.directory.glob('hologram-*.npy'):
+                path.unlink(missing_ok=True)
+
+    def resetStats(self) -> None:
+        '''Reset the hit, load, miss and eviction counters.'''
+        self.hits = 0
+        self.loads = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def hitrate(self) -> float:
+        '''Fraction of lookups answered from memory or disk.'''
+        lookups = self.hits + self.loads + self.misses
+        return (self.hits + self.loads) / lookups if lookups else 0.
+
+    @property
+    def stats(self) -> dict[str, int | float]:
+        '''Usage counters and current size of the cache.
+
+        Returns
+        -------
+        dict[str, int or float]
+            ``entries``, ``nbytes``, ``hits``, ``loads``, ``misses``,
+            ``evictions`` and ``hitrate``.
+        '''
+        return dict(entries=len(self),
+                    nbytes=self.nbytes,
+                    hits=self.hits,
+                    loads=self.loads,
+                    misses=self.misses,
+                    evictions=self.evictions,
+                    hitrate=self.hitrate)
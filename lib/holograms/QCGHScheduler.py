@@ -0,0 +1,202 @@
+'''Latest-wins scheduling of hologram computations.'''
+from __future__ import annotations
+
+import logging
+import threading
+
+from pyqtgraph.Qt import QtCore
+
+from QHOT.lib.traps import QTrap, TrapSnapshot
+from .CGH import CGH, ComputeCancelled
+
+
+__all__ = ['QCGHScheduler']
+
+logger = logging.getLogger(__name__)
+
+
+class QCGHScheduler(QtCore.QObject):
+
+    '''Computes holograms for the newest trap state at its own rate.
+
+    Producers hand a ``TrapSnapshot`` of the traps to ``submit``
+    whenever the traps change.  Only the most recent submission is
+    kept: a newer state replaces an older one that has not been
+    computed yet.
+    A timer owned by the scheduler calls ``process`` at ``rate``
+    computations per second, independently of the rate at which the
+    camera image is rendered.
+
+    While a hologram is being computed, a newer submission cancels it
+    between traps (see ``CGH.cancelled``) and the newest state is
+    computed at once.  At most ``max_cancellations`` computations in a
+    row are abandoned, so that the hologram keeps up with continuous
+    changes such as a drag.
+
+    The scheduler is meant to live in the thread of its ``CGH``::
+
+        scheduler = QCGHScheduler(cgh)
+        scheduler.moveToThread(thread)
+        thread.started.connect(scheduler.start)
+
+    ``submit`` and the ``rate`` setter may be called from any thread.
+
+    Parameters
+    ----------
+    cgh : CGH
+        Hologram computation engine.
+    rate : float
+        Maximum number of holograms computed per second.  Default: 30.
+    parent : QtCore.QObject or None
+        Qt parent object.
+
+    Attributes
+    ----------
+    cgh : CGH
+        Hologram computation engine.
+    max_cancellations : int
+        Maximum number of consecutive computations that may be
+        abandoned for newer states.  Default: 1.
+    submitted, computed, dropped, abandoned : int
+        Numbers of states submitted, holograms computed, states
+        replaced before they were started, and computations cancelled
+        by newer states, since construction or ``resetStats``.
+    '''
+
+    max_cancellations = 1
+
+    _rateRequested = QtCore.pyqtSignal(float)
+
+    def __init__(self, cgh: CGH,
+                 rate: float = 30.,
+                 parent: QtCore.QObject | None = None) -> None:
+        super().__init__(parent)
+        self.cgh = cgh
+        self._lock = threading.Lock()
+        self._pending: TrapSnapshot | None = None
+        self._streak = 0
+        self._rate = float(rate)
+        self._timer = QtCore.QTimer(self)
+        self._timer.setInterval(self._interval(self._rate))
+        self._timer.timeout.connect(self.process)
+        self._rateRequested.connect(self._setRate)
+        self.resetStats()
+
+    @staticmethod
+    def _interval(rate: float) -> int:
+        '''Return the timer interval [ms] for a rate [Hz].'''
+        return max(1, round(1000. / rate))
+
+    @property
+    def rate(self) -> float:
+        '''Maximum number of holograms computed per second [Hz].'''
+        return self._rate
+
+    @rate.setter
+    def rate(self, rate: float) -> None:
+        rate = float(rate)
+        if rate <= 0.:
+            raise ValueError(f'rate must be positive, not {rate}')
+        self._rate = rate
+        self._rateRequested.emit(rate)
+
+    @QtCore.pyqtSlot(float)
+    def _setRate(self, rate: float) -> None:
+        '''Apply a new rate in the scheduler's own thread.'''
+        self._timer.setInterval(self._interval(rate))
+
+    @property
+    def pending(self) -> bool:
+        '''True if a submitted state is waiting to be computed.'''
+        return self._pending is not None
+
+    @QtCore.pyqtSlot()
+    def start(self) -> None:
+        '''Start computing submitted states.'''
+        self._timer.start()
+
+    @QtCore.pyqtSlot()
+    def stop(self) -> None:
+        '''Stop computing submitted states.'''
+        self._timer.stop()
+
+    def submit(self, traps: TrapSnapshot | list[QTrap]) -> None:
+        '''Make ``traps`` the newest state to be computed.
+
+        Replaces any state that has not been computed yet and cancels
+        a computation in progress.  Safe to call from any thread.
+
+        Parameters
+        ----------
+        traps : TrapSnapshot or list[QTrap]
+            Snapshot of the traps to include in the hologram.  A list
+            of traps (or group members) is recorded in a snapshot
+            immediately, in the calling thread.
+        '''
+        if not isinstance(traps, TrapSnapshot):
+            traps = TrapSnapshot.of(traps)
+        with self._lock:
+            if self._pending is not None:
+                self.dropped += 1
+            self._pending = traps
+            self.submitted += 1
+
+    def _take(self) -> TrapSnapshot | None:
+        '''Remove and return the newest submitted state, if any.'''
+        with self._lock:
+            traps, self._pending = self._pending, None
+        return traps
+
+    def _superseded(self) -> bool:
+        '''Return True if the computation in progress should stop.'''
+        return (self._pending is not None and
+                self._streak < self.max_cancellations)
+
+    @QtCore.pyqtSlot()
+    def process(self) -> None:
+        '''Compute the hologram for the newest submitted state.
+
+        Does nothing if no state is waiting.  A computation that is
+        cancelled by a newer submission is followed immediately by
+        the computation of that submission.
+        '''
+        while (traps := self._take()) is not None:
+            self.cgh.cancelled = self._superseded
+            try:
+                self.cgh.compute(traps)
+            except ComputeCancelled:
+                logger.debug('superseded hologram abandoned')
+                self.abandoned += 1
+                self._streak += 1
+                continue
+            except Exception as error:
+                logger.warning(f'hologram computation failed: {error}')
+                self._streak = 0
+                return
+            finally:
+                self.cgh.cancelled = None
+            self.computed += 1
+            self._streak = 0
+            return
+
+    def resetStats(self) -> None:
+        '''Reset the submission and computation counters.'''
+        self.submitted = 0
+        self.computed = 0
+        self.dropped = 0
+        self.abandoned = 0
+
+    @property
+    def stats(self) -> dict[str, int]:
+        '''Submission and computation counters.
+
+        Returns
+        -------
+        dict[str, int]
+            ``submitted``, ``computed``, ``dropped`` and
+            ``abandoned``.
+        '''
+        return dict(submitted=self.submitted,
+                    computed=self.computed,
+                    dropped=self.dropped,
+                    abandoned=self.abandoned)
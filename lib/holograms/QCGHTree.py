@@ -13,8 +13,16 @@ class QCGHTree(ParameterTree):
     '''Parameter tree widget for editing CGH calibration settings.
 
     Displays all CGH calibration parameters grouped by subsystem
-    (instrument, SLM, camera) and synchronises changes bidirectionally
-    with a connected ``CGH`` instance.
+    (instrument, SLM, camera), together with the performance settings
+    of the CGH caches, and synchronises changes bidirectionally with a
+    connected ``CGH`` instance.
+
+    Edits are coalesced: changes reported by the tree are collected,
+    and at most once every ``interval`` milliseconds they are applied
+    to the CGH together in one ``CGH.batch``.  Typing in or dragging a
+    spinbox, or loading a saved configuration, therefore triggers one
+    geometry rebuild and one hologram recomputation per burst of
+    changes rather than one per parameter value.
 
     Parameters
     ----------
@@ -32,13 +40,22 @@ class QCGHTree(ParameterTree):
         Current values of all parameters, keyed by parameter name.
     properties : KeysView[str]
         Names of all registered parameters.
+    interval : int
+        Time over which parameter changes are collected before they
+        are applied to the CGH [ms].  Default: 50.
     '''
 
+    interval = 50
+
     def __init__(self, *args,
                  cgh: CGH | None = None,
                  **kwargs) -> None:
         super().__init__(*args, **kwargs)
         self._cgh: CGH | None = cgh
+        self._changes: dict[str, object] = {}
+        self._timer = QtCore.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self.flush)
         self._setupUi()
         self._connectSignals()
         self.updateTree()
@@ -85,8 +102,12 @@ class QCGHTree(ParameterTree):
                  value=0., default=0., suffix='pixels'),
             dict(name='thetac', type='float',
                  value=0., default=0., suffix='°')])
+        performance = dict(name='performance', type='group', children=[
+            dict(name='cachebudget', type='float',
+                 value=1024., default=1024., limits=(0., None),
+                 suffix='MB')])
         return Parameter.create(name='params', type='group',
-                                children=[instr, slm, camera])
+                                children=[instr, slm, camera, performance])
 
     def _getParameters(self, parameter: Parameter) -> dict[str, Parameter]:
         '''Recursively index all leaf parameters by name.
@@ -118,6 +139,7 @@ class QCGHTree(ParameterTree):
     def cgh(self, cgh: CGH | None) -> None:
         if cgh is self._cgh:
             return
+        self.flush()
         self._cgh = cgh
         self.updateTree()
 
@@ -182,8 +204,10 @@ class QCGHTree(ParameterTree):
     def updateCGH(self, tree: Parameter, changes: list) -> None:
         '''Slot called when any parameter value changes.
 
-        Applies the changed value to the connected CGH instance if the
-        parameter name matches a known CGH field.
+        Records changed values of known CGH fields and schedules
+        ``flush`` to apply them after ``interval`` milliseconds, unless
+        a flush is already scheduled.  Later changes to the same
+        parameter replace earlier ones.
 
         Parameters
         ----------
@@ -199,9 +223,22 @@ class QCGHTree(ParameterTree):
             if change == 'value':
                 key = param.name()
                 if key in self._cgh.properties:
-                    setattr(self._cgh, key, value)
+                    self._changes[key] = value
                 else:
                     logger.warning(f'CGH has no field: {key}')
+        if self._changes and not self._timer.isActive():
+            self._timer.start(self.interval)
+
+    @QtCore.pyqtSlot()
+    def flush(self) -> None:
+        '''Apply all pending parameter changes to the CGH in one batch.'''
+        self._timer.stop()
+        changes, self._changes = self._changes, {}
+        if self._cgh is None or not changes:
+            return
+        with self._cgh.batch():
+            for key, value in changes.items():
+                setattr(self._cgh, key, value)
 
     def updateTree(self) -> None:
         '''Populate the tree with the current CGH settings.
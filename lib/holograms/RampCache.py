@@ -0,0 +1,108 @@
+'''LRU cache of phase-ramp vectors.'''
+from __future__ import annotations
+
+import logging
+from collections import OrderedDict
+from collections.abc import Hashable
+
+
+__all__ = ['RampCache']
+
+logger = logging.getLogger(__name__)
+
+
+class RampCache:
+
+    '''Least-recently-used mapping of coordinates to phase-ramp vectors.
+
+    The displacement field of a trap is the outer product of a row
+    vector that depends only on its ``(y, z)`` coordinates and a
+    column vector that depends only on its ``(x, z)`` coordinates.
+    Traps that move back and forth along the same paths revisit the
+    same coordinates, so their vectors can be looked up instead of
+    being recomputed.  ``CGH`` keys the vectors by their quantized
+    SLM-plane coordinates.
+
+    The cache holds at most ``size`` vectors.  Cached vectors are
+    shared by every trap at the same coordinates and must not be
+    modified.
+
+    Parameters
+    ----------
+    size : int
+        Maximum number of vectors.  ``0`` disables the cache.
+        Default: 4096.
+
+    Attributes
+    ----------
+    size : int
+        Maximum number of vectors.  Assigning a smaller value evicts
+        the least-recently-used vectors immediately.
+    hits, misses, evictions : int
+        Usage counters since construction or ``resetStats``.
+    '''
+
+    def __init__(self, size: int = 4096) -> None:
+        self._data: OrderedDict[Hashable, object] = OrderedDict()
+        self._size = int(size)
+        self.resetStats()
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    @size.setter
+    def size(self, size: int) -> None:
+        self._size = max(0, int(size))
+        self._trim()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def get(self, key: Hashable) -> object:
+        '''Return the vector for ``key``, or ``None`` if not cached.'''
+        vector = self._data.get(key)
+        if vector is None:
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return vector
+
+    def __setitem__(self, key: Hashable, vector: object) -> None:
+        self._data[key] = vector
+        self._data.move_to_end(key)
+        self._trim()
+
+    def _trim(self) -> None:
+        '''Evict least-recently-used vectors until within ``size``.'''
+        while len(self._data) > self._size:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        '''Remove all vectors.'''
+        self._data.clear()
+
+    def resetStats(self) -> None:
+        '''Reset the hit, miss, and eviction counters.'''
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def stats(self) -> dict[str, int]:
+        '''Usage counters and current size of the cache.
+
+        Returns
+        -------
+        dict[str, int]
+            ``entries``, ``hits``, ``misses`` and ``evictions``.
+        '''
+        return dict(entries=len(self),
+                    hits=self.hits,
+                    misses=self.misses,
+                    evictions=self.evictions)
@@ -0,0 +1,205 @@
+'''Multi-threaded CPU CGH computation pipeline.
+
+NumPy releases the GIL inside ufuncs and BLAS calls, so the full-frame
+arithmetic of the CGH pipeline can be spread over several cores by
+splitting the hologram into bands of rows and processing the bands in
+a thread pool.
+'''
+import logging
+import os
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from pyqtgraph.Qt import QtCore
+
+from QHOT.lib.types import Field, Hologram
+from QHOT.lib.traps import QTrap, TrapSnapshot
+from .CGH import CGH, Rank1
+
+
+logger = logging.getLogger(__name__)
+
+
+class ThreadedCGH(CGH):
+
+    '''CGH pipeline that processes row tiles in a thread pool.
+
+    Bookkeeping (trap caches, phase-ramp vectors, the running sum)
+    is shared with ``CGH``.  Every full-frame operation, that is the
+    batched matrix product, the addition of structured fields, and
+    quantization, is split into tiles of ``tilerows`` rows that are
+    processed concurrently.  ``compute`` updates and quantizes each
+    tile in a single task, so the tile stays in the core's cache
+    while it is accumulated and quantized.
+
+    The result matches the hologram computed by ``CGH`` up to float32
+    round-off, which can change isolated pixels by one least-significant
+    bit.
+
+    Parameters
+    ----------
+    workers : int or None
+        Number of worker threads.  Defaults to ``os.cpu_count()``.
+    *args, **kwargs
+        Forwarded to ``CGH.__init__``.
+
+    Attributes
+    ----------
+    workers : int
+        Number of worker threads.
+    tilerows : int
+        Number of hologram rows per tile.  Default: 32.
+
+    Notes
+    -----
+    Because accumulation and quantization are fused,
+    ``statistics['timing']['accumulate']`` covers only the bookkeeping
+    of the traps, and ``'quantize'`` covers the tile arithmetic.
+
+    ``stop`` shuts down the thread pool.  A new pool is started by
+    the next computation that needs one.
+
+    Multithreaded BLAS libraries start their own threads inside every
+    matrix product.  Setting ``OPENBLAS_NUM_THREADS=1`` (or the
+    equivalent for MKL) avoids oversubscribing the cores.
+    '''
+
+    tilerows = 32
+
+    def __init__(self, *args, workers: int | None = None, **kwargs) -> None:
+        self.workers = workers or os.cpu_count() or 1
+        self._pool = None
+        self._deferred = None
+        super().__init__(*args, **kwargs)
+
+    def updateGeometry(self) -> None:
+        '''Recompute geometry and the partition of the frame into tiles.'''
+        super().updateGeometry()
+        self._tiles = [slice(start, start + self.tilerows)
+                       for start in range(0, self.height, self.tilerows)]
+
+    def _parallel(self, task: Callable[[slice], None]) -> None:
+        '''Apply ``task`` to every tile in the thread pool.
+
+        Parameters
+        ----------
+        task : Callable[[slice], None]
+            Function of the row slice of one tile.  Exceptions raised
+            by any tile are propagated.
+
+        Notes
+        -----
+        While ``_render`` accumulates the field, tasks are deferred
+        and then applied to each tile just before it is quantized.
+        '''
+        if self._deferred is not None:
+            self._deferred.append(task)
+            return
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix='ThreadedCGH')
+        for _ in self._pool.map(task, self._tiles):
+            pass
+
+    def _product(self, factors: list[Rank1], out: Field) -> None:
+        '''Overwrite ``out`` with the sum of factorized fields by tiles.'''
+        ey, ex = self._stack(factors)
+
+        def task(rows: slice) -> None:
+            np.matmul(ey[rows], ex, out=out[rows])
+        self._parallel(task)
+
+    def _addProduct(self, factors: list[Rank1], out: Field) -> None:
+        '''Add the sum of factorized fields to ``out``, tile by tile.'''
+        ey, ex = self._stack(factors)
+
+        def task(rows: slice) -> None:
+            out[rows] += ey[rows] @ ex
+        self._parallel(task)
+
+    def _addStructured(self, terms: list[tuple[Rank1, Field | None]],
+                       out: Field) -> None:
+        '''Add the fields of structured items to ``out``, tile by tile.'''
+        if not terms:
+            return
+
+        def task(rows: slice) -> None:
+            tile = out[rows]
+            for factor, structure in terms:
+                field = np.multiply.outer(
+                    factor.coefficient * factor.ey[rows], factor.ex)
+                if structure is not None:
+                    field *= structure[rows]
+                tile += field
+        self._parallel(task)
+
+    def _sum(self, items: list[QTrap], out: Field) -> Field:
+        '''Sum the fields of traps or groups into ``out``, tile by tile.
+
+        Plain tweezers are superposed by ``_product`` in ``batched``
+        mode; all other items are added together by ``_addStructured``
+        from their cached factors and structures.  Only the tiles of
+        the accumulator are deferred by ``_render``: any other sum,
+        such as the children of a group whose structure is being
+        built, is used at once and so is computed immediately.
+        '''
+        if self._deferred is not None and out is not self._accumulator:
+            deferred, self._deferred = self._deferred, None
+            try:
+                return self._sum(items, out)
+            finally:
+                self._deferred = deferred
+        plain = []
+        if self.batched:
+            plain = [item for item in items if self._isPlain(item)]
+            items = [item for item in items if not self._isPlain(item)]
+        self._superpose(plain, out)
+        self._addStructured([self._contributionOf(item) for item in items],
+                            out)
+        return out
+
+    def _render(self, snapshot: TrapSnapshot) -> Hologram:
+        '''Compute the phase hologram, one tile per task.
+
+        The updates of the field are collected while the traps are
+        accumulated, and each task applies them to its tile before
+        quantizing it.
+
+        Parameters
+        ----------
+        snapshot : TrapSnapshot
+            State of the traps to include in the hologram.
+
+        Returns
+        -------
+        Hologram
+            Quantized phase hologram as a uint8 array.
+        '''
+        updates = self._deferred = []
+        try:
+            with self._timed('accumulate'):
+                field = self._accumulate(snapshot)
+        finally:
+            self._deferred = None
+        phase = self._hologramBuffer()
+
+        def task(rows: slice) -> None:
+            for update in updates:
+                update(rows)
+            self.quantize(field[rows], out=phase[rows])
+        with self._timed('quantize'):
+            self._parallel(task)
+        return phase
+
+    @QtCore.pyqtSlot()
+    def stop(self) -> None:
+        '''Shut down the CGH pipeline and its thread pool.
+
+        The pool is restarted by the next computation, so the
+        pipeline remains usable after ``stop``.
+        '''
+        super().stop()
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
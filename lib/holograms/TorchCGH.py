@@ -4,11 +4,10 @@ Supports NVIDIA CUDA, AMD ROCm, and Apple Silicon MPS via a single
 implementation that selects the best available device at startup.
 '''
 import numpy as np
-from pyqtgraph.Qt import QtCore, QtGui
 
 from QHOT.lib.types import Field, Hologram
-from QHOT.lib.traps import QTrap, QTrapGroup
-from .CGH import CGH
+from QHOT.lib.traps import TrapSnapshot
+from .CGH import CGH, Rank1, _power
 
 try:
     import torch
@@ -40,9 +39,22 @@ class TorchCGH(CGH):
 
     Automatically selects the best available device (Apple Silicon
     MPS, NVIDIA/AMD CUDA/ROCm, or CPU).  Displacement-field
-    computation and per-frame accumulation run on-device; structure
-    arrays (which depend on ``theta`` and ``qr``) and the final
-    quantize step run on the CPU.
+    computation and per-frame accumulation run on-device, and the
+    factorized displacement fields in ``_field_cache`` hold on-device
+    vectors.  The coordinate arrays ``theta`` and ``qr`` are device
+    tensors, so structures built from ``helical`` and ``bessel`` are
+    generated on-device as well.  Structures computed by other means
+    as NumPy arrays are uploaded.
+
+    The phase is quantized on-device and only the uint8 hologram is
+    copied to one of two reused host buffers, one byte per pixel
+    instead of eight.  On CUDA devices the buffers are page-locked and
+    the hologram is processed in ``bands`` row bands: the copy of each
+    band runs on a separate stream while the next band is quantized.
+    On the CPU device the field already resides in host memory, so
+    ``quantize`` writes into the host buffer through a zero-copy view;
+    torch's scalar CPU ``angle`` would be several times slower.
+    ``statistics['timing']`` reports the ``transfer`` stage.
 
     Requires the ``torch`` package (``pip install torch``).  For AMD
     GPUs install the ROCm wheel instead of the default CUDA wheel.
@@ -52,12 +64,20 @@ class TorchCGH(CGH):
     *args, **kwargs
         Forwarded to ``CGH.__init__``.
 
+    Attributes
+    ----------
+    bands : int
+        Number of row bands whose device-to-host copies overlap with
+        quantization on CUDA devices.  Default: 4.
+
     Raises
     ------
     ImportError
         If ``torch`` is not installed.
     '''
 
+    bands = 4
+
     def __init__(self, *args, **kwargs) -> None:
         if torch is None:
             raise ImportError(
@@ -70,9 +90,11 @@ class TorchCGH(CGH):
         '''Recompute geometry, storing phase-ramp vectors on-device.
 
         Calls the base ``updateGeometry`` to build ``iqx``, ``iqy``,
-        ``iqxz``, ``iqyz``, ``theta``, and ``qr`` as NumPy arrays,
-        then uploads the phase-ramp vectors to ``self.device`` as
-        torch tensors and allocates the on-device field accumulator.
+        ``iqxz`` and ``iqyz`` as NumPy arrays, then uploads them to
+        ``self.device`` as torch tensors and allocates the on-device
+        field accumulator, the quantization buffers and the host
+        hologram buffers.  The lazily built tables ``theta`` and
+        ``qr`` are computed on-device.
         '''
         super().updateGeometry()
         self._tiqx = torch.as_tensor(self.iqx, device=self.device)
@@ -81,86 +103,281 @@ class TorchCGH(CGH):
         self._tiqyz = torch.as_tensor(self.iqyz, device=self.device)
         self._torch_field = torch.zeros(
             self.shape, dtype=torch.complex64, device=self.device)
+        self._tphase = torch.empty(self.shape, dtype=torch.float32,
+                                   device=self.device)
+        self._tcode = torch.empty(self.shape, dtype=torch.int16,
+                                  device=self.device)
+        self._tholo = torch.empty(self.shape, dtype=torch.uint8,
+                                  device=self.device)
+        pinned = self.device.type == 'cuda'
+        self._hosts = [torch.zeros(self.shape, dtype=torch.uint8,
+                                   pin_memory=pinned)
+                       for _ in range(2)]
+        self._holograms = [host.numpy() for host in self._hosts]
+        self._copy_stream = torch.cuda.Stream(self.device) if pinned else None
+        step = -(-self.height // self.bands)
+        self._bands = [slice(start, start + step)
+                       for start in range(0, self.height, step)]
+
+    def _ramps(self, r: np.ndarray
+               ) -> tuple['torch.Tensor', 'torch.Tensor']:
+        '''Compute on-device phase-ramp vectors for many SLM positions.
+
+        Parameters
+        ----------
+        r : np.ndarray
+            SLM-plane coordinates, shape ``(N, 3)``, dtype float32.
+
+        Returns
+        -------
+        ey : torch.Tensor
+            Row vectors on ``self.device``, shape ``(N, height)``.
+        ex : torch.Tensor
+            Column vectors on ``self.device``, shape ``(N, width)``.
+        '''
+        r = torch.as_tensor(r, device=self.device)
+        rx, ry, rz = r[:, 0:1], r[:, 1:2], r[:, 2:3]
+        ex = torch.exp(rx * self._tiqx + rz * self._tiqxz)
+        ey = torch.exp(ry * self._tiqy + rz * self._tiqyz)
+        return ey, ex
+
+    def _split(self, vectors: 'torch.Tensor') -> list['torch.Tensor']:
+        '''Split stacked vectors into rows that own their memory.'''
+        return [vector.clone() for vector in vectors]
+
+    def _newField(self) -> 'torch.Tensor':
+        '''Return an uninitialized on-device field buffer.'''
+        return torch.empty(self.shape, dtype=torch.complex64,
+                           device=self.device)
+
+    def _asStructure(self, structure: Field) -> 'torch.Tensor':
+        '''Upload a NumPy structure array to ``self.device``.
 
-    def fieldOf(self, trap: QTrap) -> 'torch.Tensor':
-        '''Compute the on-device complex field contribution of a trap.
+        Scalars and tensors are returned unchanged.
+        '''
+        if isinstance(structure, np.ndarray):
+            return torch.as_tensor(structure.astype(np.complex64),
+                                   device=self.device)
+        return structure
 
-        The displacement field is computed from on-device phase-ramp
-        vectors.  Structure fields returned by ``trap.structure()``
-        are uploaded to the device on first use.  Caching semantics
-        are identical to the base class.
+    def _product(self, factors: list[Rank1],
+                 out: 'torch.Tensor') -> None:
+        '''Overwrite ``out`` with the sum of factorized fields on-device.
 
         Parameters
         ----------
-        trap : QTrap
-            The trap or group to compute the field for.
+        factors : list[Rank1]
+            Non-empty list of factorized fields with on-device vectors.
+        out : torch.Tensor
+            Full-frame on-device buffer that receives the sum.
+        '''
+        ey, ex = self._stack(factors)
+        torch.matmul(ey, ex, out=out)
+
+    def _stack(self, factors: list[Rank1]
+               ) -> tuple['torch.Tensor', 'torch.Tensor']:
+        '''Stack factorized fields into on-device weighted matrices.
 
         Returns
         -------
-        torch.Tensor
-            Complex field tensor on ``self.device`` with shape
-            ``self.shape``.
+        ey : torch.Tensor
+            Row vectors scaled by their coefficients, as columns,
+            shape ``(height, N)``.
+        ex : torch.Tensor
+            Column vectors, shape ``(N, width)``.
         '''
-        self._connectTrap(trap)
-        if trap not in self._field_cache:
-            r = self.transform(QtGui.QVector3D(*trap.r))
-            rx = np.float32(r.x())
-            ry = np.float32(r.y())
-            rz = np.float32(r.z())
-            ex = torch.exp(self._tiqx * rx + self._tiqxz * rz)
-            ey = torch.exp(self._tiqy * ry + self._tiqyz * rz)
-            if isinstance(trap, QTrapGroup):
-                self._field_cache[trap] = torch.outer(ey, ex)
-            else:
-                amplitude = np.complex64(
-                    trap.amplitude * np.exp(1j * trap.phase))
-                amp_t = torch.tensor(
-                    complex(amplitude),
-                    dtype=torch.complex64, device=self.device)
-                self._field_cache[trap] = torch.outer(amp_t * ey, ex)
-        if trap not in self._structure_cache:
-            if isinstance(trap, QTrapGroup):
-                child_sum = sum(
-                    (self.fieldOf(child) for child in trap),
-                    torch.zeros(self.shape, dtype=torch.complex64,
+        if not factors:
+            return (torch.empty((self.height, 0), dtype=torch.complex64,
+                                device=self.device),
+                    torch.empty((0, self.width), dtype=torch.complex64,
                                 device=self.device))
-                self._structure_cache[trap] = (
-                    child_sum * self._field_cache[trap].conj())
-            elif hasattr(trap, 'structure'):
-                s = trap.structure(self)
-                if isinstance(s, np.ndarray):
-                    self._structure_cache[trap] = torch.as_tensor(
-                        s.astype(np.complex64), device=self.device)
-                else:
-                    self._structure_cache[trap] = s
-            else:
-                self._structure_cache[trap] = 1.
-        return self._field_cache[trap] * self._structure_cache[trap]
-
-    @QtCore.pyqtSlot(list)
-    def compute(self, traps: list[QTrap]) -> Hologram:
-        '''Compute the phase hologram on-device, then transfer to CPU.
+        amplitudes = torch.tensor([f.coefficient for f in factors],
+                                  dtype=torch.complex64, device=self.device)
+        ey = torch.stack([f.ey for f in factors], dim=1) * amplitudes
+        ex = torch.stack([f.ex for f in factors])
+        return ey, ex
+
+    def _coordinates(self) -> tuple['torch.Tensor', 'torch.Tensor']:
+        '''Return on-device SLM coordinates as a column and a row.'''
+        y = torch.as_tensor(self._y, dtype=torch.float32,
+                            device=self.device)
+        x = torch.as_tensor(self._x, dtype=torch.float32,
+                            device=self.device)
+        return y[:, None], x[None, :]
+
+    def _buildTheta(self) -> 'torch.Tensor':
+        return torch.atan2(*self._coordinates())
+
+    def _buildQr(self) -> 'torch.Tensor':
+        y, x = self._coordinates()
+        return torch.hypot(self.qprp * y, self.qprp * x)
+
+    def _buildPhasor(self) -> 'torch.Tensor':
+        return torch.polar(torch.ones(self.shape, device=self.device),
+                           self.theta)
+
+    @property
+    def _accumulator(self) -> 'torch.Tensor':
+        '''On-device complex field accumulator.'''
+        return self._torch_field
+
+    def helical(self, ell: float) -> 'torch.Tensor':
+        '''Return the helical phase ``exp(i ell theta)`` on-device.
+
+        Integer orders are powers of the on-device unit phasor, as in
+        ``CGH.helical``.
+        '''
+        if ell == 0 or ell != int(ell):
+            return torch.polar(torch.ones_like(self.theta), ell * self.theta)
+        power = _power(self._phasor, abs(int(ell)))
+        if ell < 0:
+            return power.conj().resolve_conj()
+        return power.clone() if power is self._phasor else power
+
+    def bessel(self, ell: float, radius: float) -> 'torch.Tensor':
+        '''Return the Bessel amplitude ``J_ell(radius * qr)`` on-device.
+
+        ``torch`` provides Bessel functions only of orders 0 and 1, so
+        the radial table of ``CGH._besselTable`` is computed on the CPU
+        and interpolated linearly on-device, with the accuracy
+        described in ``CGH.bessel``.  The table has one entry per
+        sample rather than per pixel, so generating a new ring
+        structure transfers a few kilobytes instead of a full frame.
 
         Parameters
         ----------
-        traps : list[QTrap]
-            Traps (or group members) to include in the hologram.
+        ell : float
+            Order of the Bessel function.
+        radius : float
+            Radius of the ring in the focal plane [pixels].
+
+        Returns
+        -------
+        torch.Tensor
+            Real amplitude mask of shape ``self.shape`` on
+            ``self.device``.
+        '''
+        table, scale = self._besselTable(ell, radius)
+        table = torch.as_tensor(table, device=self.device)
+        t = self.qr * scale
+        index = t.long().clamp_(max=len(table) - 2)
+        fraction = t - index
+        return torch.lerp(table[index], table[index + 1], fraction)
+
+    def _hologramBuffer(self) -> Hologram:
+        '''Return the next host hologram buffer, alternating as in CGH.'''
+        self._hosts.reverse()
+        return super()._hologramBuffer()
+
+    def _quantizeOnDevice(self, rows: slice, out: 'torch.Tensor',
+                          field: 'torch.Tensor | None' = None) -> None:
+        '''Quantize rows of the accumulated field into ``out``.
+
+        Uses the encoding of ``CGH.quantize``: the phase is scaled to
+        [-1, 255] and truncated toward zero; -1, which encodes a phase
+        of exactly -pi, wraps to 255.
+
+        Parameters
+        ----------
+        rows : slice
+            Rows of the field to quantize.
+        out : torch.Tensor
+            uint8 tensor with the shape of the selected rows.
+        field : torch.Tensor or None
+            Full-frame field to quantize instead of the accumulator.
+        '''
+        if field is None:
+            field = self._torch_field
+        phase = torch.angle(field[rows], out=self._tphase[rows])
+        phase.mul_(128./np.pi).add_(127.)
+        code = self._tcode[rows]
+        code.copy_(phase)
+        code.bitwise_and_(255)
+        out.copy_(code)
+
+    def _transfer(self, host: 'torch.Tensor') -> None:
+        '''Quantize the accumulated field and copy it to ``host``.
+
+        Parameters
+        ----------
+        host : torch.Tensor
+            uint8 host tensor that receives the hologram.
+        '''
+        if self.device.type == 'cpu':
+            with self._timed('quantize'):
+                self.quantize(self._torch_field.numpy(), out=host.numpy())
+            self._timing['transfer'] = 0.
+            return
+        if self._copy_stream is None:
+            with self._timed('quantize'):
+                self._quantizeOnDevice(slice(None), self._tholo)
+            with self._timed('transfer'):
+                host.copy_(self._tholo)
+            return
+        compute_stream = torch.cuda.current_stream(self.device)
+        with self._timed('quantize'):
+            for rows in self._bands:
+                self._quantizeOnDevice(rows, self._tholo[rows])
+                quantized = compute_stream.record_event()
+                self._copy_stream.wait_event(quantized)
+                with torch.cuda.stream(self._copy_stream):
+                    host[rows].copy_(self._tholo[rows], non_blocking=True)
+        with self._timed('transfer'):
+            self._copy_stream.synchronize()
+
+    def _render(self, snapshot: TrapSnapshot) -> Hologram:
+        '''Compute and quantize the phase hologram on-device.
+
+        Only the uint8 hologram is transferred to the host.
+
+        Parameters
+        ----------
+        snapshot : TrapSnapshot
+            State of the traps to include in the hologram.
 
         Returns
         -------
         Hologram
-            Quantized phase hologram as a uint8 NumPy array.
+            Quantized phase hologram as a uint8 NumPy array.  The array
+            is one of two reused host buffers that alternate between
+            calls.
+        '''
+        with self._timed('accumulate'):
+            self._accumulate(snapshot)
+        phase = self._hologramBuffer()
+        self._transfer(self._hosts[0])
+        return phase
+
+    def _stripProduct(self, ey: 'torch.Tensor', ex: 'torch.Tensor',
+                      strip: 'torch.Tensor', restart: bool) -> None:
+        '''Add, or assign if ``restart``, the product ``ey @ ex``.'''
+        if restart:
+            torch.matmul(ey, ex, out=strip)
+        else:
+            strip.addmm_(ey, ex)
+
+    def _strips(self) -> list[slice]:
+        '''Return the row strips in which ``computeMany`` sweeps.
+
+        Accelerators process the whole frame at once; the CPU device
+        uses cache-sized strips, as in ``CGH``.
+        '''
+        if self.device.type == 'cpu':
+            return super()._strips()
+        return [slice(None)]
+
+    def _quantizeStrip(self, strip: 'torch.Tensor', out: Hologram) -> None:
+        '''Quantize a strip of the running sum into a host hologram.
+
+        On the CPU device the strip is quantized through a zero-copy
+        view, as in ``_transfer``; otherwise it is quantized on-device
+        and only the uint8 result is copied to the host.
         '''
-        self._torch_field.zero_()
-        seen: set = set()
-        for trap in traps:
-            item = self._topLevel(trap)
-            if item not in seen:
-                self._torch_field += self.fieldOf(item)
-                seen.add(item)
-        self.phase = self.quantize(self._torch_field.cpu().numpy())
-        self.hologramReady.emit(self.phase)
-        return self.phase
+        if self.device.type == 'cpu':
+            super()._quantizeStrip(strip.numpy(), out)
+            return
+        self._quantizeOnDevice(slice(None), self._tholo, strip)
+        torch.from_numpy(out).copy_(self._tholo)
 
     def bless(self, field: Field | None) -> 'torch.Tensor | None':
         '''Cast a CPU array to complex64 and upload it to ``self.device``.
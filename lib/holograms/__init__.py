@@ -1,4 +1,5 @@
 from .CGH import CGH
 from .QCGHTree import QCGHTree
+from .QCGHScheduler import QCGHScheduler
 
-__all__ = 'CGH QCGHTree'.split()
+__all__ = 'CGH QCGHTree QCGHScheduler'.split()
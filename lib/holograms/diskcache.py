@@ -0,0 +1,67 @@
+'''Helpers shared by the on-disk caches of the CGH pipeline.
+
+``GeometryCache`` and ``HologramCache`` name their files by a hash of
+the settings that determine their contents and write them so that
+readers never see a partial file.
+'''
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+from collections.abc import Mapping
+from pathlib import Path
+
+import numpy as np
+
+
+__all__ = 'settings_key save_npy'.split()
+
+logger = logging.getLogger(__name__)
+
+
+def settings_key(settings: Mapping[str, object], *prefix: object) -> str:
+    '''Return a hash that identifies a set of settings.
+
+    Parameters
+    ----------
+    settings : Mapping[str, object]
+        Named settings.  Arrays and numpy scalars are hashed by value,
+        so ``np.float64(2.)`` and ``2.`` give the same key.
+    *prefix : object
+        Further values to hash, such as a format version.
+
+    Returns
+    -------
+    str
+        Hexadecimal digest, independent of the order of ``settings``.
+    '''
+    def canonical(value: object) -> str:
+        return repr(getattr(value, 'tolist', lambda: value)())
+    text = repr((*prefix, sorted(
+        (name, canonical(value)) for name, value in settings.items())))
+    return hashlib.sha256(text.encode()).hexdigest()[:32]
+
+
+def save_npy(path: Path, array: np.ndarray) -> None:
+    '''Write an array to an ``.npy`` file atomically.
+
+    The file is written under a temporary name and then renamed, so
+    readers never see a partial array.  Failures are logged and
+    otherwise ignored.
+
+    Parameters
+    ----------
+    path : Path
+        Destination file.
+    array : np.ndarray
+        Array to store.
+    '''
+    temporary = path.with_name(f'{path.stem}.{os.getpid()}.tmp')
+    try:
+        with open(temporary, 'wb') as f:
+            np.save(f, array)
+        os.replace(temporary, path)
+    except OSError as error:
+        logger.warning(f'could not save {path}: {error}')
+        temporary.unlink(missing_ok=True)
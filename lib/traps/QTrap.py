@@ -6,6 +6,7 @@ from pyqtgraph.Qt import QtCore
 from collections.abc import Iterator
 
 from QHOT.lib.types import Position
+from QHOT.lib.traps.TrapStore import TrapStore
 
 
 logger = logging.getLogger(__name__)
@@ -31,6 +32,13 @@ class QTrap(QtCore.QObject):
     phase : float
         Relative phase of the trap field [radians].
 
+    Notes
+    -----
+    Position, amplitude and phase are stored in a slot of a
+    ``TrapStore``: the store of the trap's parent if it has one,
+    otherwise a private store.  Traps in a ``QTrapOverlay`` therefore
+    share the overlay's contiguous arrays.
+
     Signals
     -------
     changed
@@ -52,14 +60,15 @@ class QTrap(QtCore.QObject):
                  phase: float | None = None,
                  locked: bool = False,
                  parent: QtCore.QObject | None = None) -> None:
-        super().__init__(parent)
-        self._r = np.array(r, dtype=float)
-        self._amplitude = float(amplitude)
-        self._phase = (np.random.uniform(0., 2.*np.pi)
-                       if phase is None else float(phase))
+        super().__init__()
+        phase = (np.random.uniform(0., 2.*np.pi)
+                 if phase is None else float(phase))
+        TrapStore(1).add(self, r, float(amplitude), phase)
         self._locked = bool(locked)
         self._index: int | None = None
         self._registerProperties()
+        if parent is not None:
+            self.setParent(parent)
 
     def __len__(self) -> int:
         return 1
@@ -73,6 +82,44 @@ class QTrap(QtCore.QObject):
         return (f'{name}(r=({x:.1f}, {y:.1f}, {z:.1f}), '
                 f'amplitude={self.amplitude:.2f}, phase={self.phase:.2f})')
 
+    def setParent(self, parent: QtCore.QObject | None) -> None:
+        '''Reparent the trap and move its state to the parent's store.
+
+        Traps (and groups) placed under a ``QTrapOverlay`` or a
+        ``QTrapGroup`` join their parent's ``TrapStore``; traps
+        without such a parent move to a private store.
+        '''
+        super().setParent(parent)
+        store = getattr(parent, '_store', None)
+        if not isinstance(store, TrapStore):
+            store = TrapStore(sum(1 for _ in TrapStore.subtree(self)))
+        store.adopt(self)
+
+    @property
+    def _r(self) -> np.ndarray:
+        '''View of the trap's position in its store.'''
+        return self._store.r[self._slot]
+
+    @_r.setter
+    def _r(self, r: npt.ArrayLike) -> None:
+        self._store.r[self._slot] = r
+
+    @property
+    def _amplitude(self) -> float:
+        return float(self._store.amplitude[self._slot])
+
+    @_amplitude.setter
+    def _amplitude(self, amplitude: float) -> None:
+        self._store.amplitude[self._slot] = amplitude
+
+    @property
+    def _phase(self) -> float:
+        return float(self._store.phase[self._slot])
+
+    @_phase.setter
+    def _phase(self, phase: float) -> None:
+        self._store.phase[self._slot] = phase
+
     def _registerProperties(self) -> None:
         '''Register the properties exposed to QTrapWidget for editing.
 
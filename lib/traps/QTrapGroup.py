@@ -22,8 +22,16 @@ class QTrapGroup(QTrap):
     ----------
     traps : list[QTrap]
         Direct children of this group (may include nested QTrapGroups).
+
+    Signals
+    -------
+    descendantsChanged : list[QTrap]
+        Emitted with all descendants after an operation, such as
+        rotation, that changes their positions relative to the group.
     '''
 
+    #: Emitted with the descendants changed by one operation.
+    descendantsChanged = QtCore.pyqtSignal(object)
 
     def __len__(self) -> int:
         return sum(1 for _ in self)
@@ -72,13 +80,13 @@ class QTrapGroup(QTrap):
 
     def _translateSilently(self, delta: Displacement) -> None:
         '''Translate this node and all descendants by delta
-        without emitting signals.'''
-        self._r += delta
-        for child in self:
-            if isinstance(child, QTrapGroup):
-                child._translateSilently(delta)
-            else:
-                child._r += delta
+        without emitting signals.
+
+        The subtree is found from the parent indices of the trap store
+        and moved with one vectorized update.'''
+        store = self._store
+        slots = np.append(store.descendants(self._slot), self._slot)
+        store.r[slots] += delta
 
     def _snapshot(self) -> dict:
         '''Record current positions of all descendants, keyed by id.
@@ -125,21 +133,18 @@ class QTrapGroup(QTrap):
                 child._rotateSilently(angle, cx, cy, snapshot)
 
     def _broadcastChanged(self) -> None:
-        '''Emit ``changed`` for every descendant and then self.
-
-        Leaf ``changed`` signals drive CGH displacement-field cache
-        invalidation (``_field_cache[leaf]``) and propagate structure
-        invalidation up through all ancestor groups via
-        ``_invalidateStructureChain``.  Sub-group ``changed`` signals
-        additionally clear each inner group's displacement cache
-        (``_field_cache[inner]``).  ``self.changed`` at the end drives
-        the visual update in ``QTrapOverlay._onGroupChanged``.
+        '''Report a change of every descendant, then of the group.
+
+        Emits ``descendantsChanged`` once with the whole subtree, which
+        CGH uses to invalidate the displacement caches of all leaves
+        and inner groups in one pass, and which ``QTrapOverlay`` adds
+        to its changeset.  ``self.changed`` follows, so observers of
+        the group alone are also notified.  Descendants do not emit
+        ``changed`` individually.
         '''
-        for child in self:
-            if isinstance(child, QTrapGroup):
-                child._broadcastChanged()
-            else:
-                child.changed.emit()
+        store = self._store
+        self.descendantsChanged.emit(
+            [store.items[slot] for slot in store.descendants(self._slot)])
         self.changed.emit()
 
     def rotate(self, angle: float, snapshot: dict) -> None:
@@ -149,7 +154,8 @@ class QTrapGroup(QTrap):
         floating-point drift during interactive drag.  All sub-group
         centers are updated recursively.  Calls ``_broadcastChanged``
         so that the CGH displacement-field caches for every descendant
-        are invalidated and ``QTrapOverlay`` updates its spots.
+        are invalidated and ``QTrapOverlay`` updates its spots, with
+        one signal for the whole subtree.
 
         Parameters
         ----------
@@ -5,6 +5,9 @@ from pyqtgraph import mkBrush, mkPen
 from QHOT.lib.traps.commands import QUndoStack  # re-exported from commands
 from QHOT.lib.traps.QTrap import QTrap
 from QHOT.lib.traps.QTrapGroup import QTrapGroup
+from QHOT.lib.traps.TrapStore import TrapStore
+from QHOT.lib.traps.TrapSnapshot import TrapSnapshot
+from QHOT.lib.traps.SpotGrid import SpotGrid
 from QHOT.lib.traps.commands import (
     AddTrapCommand, RemoveTrapCommand,
     MoveCommand, RotateCommand, WheelCommand, LockCommand)
@@ -64,6 +67,9 @@ class QTrapOverlay(ScatterPlotItem):
         Mouse-button name → Qt enum mapping.
     modifier : dict[str, Qt.KeyboardModifier]
         Modifier name → Qt enum mapping (supports ``|``-separated combos).
+    store : TrapStore
+        Contiguous positions, amplitudes, phases, type codes and
+        parent indices of every trap and group in the overlay.
     default : Descriptions
         Default gesture→handler bindings used when none are supplied.
 
@@ -73,12 +79,17 @@ class QTrapOverlay(ScatterPlotItem):
         Emitted with the top-level trap or group after it is added.
     trapRemoved : QTrap
         Emitted with the top-level trap or group after it is removed.
+    trapsChanged : frozenset[QTrap]
+        Emitted once per turn of the event loop with every trap and
+        group whose state changed since the previous emission.
     '''
 
     #: Emitted with the trap when a trap is added to the scene.
     trapAdded = QtCore.pyqtSignal(QTrap)
     #: Emitted with the trap when a trap is removed from the scene.
     trapRemoved = QtCore.pyqtSignal(QTrap)
+    #: Emitted with the set of traps changed in one event-loop turn.
+    trapsChanged = QtCore.pyqtSignal(object)
 
     class State(Enum):
         '''Visual state of a trap spot, controlling its fill color.'''
@@ -142,6 +153,8 @@ class QTrapOverlay(ScatterPlotItem):
         '''
         super().__init__(*args, size=size, **kwargs)
         self._setupUi()
+        self._store = TrapStore()
+        self._grid = SpotGrid()
         self._traps: list[QTrap] = []
         self._marked: set[QTrap] = set()
         self._selected: QTrap | None = None
@@ -154,6 +167,11 @@ class QTrapOverlay(ScatterPlotItem):
         self._rotation_angle: float = 0.
         self._rotation_snapshot: dict = {}
         self._undoStack = QUndoStack()
+        self._changes: set[QTrap] = set()
+        self._changeTimer = QtCore.QTimer(self)
+        self._changeTimer.setSingleShot(True)
+        self._changeTimer.setInterval(0)
+        self._changeTimer.timeout.connect(self.flush)
         self._handler = dict(self._mapping(d) for d in descriptions)
 
     def __iter__(self) -> Iterator[QTrap]:
@@ -168,6 +186,24 @@ class QTrapOverlay(ScatterPlotItem):
             if isinstance(child, QTrap):
                 yield child
 
+    @property
+    def store(self) -> TrapStore:
+        '''Array storage shared by all traps in the overlay.'''
+        return self._store
+
+    def snapshot(self) -> TrapSnapshot:
+        '''Return an immutable snapshot of every trap in the overlay.
+
+        The snapshot is read from the overlay's ``TrapStore`` in one
+        pass and can be handed to ``CGH.compute`` in another thread.
+
+        Returns
+        -------
+        TrapSnapshot
+            State of all traps and groups, in slot order.
+        '''
+        return TrapSnapshot.fromStore(self._store)
+
     def _setupUi(self) -> None:
         '''Set up UI elements.
 
@@ -218,24 +254,17 @@ class QTrapOverlay(ScatterPlotItem):
             A single trap or a group to register.
         '''
         traps.setParent(self)
-        brush_state = (self.State.STATIC if traps.locked
-                       else self.State.NORMAL)
-        for trap in traps.leaves():
-            trap._index = len(self._traps)
-            self._traps.append(trap)
-            spot = {'pos': (trap.x, trap.y),
-                    'brush': self.brush[brush_state],
-                    'data': trap,
-                    **trap.appearance()}
-            self.addPoints([spot])
-            trap.changed.connect(self._onTrapChanged)
+        leaves = list(traps.leaves())
+        self._addSpots(leaves, traps.locked)
+        for trap in leaves:
+            self._connectLeaf(trap)
         if hasattr(traps, 'reshaping'):
             traps.reshaping.connect(
                 functools.partial(self._onGroupReshaping, traps))
             traps.reshaped.connect(
                 functools.partial(self._onGroupReshaped, traps))
         if isinstance(traps, QTrapGroup):
-            traps.changed.connect(self._onGroupChanged)
+            self._connectGroup(traps)
         self.trapAdded.emit(traps)
 
     def addTrap(self, traps: QTrap | list[QTrap] | QtCore.QPointF) -> bool:
@@ -282,23 +311,15 @@ class QTrapOverlay(ScatterPlotItem):
         '''
         self._marked.discard(group)
         self.trapRemoved.emit(group)
-        for t in list(group.leaves()):
-            try:
-                t.changed.disconnect(self._onTrapChanged)
-            except (TypeError, RuntimeError):
-                logger.debug('could not disconnect changed from %r', t)
-            if t in self._traps:
-                self._traps.remove(t)
-            t._index = None
+        leaves = list(group.leaves())
+        for t in leaves:
+            self._disconnectLeaf(t)
+        self._removeSpots(leaves)
+        for t in leaves:
             t.setParent(None)
         if isinstance(group, QTrapGroup):
-            try:
-                group.changed.disconnect(self._onGroupChanged)
-            except (TypeError, RuntimeError):
-                logger.debug(
-                    'could not disconnect changed from group %r', group)
+            self._disconnectGroup(group)
         group.setParent(None)
-        self._rebuildSpots()
 
     def removeTrap(self, trap: QTrap | QtCore.QPointF) -> bool:
         '''Remove a trap from the overlay.
@@ -319,10 +340,9 @@ class QTrapOverlay(ScatterPlotItem):
             ``True`` if a trap was removed, ``False`` if no trap was found.
         '''
         if isinstance(trap, QtCore.QPointF):
-            pts = self.pointsAt(trap)
-            if len(pts) == 0:
+            group = self.groupAt(trap)
+            if group is None:
                 return False
-            group = self.groupOf(pts[0].data())
             self._undoStack.push(RemoveTrapCommand(self, group))
             return True
         self._removeTrap(self.groupOf(trap))
@@ -332,22 +352,20 @@ class QTrapOverlay(ScatterPlotItem):
         '''Remove all traps from the overlay and clear the undo stack.'''
         top_level = list(self)
         for trap in list(self._traps):
-            trap.changed.disconnect(self._onTrapChanged)
+            self._disconnectLeaf(trap)
             trap._index = None
         self._traps.clear()
+        self._grid.clear()
         self.clear()
         for item in top_level:
             if isinstance(item, QTrapGroup):
-                try:
-                    item.changed.disconnect(self._onGroupChanged)
-                except (TypeError, RuntimeError):
-                    pass
+                self._disconnectGroup(item)
             item.setParent(None)
             self.trapRemoved.emit(item)
         self._undoStack.clear()
 
     def _rebuildSpots(self) -> None:
-        '''Rebuild all SpotItems after a removal, resequencing ``_index``.'''
+        '''Rebuild all SpotItems from ``_traps``, resequencing ``_index``.'''
         self.clear()
         spots = []
         for n, trap in enumerate(self._traps):
@@ -361,6 +379,72 @@ class QTrapOverlay(ScatterPlotItem):
                           **trap.appearance()})
         self.addPoints(spots)
 
+    def _addSpots(self, traps: list[QTrap], locked: bool = False) -> None:
+        '''Append spots for leaf traps and assign their indices.
+
+        All spots are added with one call to ``addPoints``.
+
+        Parameters
+        ----------
+        traps : list[QTrap]
+            Leaf traps that do not yet have spots.
+        locked : bool
+            Draw the spots with the ``STATIC`` brush.  Default: False.
+        '''
+        brush = self.brush[self.State.STATIC if locked
+                           else self.State.NORMAL]
+        spots = []
+        for trap in traps:
+            trap._index = len(self._traps)
+            self._traps.append(trap)
+            spots.append({'pos': (trap.x, trap.y),
+                          'brush': brush,
+                          'data': trap,
+                          **trap.appearance()})
+        if spots:
+            self.addPoints(spots)
+            self._grid.update(traps, self._store.positions(traps))
+
+    def _removeSpots(self, traps: list[QTrap]) -> None:
+        '''Remove the spots of leaf traps by swap-remove.
+
+        Each removed spot is overwritten by the last spot, whose trap
+        takes over the freed index, and the spot array is truncated.
+        The cost is proportional to the number of removed traps, and
+        the remaining spots are not rebuilt.
+
+        Parameters
+        ----------
+        traps : list[QTrap]
+            Leaf traps whose spots should be removed.
+        '''
+        indices = sorted((t._index for t in traps if t._index is not None),
+                         reverse=True)
+        if not indices:
+            return
+        data = self.data
+        last = len(self._traps) - 1
+        for index in indices:
+            if index != last:
+                moved = self._traps[last]
+                self._traps[index] = moved
+                moved._index = index
+                data[index] = data[last]
+                data[index]['item'] = None
+            self._traps.pop()
+            last -= 1
+        for trap in traps:
+            trap._index = None
+        self._grid.remove(traps)
+        self.data = data[:last + 1]
+        self._maxSpotWidth = 0
+        self._maxSpotPxWidth = 0
+        self._updateMaxSpotSizes(data=self.data)
+        self.prepareGeometryChange()
+        self.informViewBoundsChanged()
+        self.invalidate()
+        self.sigPlotChanged.emit(self)
+
     @staticmethod
     def groupOf(trap: QTrap) -> QTrap:
         '''Return the topmost parent of a trap, or the trap itself.
@@ -374,7 +458,16 @@ class QTrapOverlay(ScatterPlotItem):
         -------
         QTrap
             The root of the group hierarchy containing ``trap``.
+
+        Notes
+        -----
+        Traps in a ``TrapStore`` are resolved with one lookup of the
+        store's cached ``root`` column.  Other objects fall back to a
+        walk up the parent chain.
         '''
+        store = getattr(trap, '_store', None)
+        if isinstance(store, TrapStore):
+            return store.rootOf(trap)
         while isinstance(trap.parent(), QTrapGroup):
             trap = trap.parent()
         return trap
@@ -391,14 +484,10 @@ class QTrapOverlay(ScatterPlotItem):
         group : QTrap
             The group that is about to repopulate.
         '''
-        for t in list(group.leaves()):
-            try:
-                t.changed.disconnect(self._onTrapChanged)
-            except (TypeError, RuntimeError):
-                pass
-            if t in self._traps:
-                self._traps.remove(t)
-                t._index = None
+        leaves = list(group.leaves())
+        for t in leaves:
+            self._disconnectLeaf(t)
+        self._removeSpots(leaves)
         self.trapRemoved.emit(group)
 
     def _onGroupReshaped(self, group: QTrap) -> None:
@@ -412,32 +501,126 @@ class QTrapOverlay(ScatterPlotItem):
         group : QTrap
             The group that has just repopulated.
         '''
-        for t in group.leaves():
-            t._index = len(self._traps)
-            self._traps.append(t)
-            t.changed.connect(self._onTrapChanged)
-        self._rebuildSpots()
+        leaves = list(group.leaves())
+        self._addSpots(leaves, self.groupOf(group).locked)
+        for t in leaves:
+            self._connectLeaf(t)
         self.trapAdded.emit(group)
 
+    def _connectLeaf(self, trap: QTrap) -> None:
+        '''Record changes of a leaf trap in the changeset.'''
+        trap.changed.connect(self._onTrapChanged)
+        if hasattr(trap, 'structureChanged'):
+            trap.structureChanged.connect(self._onTrapChanged)
+
+    def _disconnectLeaf(self, trap: QTrap) -> None:
+        '''Stop recording changes of a leaf trap.'''
+        signals = [trap.changed]
+        if hasattr(trap, 'structureChanged'):
+            signals.append(trap.structureChanged)
+        for signal in signals:
+            try:
+                signal.disconnect(self._onTrapChanged)
+            except (TypeError, RuntimeError):
+                logger.debug('could not disconnect %r', trap)
+
+    def _connectGroup(self, group: QTrapGroup) -> None:
+        '''Record changes of a top-level group in the changeset.'''
+        group.changed.connect(self._onGroupChanged)
+        group.descendantsChanged.connect(self.markChanged)
+
+    def _disconnectGroup(self, group: QTrapGroup) -> None:
+        '''Stop recording changes of a group.'''
+        for signal, slot in ((group.changed, self._onGroupChanged),
+                             (group.descendantsChanged, self.markChanged)):
+            try:
+                signal.disconnect(slot)
+            except (TypeError, RuntimeError):
+                logger.debug('could not disconnect group %r', group)
+
     @QtCore.pyqtSlot()
     def _onTrapChanged(self) -> None:
-        '''Slot called when a trap's position changes; updates its spot.'''
-        trap: QTrap = self.sender()
-        spot = self.points()[trap._index]
-        spot._data['x'] = trap.x
-        spot._data['y'] = trap.y
-        spot.updateItem()
+        '''Slot called when a trap changes; records it for ``flush``.'''
+        self.markChanged([self.sender()])
 
     @QtCore.pyqtSlot()
     def _onGroupChanged(self) -> None:
-        '''Slot called when a group is translated; updates all leaf spots.'''
-        group: QTrapGroup = self.sender()
-        for trap in group.leaves():
+        '''Slot called when a group changes; records it for ``flush``.'''
+        self.markChanged([self.sender()])
+
+    @QtCore.pyqtSlot(object)
+    def markChanged(self, traps: list[QTrap]) -> None:
+        '''Add traps to the changeset delivered by the next ``flush``.
+
+        The first change in a turn of the event loop schedules
+        ``flush``; later changes in the same turn are merged into the
+        same changeset.
+
+        Parameters
+        ----------
+        traps : list[QTrap]
+            Traps or groups whose state has changed.
+        '''
+        self._changes.update(traps)
+        if not self._changeTimer.isActive():
+            self._changeTimer.start()
+
+    @QtCore.pyqtSlot()
+    def flush(self) -> None:
+        '''Apply the pending changeset and emit ``trapsChanged``.
+
+        The leaves of the changed traps and groups are found in the
+        hierarchy columns of the store, and their positions are
+        written into the spot array with one vectorized assignment,
+        then emits ``trapsChanged`` once with the changed traps that
+        are still in the overlay.  Called automatically on the next
+        turn of the event loop after a change; call it directly to
+        apply changes synchronously.
+        '''
+        self._changeTimer.stop()
+        changes, self._changes = self._changes, set()
+        changes = frozenset(t for t in changes if t._store is self._store)
+        if not changes:
+            return
+        store = self._store
+        slots = np.array([t._slot for t in changes])
+        slots = np.union1d(slots, store.descendants(slots))
+        slots = slots[store.leaf[slots]].tolist()
+        leaves, indices, moved = [], [], []
+        for slot in slots:
+            trap = store.items[slot]
             if trap._index is not None:
-                spot = self.points()[trap._index]
-                spot._data['x'] = trap.x
-                spot._data['y'] = trap.y
-                spot.updateItem()
+                leaves.append(trap)
+                indices.append(trap._index)
+                moved.append(slot)
+        if leaves:
+            r = store.r[moved]
+            self._moveSpots(indices, r)
+            self._grid.update(leaves, r)
+        self.trapsChanged.emit(changes)
+
+    def _moveSpots(self, indices: list[int], r: np.ndarray) -> None:
+        '''Move spots to new positions with one update of the plot.
+
+        Positions are written directly into the spot array.  Spots
+        keep their cached symbols, so unlike ``SpotItem.updateItem``
+        no symbol is looked up again; the cached bounds are reset and
+        a single repaint is scheduled, which Qt coalesces into the
+        next rendered frame.
+
+        Parameters
+        ----------
+        indices : list[int]
+            Spot indices of the moved traps.
+        r : np.ndarray
+            New positions of the traps, shape ``(N, 3)``.
+        '''
+        self.data['x'][indices] = r[:, 0]
+        self.data['y'][indices] = r[:, 1]
+        self.bounds = [None, None]
+        self.prepareGeometryChange()
+        self.informViewBoundsChanged()
+        self.invalidate()
 
     def _setGroupBrush(self, group: QTrap, state: State) -> None:
         '''Set the brush of every leaf spot in a group to the given state.
@@ -475,10 +658,10 @@ class QTrapOverlay(ScatterPlotItem):
             return
         for candidate in candidates:
             self.trapRemoved.emit(candidate)
-        centroid = np.mean([t._r for t in candidates], axis=0)
+        centroid = self._store.positions(candidates).mean(axis=0)
         grp = QTrapGroup(r=centroid, parent=self)
         grp.addTrap(candidates)
-        grp.changed.connect(self._onGroupChanged)
+        self._connectGroup(grp)
         self.trapAdded.emit(grp)
 
     def startSelection(self, pos: QtCore.QPointF) -> None:
@@ -519,6 +702,57 @@ class QTrapOverlay(ScatterPlotItem):
 
     # Identifying traps by position
 
+    def _hitSize(self) -> tuple[float, float]:
+        '''Return the half-width and half-height of a spot.
+
+        Spot sizes are in screen pixels, so they are converted into
+        item coordinates with the view's pixel vectors.  An overlay
+        that is not in a view treats one item unit as one pixel.
+
+        Returns
+        -------
+        tuple[float, float]
+            Half-extents of a spot along x and y in item coordinates.
+        '''
+        half = self.opts['size'] / 2.
+        px, py = self.pixelVectors()
+        try:
+            sx = 1. if px is None else px.length() or 1.
+            sy = 1. if py is None else py.length() or 1.
+        except OverflowError:
+            sx = sy = 1.
+        return half * sx, half * sy
+
+    def _hits(self, left: float, top: float,
+              right: float, bottom: float
+              ) -> tuple[list[QTrap], np.ndarray]:
+        '''Return the leaf traps whose spots overlap a rectangle.
+
+        Pending changes are flushed first, so that queries see the
+        current positions.  Candidates come from the spatial index and
+        are tested against their exact positions in the store.
+
+        Returns
+        -------
+        traps : list[QTrap]
+            Traps whose spots overlap the rectangle.
+        positions : np.ndarray
+            Their positions, shape ``(N, 3)``.
+        '''
+        if self._changes:
+            self.flush()
+        w, h = self._hitSize()
+        candidates = self._grid.candidates(left - w, top - h,
+                                           right + w, bottom + h)
+        if not candidates:
+            return [], np.empty((0, 3))
+        r = self._store.positions(candidates)
+        x, y = r[:, 0], r[:, 1]
+        inside = ((x + w > left) & (x - w < right) &
+                  (y + h > top) & (y - h < bottom))
+        hits = np.flatnonzero(inside)
+        return [candidates[n] for n in hits], r[hits]
+
     def trapAt(self, pos: QtCore.QPointF) -> QTrap | None:
         '''Return the trap nearest to a position.
 
@@ -530,12 +764,15 @@ class QTrapOverlay(ScatterPlotItem):
         Returns
         -------
         QTrap or None
-            Nearest trap, or ``None`` if no trap is nearby.
+            Nearest trap whose spot contains ``pos``, or ``None`` if
+            no trap is nearby.
         '''
-        pts = self.pointsAt(pos)
-        if len(pts) == 0:
+        x, y = pos.x(), pos.y()
+        traps, r = self._hits(x, y, x, y)
+        if not traps:
             return None
-        return self._traps[pts[0].index()]
+        nearest = np.argmin((r[:, 0] - x)**2 + (r[:, 1] - y)**2)
+        return traps[nearest]
 
     def trapsIn(self, rect: QtCore.QRectF) -> list[QTrap]:
         '''Return all traps within a rectangle.
@@ -548,10 +785,12 @@ class QTrapOverlay(ScatterPlotItem):
         Returns
         -------
         list[QTrap]
-            Traps whose spots fall within ``rect``, or ``[]`` if none.
+            Traps whose spots overlap ``rect``, or ``[]`` if none.
         '''
-        pts = self.pointsAt(rect)
-        return [self._traps[p.index()] for p in pts]
+        rect = rect.normalized()
+        traps, _ = self._hits(rect.left(), rect.top(),
+                              rect.right(), rect.bottom())
+        return traps
 
     def groupAt(self, pos: QtCore.QPointF) -> QTrap | None:
         '''Return the topmost group containing the trap nearest to a position.
@@ -601,7 +840,7 @@ class QTrapOverlay(ScatterPlotItem):
             self.trapRemoved.emit(outer)
             outer.removeTrap(direct)
             direct.setParent(self)
-            direct.changed.connect(self._onGroupChanged)
+            self._connectGroup(direct)
             if not list(outer) and outer.parent() is self:
                 outer.setParent(None)
             else:
@@ -698,11 +937,9 @@ class QTrapOverlay(ScatterPlotItem):
         bool
             ``True`` if a group was selected, ``False`` if no trap is nearby.
         '''
-        pts = self.pointsAt(pos)
-        if len(pts) == 0:
+        self._selected = self.groupAt(pos)
+        if self._selected is None:
             return False
-        trap = pts[0].data()
-        self._selected = self.groupOf(trap)
         if self._selected.locked:
             self._selected = None
             return True
@@ -156,7 +156,9 @@ class QTrapWidget(QtWidgets.QFrame):
 
     Maintains a ``QTrapPropertyWidget`` row for each registered trap.
     Traps are added via ``registerTrap`` and removed via
-    ``unregisterTrap``.
+    ``unregisterTrap``.  Connect ``updateTraps`` to
+    ``QTrapOverlay.trapsChanged`` to refresh the rows of traps that
+    move together with their group.
     '''
 
     def __init__(self, *args, **kwargs) -> None:
@@ -243,6 +245,26 @@ class QTrapWidget(QtWidgets.QFrame):
         except KeyError:
             logger.warning(f'Trap not registered: {trap}')
 
+    @QtCore.pyqtSlot(object)
+    def updateTraps(self, traps: frozenset[QTrap]) -> None:
+        '''Refresh the rows of a changeset of traps in one pass.
+
+        Rows of the leaves of changed groups are refreshed as well,
+        because translating or rotating a group does not emit
+        ``changed`` from its leaves.
+
+        Parameters
+        ----------
+        traps : frozenset[QTrap]
+            Traps and groups whose state has changed.
+        '''
+        changed = set(traps)
+        changed.update(leaf for trap in traps for leaf in trap.leaves())
+        for trap in changed:
+            widget = self._trap_widgets.get(trap)
+            if widget is not None:
+                widget.updateValues(trap)
+
     def count(self) -> int:
         '''Return the number of rows currently in the layout.'''
         return self._inner_layout.count()
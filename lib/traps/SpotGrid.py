@@ -0,0 +1,126 @@
+'''Uniform-grid spatial index of trap positions.'''
+from __future__ import annotations
+
+import logging
+import math
+from collections.abc import Hashable, Iterable
+
+import numpy as np
+
+
+__all__ = ['SpotGrid']
+
+logger = logging.getLogger(__name__)
+
+
+class SpotGrid:
+
+    '''Buckets traps by the square grid cell that contains them.
+
+    ``QTrapOverlay`` uses the grid to answer hit-testing and rectangle
+    queries without scanning every spot.  The grid is maintained
+    incrementally: ``update`` moves a trap between buckets only when
+    it crosses a cell boundary, and ``candidates`` visits only the
+    cells that overlap the query rectangle.  Candidates are not
+    filtered by their exact positions, which is left to the caller.
+
+    Parameters
+    ----------
+    spacing : float
+        Width of each grid cell [pixels].  Default: 32.
+
+    Attributes
+    ----------
+    spacing : float
+        Width of each grid cell [pixels].
+    '''
+
+    def __init__(self, spacing: float = 32.) -> None:
+        self.spacing = float(spacing)
+        self._cells: dict[tuple[int, int], set[Hashable]] = {}
+        self._cellOf: dict[Hashable, tuple[int, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._cellOf)
+
+    def __contains__(self, item: Hashable) -> bool:
+        return item in self._cellOf
+
+    def __repr__(self) -> str:
+        return (f'{type(self).__name__}(spacing={self.spacing}, '
+                f'items={len(self)}, cells={len(self._cells)})')
+
+    def update(self, items: Iterable[Hashable],
+               positions: np.ndarray) -> None:
+        '''Insert items or record their new positions.
+
+        Parameters
+        ----------
+        items : Iterable[Hashable]
+            Items to insert or move.
+        positions : np.ndarray
+            Corresponding ``(x, y)`` positions [pixels], shape
+            ``(N, 2)`` or wider; extra columns are ignored.
+        '''
+        positions = np.asarray(positions, dtype=float)
+        if positions.size == 0:
+            return
+        keys = np.floor(positions[:, :2] / self.spacing).astype(int)
+        for item, key in zip(items, map(tuple, keys.tolist())):
+            old = self._cellOf.get(item)
+            if old == key:
+                continue
+            if old is not None:
+                self._discard(item, old)
+            self._cells.setdefault(key, set()).add(item)
+            self._cellOf[item] = key
+
+    def remove(self, items: Iterable[Hashable]) -> None:
+        '''Remove items from the grid.  Missing items are ignored.'''
+        for item in items:
+            key = self._cellOf.pop(item, None)
+            if key is not None:
+                self._discard(item, key)
+
+    def _discard(self, item: Hashable, key: tuple[int, int]) -> None:
+        cell = self._cells[key]
+        cell.discard(item)
+        if not cell:
+            del self._cells[key]
+
+    def clear(self) -> None:
+        '''Remove all items.'''
+        self._cells.clear()
+        self._cellOf.clear()
+
+    def candidates(self, left: float, top: float,
+                   right: float, bottom: float) -> list[Hashable]:
+        '''Return the items in every cell that overlaps a rectangle.
+
+        Parameters
+        ----------
+        left, top, right, bottom : float
+            Bounds of the query rectangle [pixels], with
+            ``left <= right`` and ``top <= bottom``.
+
+        Returns
+        -------
+        list[Hashable]
+            Items that may lie within the rectangle.
+        '''
+        i0 = math.floor(left / self.spacing)
+        i1 = math.floor(right / self.spacing)
+        j0 = math.floor(top / self.spacing)
+        j1 = math.floor(bottom / self.spacing)
+        found = []
+        if (i1 - i0 + 1) * (j1 - j0 + 1) > len(self._cells):
+            for (i, j), cell in self._cells.items():
+                if i0 <= i <= i1 and j0 <= j <= j1:
+                    found.extend(cell)
+            return found
+        for i in range(i0, i1 + 1):
+            for j in range(j0, j1 + 1):
+                cell = self._cells.get((i, j))
+                if cell:
+                    found.extend(cell)
+        return found
@@ -0,0 +1,394 @@
+'''Immutable snapshots of trap state.'''
+from __future__ import annotations
+
+import hashlib
+import logging
+from collections.abc import Iterable, Iterator
+from functools import cached_property
+
+import numpy as np
+
+from .TrapStore import TrapStore
+
+
+__all__ = ['TrapSnapshot']
+
+logger = logging.getLogger(__name__)
+
+
+class TrapSnapshot:
+
+    '''Frozen copy of the state of a set of traps and their groups.
+
+    Row ``n`` of ``records`` holds the position, amplitude, phase,
+    type code and leaf flag of ``items[n]``, and the row of its parent
+    group, or ``-1`` for a top-level trap or group.  ``parameters[n]``
+    holds the structural parameters returned by the trap's
+    ``structureKey``, or ``None`` for traps without a structure.
+
+    A snapshot is taken in the thread that owns the traps and can then
+    be read from any other thread, while the traps themselves keep
+    changing.  Its arrays are read-only and its other members are
+    tuples.  Snapshots of equal state compare equal and have equal
+    hashes, whichever trap objects they were taken from, so they can
+    be queued, logged, used as dictionary keys and computed in batches.
+
+    Snapshots are usually taken with ``of``, or of a whole scene by
+    ``QTrapOverlay.snapshot``.
+
+    Parameters
+    ----------
+    records : np.ndarray
+        Trap state with dtype ``TrapSnapshot.dtype``.  The array is
+        copied.
+    parameters : Iterable[tuple or None] or None
+        Structural parameters of each row.  Default: none.
+    items : Iterable[QTrap or None] or None
+        Trap or group described by each row.  Default: none.
+
+    Attributes
+    ----------
+    records : np.ndarray
+        Read-only record array of trap state.
+    parameters : tuple[tuple or None, ...]
+        Structural parameters of each row.
+    items : tuple[QTrap or None, ...]
+        Trap or group described by each row.  Items are not part of
+        the state that is compared and hashed.
+    '''
+
+    dtype = np.dtype([('r', np.float64, (3,)),
+                      ('amplitude', np.float64),
+                      ('phase', np.float64),
+                      ('kind', np.int16),
+                      ('parent', np.int32),
+                      ('leaf', np.bool_)])
+
+    def __init__(self, records: np.ndarray,
+                 parameters: Iterable[tuple | None] | None = None,
+                 items: Iterable[object | None] | None = None) -> None:
+        self.records = np.array(records, dtype=self.dtype)
+        self.records.flags.writeable = False
+        size = len(self.records)
+        self.parameters = (tuple(parameters) if parameters is not None
+                           else (None,) * size)
+        self.items = tuple(items) if items is not None else (None,) * size
+        if not len(self.parameters) == len(self.items) == size:
+            raise ValueError('records, parameters and items '
+                             'must have the same length')
+        self._layouts: dict[int, tuple] = {}
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __iter__(self) -> Iterator[object | None]:
+        return iter(self.items)
+
+    def __contains__(self, trap: object) -> bool:
+        return trap in self._rows
+
+    def __repr__(self) -> str:
+        leaves = int(np.count_nonzero(self.records['leaf']))
+        return f'{type(self).__name__}(traps={len(self)}, leaves={leaves})'
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, TrapSnapshot):
+            return NotImplemented
+        return self._key == other._key
+
+    def __hash__(self) -> int:
+        return self._hash
+
+    @cached_property
+    def _key(self) -> tuple[bytes, tuple]:
+        return (self.records.tobytes(), self.parameters)
+
+    @cached_property
+    def _hash(self) -> int:
+        return hash(self._key)
+
+    @cached_property
+    def digest(self) -> str:
+        '''Canonical hash of the scene recorded in the snapshot.
+
+        The superposed field of a scene depends only on its leaves, so
+        the digest covers the position, amplitude, phase, type and
+        structural parameters of every leaf and ignores groups.  The
+        leaves are sorted by their state and types are named rather
+        than coded, so equal scenes have equal digests whatever the
+        order of their rows, their grouping, or the process in which
+        they were recorded.
+
+        Returns
+        -------
+        str
+            Hexadecimal digest.
+        '''
+        leaves = np.flatnonzero(self.records['leaf'])
+        records = self.records[leaves]
+        codes, kinds = np.unique(records['kind'], return_inverse=True)
+        names = [f'{cls.__module__}.{cls.__qualname__}'
+                 for cls in map(TrapStore.typeOf, codes.tolist())]
+        ranks = np.argsort(np.argsort(names))[kinds]
+        parameters = [repr(self.parameters[n]) for n in self._structured]
+        labels = sorted(set(parameters))
+        order = {label: n for n, label in enumerate(labels, 1)}
+        labelled = np.zeros(len(self), dtype=int)
+        labelled[self._structured] = [order[label] for label in parameters]
+        labelled = labelled[leaves]
+        state = np.column_stack((records['r'], records['amplitude'],
+                                 records['phase'])) + 0.
+        rows = np.lexsort((labelled, ranks, *state.T[::-1]))
+        digest = hashlib.sha256()
+        digest.update(repr((sorted(names), labels)).encode())
+        digest.update(state[rows].astype('<f8').tobytes())
+        digest.update(ranks[rows].astype('<i4').tobytes())
+        digest.update(labelled[rows].astype('<i4').tobytes())
+        return digest.hexdigest()[:32]
+
+    @classmethod
+    def of(cls, traps: Iterable[object]) -> TrapSnapshot:
+        '''Take a snapshot of traps and the groups that contain them.
+
+        Each trap is resolved to its topmost group, and every top-level
+        item is recorded once, followed by all of its descendants, in
+        the order in which the top-level items are first reached.
+        Trap-like objects that are not kept in a ``TrapStore`` are
+        recorded as leaves from their ``r``, ``amplitude`` and
+        ``phase``.
+
+        Parameters
+        ----------
+        traps : Iterable[QTrap]
+            Traps (or group members) to record.
+
+        Returns
+        -------
+        TrapSnapshot
+            Snapshot of the top-level items of ``traps``.
+        '''
+        tops = dict.fromkeys(cls._topLevel(trap) for trap in traps)
+        nodes: list[object] = []
+        rows: dict[TrapStore | None, list[int]] = {}
+        for top in tops:
+            store = getattr(top, '_store', None)
+            subtree = [top] if store is None else TrapStore.subtree(top)
+            start = len(nodes)
+            nodes.extend(subtree)
+            rows.setdefault(store, []).extend(range(start, len(nodes)))
+        loose = rows.pop(None, [])
+        parts = [(store, np.array(found),
+                  np.array([nodes[n]._slot for n in found]))
+                 for store, found in rows.items()]
+        return cls._build(parts, nodes, loose)
+
+    @staticmethod
+    def _topLevel(trap: object) -> object:
+        '''Return the topmost ancestor of a trap in its store.'''
+        store = getattr(trap, '_store', None)
+        return trap if store is None else store.rootOf(trap)
+
+    @classmethod
+    def fromStore(cls, store: TrapStore) -> TrapSnapshot:
+        '''Take a snapshot of every trap in a store, in slot order.
+
+        All arrays of the store are read with one fancy-indexing
+        operation each, so this is the fast way to record a scene.
+        '''
+        slots = store.slots
+        items = [store.items[slot] for slot in slots.tolist()]
+        return cls._build([(store, np.arange(len(slots)), slots)], items)
+
+    @classmethod
+    def _build(cls, parts: list[tuple[TrapStore, np.ndarray, np.ndarray]],
+               items: list[object],
+               loose: list[int] = ()) -> TrapSnapshot:
+        '''Assemble a snapshot from the slots of one or more stores.
+
+        Parameters
+        ----------
+        parts : list[tuple[TrapStore, np.ndarray, np.ndarray]]
+            Each store with the rows of the snapshot that it fills and
+            the slots from which they are read.  A trap's parent must
+            be recorded from the same part as the trap itself.
+        items : list[QTrap]
+            Trap or group described by each row.
+        loose : list[int]
+            Rows of trap-like objects without a store, which are read
+            from their properties.
+        '''
+        records = np.zeros(len(items), dtype=cls.dtype)
+        for store, rows, slots in parts:
+            records['r'][rows] = store.r[slots]
+            records['amplitude'][rows] = store.amplitude[slots]
+            records['phase'][rows] = store.phase[slots]
+            records['kind'][rows] = store.kind[slots]
+            records['leaf'][rows] = store.leaf[slots]
+            where = np.full(store.capacity, -1, dtype=np.int32)
+            where[slots] = rows
+            parent = store.parent[slots]
+            records['parent'][rows] = np.where(parent >= 0, where[parent], -1)
+        parameters: list[tuple | None] = [None] * len(items)
+        for n in loose:
+            trap = items[n]
+            records[n] = (trap.r, trap.amplitude, trap.phase,
+                          TrapStore.code(type(trap)), -1, True)
+            structureKey = getattr(trap, 'structureKey', None)
+            if structureKey is not None:
+                parameters[n] = tuple(structureKey())
+        for code in np.unique(records['kind']).tolist():
+            if not hasattr(TrapStore.typeOf(code), 'structureKey'):
+                continue
+            for n in np.flatnonzero(records['kind'] == code).tolist():
+                parameters[n] = tuple(items[n].structureKey())
+        return cls(records, parameters, items)
+
+    @property
+    def positions(self) -> np.ndarray:
+        '''Positions of the traps and groups [pixels], shape ``(N, 3)``.'''
+        return self.records['r']
+
+    @cached_property
+    def coefficients(self) -> np.ndarray:
+        '''Complex amplitudes ``amplitude * exp(i phase)`` of each row.
+
+        Groups carry no amplitude of their own, because their children
+        are recorded with theirs, so the coefficient of a group is 1.
+        '''
+        records = self.records
+        coefficients = np.where(
+            records['leaf'],
+            records['amplitude'] * np.exp(1j * records['phase']), 1.)
+        coefficients.flags.writeable = False
+        return coefficients
+
+    @cached_property
+    def _rows(self) -> dict[object, int]:
+        return {item: n for n, item in enumerate(self.items)
+                if item is not None}
+
+    @cached_property
+    def _states(self) -> np.ndarray:
+        records = self.records
+        return np.column_stack((records['r'], records['amplitude'],
+                                records['phase']))
+
+    def row(self, trap: object) -> int:
+        '''Return the row of a trap or group.
+
+        Raises
+        ------
+        KeyError
+            If ``trap`` is not recorded in the snapshot.
+        '''
+        return self._rows[trap]
+
+    def rows(self, traps: Iterable[object]) -> np.ndarray:
+        '''Return the rows of many traps or groups.'''
+        rows = self._rows
+        return np.array([rows[trap] for trap in traps], dtype=int)
+
+    def state(self, trap: object) -> tuple[float, ...]:
+        '''Return ``(x, y, z, amplitude, phase)`` of a trap or group.'''
+        return tuple(self._states[self._rows[trap]].tolist())
+
+    @cached_property
+    def _structured(self) -> list[int]:
+        return [n for n, parameters in enumerate(self.parameters)
+                if parameters is not None]
+
+    def changedSince(self, previous: TrapSnapshot) -> np.ndarray:
+        '''Flag the rows whose items changed since an earlier snapshot.
+
+        A row is flagged if its item is not recorded in ``previous``,
+        or if its position, amplitude, phase or structural parameters
+        differ.  Items are matched by identity and their states are
+        compared with vectorized operations.  Changes within a group
+        are reported by ``structureOf``.
+
+        Parameters
+        ----------
+        previous : TrapSnapshot
+            Earlier snapshot of the same traps.
+
+        Returns
+        -------
+        np.ndarray
+            Boolean flag for each row of this snapshot.
+        '''
+        known = previous._rows
+        rows = np.array([known.get(item, -1) for item in self.items],
+                        dtype=int)
+        if not len(previous):
+            return np.ones(len(self), dtype=bool)
+        old = previous.records[np.maximum(rows, 0)]
+        new = self.records
+        changed = ((rows < 0) |
+                   (old['r'] != new['r']).any(axis=1) |
+                   (old['amplitude'] != new['amplitude']) |
+                   (old['phase'] != new['phase']))
+        for n in self._structured:
+            if (not changed[n] and
+                    previous.parameters[rows[n]] != self.parameters[n]):
+                changed[n] = True
+        return changed
+
+    @property
+    def topLevelItems(self) -> list[object]:
+        '''Items without a parent group in the snapshot, in row order.'''
+        return [self.items[n]
+                for n in np.flatnonzero(self.records['parent'] < 0)]
+
+    def children(self, trap: object) -> list[object]:
+        '''Return the direct children of a group, in row order.'''
+        rows = np.flatnonzero(self.records['parent'] == self._rows[trap])
+        return [self.items[n] for n in rows.tolist()]
+
+    def descendants(self, row: int) -> np.ndarray:
+        '''Return the rows of all descendants of the item in ``row``.
+
+        The hierarchy is traversed one level at a time with vectorized
+        lookups in the ``parent`` column, as in ``TrapStore``.
+        '''
+        parent = self.records['parent']
+        found = []
+        level = np.array([row])
+        while len(level):
+            level = np.flatnonzero(np.isin(parent, level))
+            found.append(level)
+        return np.concatenate(found)
+
+    def structureOf(self, trap: object) -> tuple | None:
+        '''Return the parameters that determine a trap's structure.
+
+        For a leaf these are its ``parameters``.  For a group they
+        describe the whole subtree relative to the group: the type
+        codes, hierarchy, amplitudes, phases and parameters of its
+        descendants, and their positions relative to the group's own,
+        rounded to 1e-6 pixels so that a translated group has the same
+        description.
+
+        Returns
+        -------
+        tuple or None
+            Hashable description of the structure, or ``None`` for
+            a leaf without structural parameters.
+        '''
+        row = self._rows[trap]
+        if self.records['leaf'][row]:
+            return self.parameters[row]
+        if row not in self._layouts:
+            self._layouts[row] = self._layout(row)
+        return self._layouts[row]
+
+    def _layout(self, row: int) -> tuple:
+        '''Describe the subtree of the group in ``row``.'''
+        rows = np.sort(self.descendants(row))
+        records = self.records[rows]
+        offset = np.round(records['r'] - self.records['r'][row], 6) + 0.
+        parent = np.where(records['parent'] == row, -1,
+                          np.searchsorted(rows, records['parent']))
+        return (records['kind'].tobytes(), parent.tobytes(),
+                offset.tobytes(), records['amplitude'].tobytes(),
+                records['phase'].tobytes(),
+                tuple(self.parameters[n] for n in rows.tolist()))
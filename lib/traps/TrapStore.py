@@ -0,0 +1,278 @@
+'''Contiguous struct-of-arrays storage for trap state.'''
+from __future__ import annotations
+
+import logging
+from collections.abc import Iterable, Iterator
+
+import numpy as np
+
+
+__all__ = ['TrapStore']
+
+logger = logging.getLogger(__name__)
+
+
+class TrapStore:
+
+    '''Positions, coefficients and hierarchy of traps in flat arrays.
+
+    Every trap owns one slot of a store: row ``slot`` of ``r`` holds
+    its position and the same element of ``amplitude``, ``phase``,
+    ``kind``, ``parent`` and ``leaf`` holds the rest of its state.
+    ``root`` records the top of each trap's group hierarchy.
+    ``QTrap`` reads and writes its properties through its slot, so
+    code that needs the state of many traps can operate on whole
+    arrays instead of walking the trap objects.
+
+    A trap lives in the store of its Qt parent, if the parent has
+    one, and otherwise in a private store of its own.  ``QTrapOverlay``
+    owns the store of every trap in the scene; moving a trap or group
+    from one parent to another moves its subtree with ``adopt``.
+
+    Freed slots are reused, and the arrays grow by doubling, so slots
+    are stable for as long as a trap stays in a store but the arrays
+    themselves may be reallocated.  Views into them should not be
+    kept.
+
+    Parameters
+    ----------
+    capacity : int
+        Initial number of slots.  Default: 16.
+
+    Attributes
+    ----------
+    r : np.ndarray
+        Positions [pixels], float64, shape ``(capacity, 3)``.
+    amplitude, phase : np.ndarray
+        Relative amplitudes and phases [radians], float64.
+    kind : np.ndarray
+        Type codes, int16; ``-1`` for free slots.  See ``typeOf``.
+    parent : np.ndarray
+        Slot of each trap's parent group, int32; ``-1`` for traps
+        whose parent is not in this store.
+    root : np.ndarray
+        Slot of the topmost ancestor of each trap in this store, int32;
+        a trap without a parent in the store is its own root.
+    leaf : np.ndarray
+        True for slots that hold leaf traps rather than groups.
+    items : list
+        Trap that owns each slot, or ``None``.
+    '''
+
+    _codes: dict[type, int] = {}
+    _types: list[type] = []
+
+    def __init__(self, capacity: int = 16) -> None:
+        capacity = max(1, int(capacity))
+        self.r = np.zeros((capacity, 3))
+        self.amplitude = np.zeros(capacity)
+        self.phase = np.zeros(capacity)
+        self.kind = np.full(capacity, -1, dtype=np.int16)
+        self.parent = np.full(capacity, -1, dtype=np.int32)
+        self.root = np.full(capacity, -1, dtype=np.int32)
+        self.leaf = np.zeros(capacity, dtype=bool)
+        self.items: list[object | None] = [None] * capacity
+        self._size = 0
+        self._free: list[int] = []
+
+    def __len__(self) -> int:
+        return self._size - len(self._free)
+
+    def __repr__(self) -> str:
+        return f'{type(self).__name__}(traps={len(self)})'
+
+    @property
+    def capacity(self) -> int:
+        '''Number of allocated slots.'''
+        return len(self.kind)
+
+    @classmethod
+    def code(cls, kind: type) -> int:
+        '''Return the type code of a trap class.'''
+        if kind not in cls._codes:
+            cls._codes[kind] = len(cls._types)
+            cls._types.append(kind)
+        return cls._codes[kind]
+
+    @classmethod
+    def typeOf(cls, code: int) -> type:
+        '''Return the trap class with type code ``code``.'''
+        return cls._types[code]
+
+    def _grow(self, capacity: int) -> None:
+        '''Reallocate the arrays with room for ``capacity`` slots.'''
+        extra = capacity - self.capacity
+        self.r = np.concatenate((self.r, np.zeros((extra, 3))))
+        self.amplitude = np.concatenate((self.amplitude, np.zeros(extra)))
+        self.phase = np.concatenate((self.phase, np.zeros(extra)))
+        self.kind = np.concatenate(
+            (self.kind, np.full(extra, -1, dtype=np.int16)))
+        self.parent = np.concatenate(
+            (self.parent, np.full(extra, -1, dtype=np.int32)))
+        self.root = np.concatenate(
+            (self.root, np.full(extra, -1, dtype=np.int32)))
+        self.leaf = np.concatenate((self.leaf, np.zeros(extra, dtype=bool)))
+        self.items.extend([None] * extra)
+
+    def allocate(self, n: int = 1) -> np.ndarray:
+        '''Reserve ``n`` slots, reusing freed slots first.
+
+        Returns
+        -------
+        np.ndarray
+            Indices of the reserved slots.
+        '''
+        reused = [self._free.pop() for _ in range(min(n, len(self._free)))]
+        start = self._size
+        self._size += n - len(reused)
+        if self._size > self.capacity:
+            self._grow(max(self._size, 2*self.capacity))
+        return np.array(reused + list(range(start, self._size)), dtype=int)
+
+    def release(self, slots: Iterable[int]) -> None:
+        '''Free slots so that they can be reused.'''
+        slots = np.asarray(list(slots), dtype=int)
+        self.kind[slots] = -1
+        self.parent[slots] = -1
+        self.root[slots] = -1
+        self.leaf[slots] = False
+        for slot in slots.tolist():
+            self.items[slot] = None
+        self._free.extend(slots.tolist())
+
+    def add(self, trap: object, r: Iterable[float],
+            amplitude: float, phase: float) -> int:
+        '''Store the state of a new trap and return its slot.'''
+        slot = int(self.allocate(1)[0])
+        self.r[slot] = r
+        self.amplitude[slot] = amplitude
+        self.phase[slot] = phase
+        self.kind[slot] = self.code(type(trap))
+        self.root[slot] = slot
+        self.leaf[slot] = next(trap.leaves(), None) is trap
+        self.items[slot] = trap
+        trap._store, trap._slot = self, slot
+        return slot
+
+    @staticmethod
+    def subtree(trap: object) -> Iterator[object]:
+        '''Yield a trap followed by all of its descendants.'''
+        yield trap
+        for child in trap.children():
+            if hasattr(child, '_slot'):
+                yield from TrapStore.subtree(child)
+
+    def adopt(self, trap: object) -> None:
+        '''Move a trap and its descendants into this store.
+
+        The state of the subtree is copied from the store that holds
+        it, whose slots are released.  Parent and root indices are
+        updated for the whole subtree, so ``adopt`` is also how a trap that
+        already lives in this store is moved to a new parent.
+
+        Parameters
+        ----------
+        trap : QTrap
+            Root of the subtree to move.
+        '''
+        nodes = list(self.subtree(trap))
+        for store in {node._store for node in nodes} - {self}:
+            mine = [n for n in nodes if n._store is store]
+            if len(mine) == 1:
+                self._move(mine[0])
+                continue
+            source = np.array([n._slot for n in mine], dtype=int)
+            slots = self.allocate(len(mine))
+            self.r[slots] = store.r[source]
+            self.amplitude[slots] = store.amplitude[source]
+            self.phase[slots] = store.phase[source]
+            self.kind[slots] = store.kind[source]
+            self.leaf[slots] = store.leaf[source]
+            store.release(source)
+            for node, slot in zip(mine, slots.tolist()):
+                self.items[slot] = node
+                node._store, node._slot = self, slot
+        for node in nodes:
+            parent = node.parent()
+            slot = node._slot
+            if (getattr(parent, '_store', None) is self
+                    and hasattr(parent, '_slot')):
+                self.parent[slot] = parent._slot
+                self.root[slot] = self.root[parent._slot]
+            else:
+                self.parent[slot] = -1
+                self.root[slot] = slot
+
+    def _move(self, node: object) -> None:
+        '''Move a single trap into this store, element by element.'''
+        store, source = node._store, node._slot
+        if self._free:
+            slot = self._free.pop()
+        else:
+            slot = self._size
+            self._size += 1
+            if self._size > self.capacity:
+                self._grow(2*self.capacity)
+        self.r[slot] = store.r[source]
+        self.amplitude[slot] = store.amplitude[source]
+        self.phase[slot] = store.phase[source]
+        self.kind[slot] = store.kind[source]
+        self.leaf[slot] = store.leaf[source]
+        self.items[slot] = node
+        store.kind[source] = -1
+        store.parent[source] = -1
+        store.root[source] = -1
+        store.leaf[source] = False
+        store.items[source] = None
+        store._free.append(source)
+        node._store, node._slot = self, slot
+
+    @property
+    def slots(self) -> np.ndarray:
+        '''Indices of all occupied slots.'''
+        return np.flatnonzero(self.kind[:self._size] >= 0)
+
+    @property
+    def leaves(self) -> np.ndarray:
+        '''Indices of the slots that hold leaf traps.'''
+        return np.flatnonzero(self.leaf[:self._size])
+
+    def descendants(self, slot: int | Iterable[int]) -> np.ndarray:
+        '''Return the slots of all descendants of the traps in ``slot``.
+
+        The hierarchy is traversed one level at a time with
+        vectorized lookups in ``parent``.  ``slot`` may be a single
+        slot or a sequence of slots, whose descendants are returned
+        together, without duplicates if no slot descends from
+        another.
+        '''
+        parent = self.parent[:self._size]
+        found = []
+        level = np.atleast_1d(np.asarray(slot, dtype=int))
+        while len(level):
+            level = np.flatnonzero(np.isin(parent, level))
+            found.append(level)
+        return np.concatenate(found)
+
+    def rootOf(self, trap: object) -> object:
+        '''Return the topmost ancestor of a trap in this store.'''
+        return self.items[self.root[trap._slot]]
+
+    def positions(self, traps: Iterable[object]) -> np.ndarray:
+        '''Return the positions of traps in this store, shape ``(N, 3)``.'''
+        return self.r[[trap._slot for trap in traps]]
+
+    @staticmethod
+    def gather(traps: Iterable[object]) -> np.ndarray:
+        '''Return the positions of many traps, shape ``(N, 3)``.
+
+        Traps that share a store, as all traps in one overlay do, are
+        read with a single fancy-indexing operation.  Otherwise each
+        position is read from the trap's ``r``.
+        '''
+        traps = list(traps)
+        stores = {getattr(trap, '_store', None) for trap in traps}
+        if len(stores) == 1 and None not in stores:
+            return stores.pop().positions(traps)
+        r = np.array([trap.r for trap in traps], dtype=float)
+        return r.reshape(-1, 3)
@@ -1,3 +1,6 @@
+from .TrapStore import TrapStore
+from .TrapSnapshot import TrapSnapshot
+from .SpotGrid import SpotGrid
 from .QTrap import QTrap
 from .QTrapGroup import QTrapGroup
 from .QTrapOverlay import QTrapOverlay
@@ -7,7 +10,8 @@ from .commands import (
     MoveCommand, RotateCommand, WheelCommand, LockCommand)
 
 
-__all__ = ('QTrap QTrapGroup QTrapOverlay QTrapMenu '
+__all__ = ('TrapStore TrapSnapshot SpotGrid '
+           'QTrap QTrapGroup QTrapOverlay QTrapMenu '
            'AddTrapCommand RemoveTrapCommand '
            'MoveCommand RotateCommand WheelCommand '
            'LockCommand').split()
@@ -7,7 +7,9 @@ from pyqtgraph.Qt import QtCore, QtWidgets, QtGui, uic
 from QVideo.lib import choose_camera, QCameraTree
 from QHOT.lib import (QSLM, QSLMWidget, QSaveFile,  # noqa: F401
                       build_parser, choose_cgh, choose_slm)
-from QHOT.lib.holograms import CGH, QCGHTree      # noqa: F401
+from QHOT.lib.holograms import CGH, QCGHTree, QCGHScheduler  # noqa: F401
+from QHOT.lib.holograms.GeometryCache import GeometryCache
+from QHOT.lib.holograms.HologramCache import HologramCache
 from QHOT.lib.tasks import QTaskManager
 from QHOT.lib.traps import QTrap, QTrapGroup, QTrapMenu  # noqa: F401
 
@@ -38,6 +40,9 @@ class QHOT(QtWidgets.QMainWindow):
 
     Attributes
     ----------
+    scheduler : QCGHScheduler
+        Computes the hologram for the newest trap state in the CGH
+        thread, at ``scheduler.rate`` holograms per second.
     manager : QTaskManager
         Frame-synchronised task scheduler.  Register tasks with
         ``self.manager.register(task)`` to queue them for execution.
@@ -47,8 +52,6 @@ class QHOT(QtWidgets.QMainWindow):
     HELPDIR = Path(__file__).parent / 'help'
     SETTINGS = ('QHOT', 'QHOT')
 
-    _computeRequested = QtCore.pyqtSignal(list)
-
     def __init__(self, cameraTree: QCameraTree,
                  *args,
                  slm: QSLM | None = None,
@@ -61,8 +64,10 @@ class QHOT(QtWidgets.QMainWindow):
         self.cgh = cgh or CGH(shape=self.slm.shape)
         self._cghThread = QtCore.QThread(self)
         self.cgh.moveToThread(self._cghThread)
-        self._trapsChanged: bool = False
-        self._computePending: bool = False
+        self.scheduler = QCGHScheduler(self.cgh)
+        self.scheduler.moveToThread(self._cghThread)
+        self._cghThread.started.connect(self.scheduler.start)
+        self._cghThread.finished.connect(self.scheduler.stop)
         self._setupUi()
         self._connectSignals()
         self._addFilters()
@@ -142,16 +147,12 @@ class QHOT(QtWidgets.QMainWindow):
         '''Wire signals and slots between subsystems.
 
         PyQt6 uic only handles no-argument connections from .ui files;
-        typed signals (str, bool) must be connected here.  The
-        no-argument ``screen.rendered → _onFrame`` connection is
-        declared in QHOT.ui.
+        typed signals (str, bool) must be connected here.
         '''
         self.dvr.playing.connect(self.dvrPlayback)
         self.dvr.recording.connect(self.cameraTree.setDisabled)
         self.cgh.hologramReady.connect(self.slm.setData)
         self.cgh.hologramReady.connect(self.slmView.setData)
-        self.cgh.hologramReady.connect(self._onHologramReady)
-        self._computeRequested.connect(self.cgh.compute)
         self.screen.status.connect(self.setStatus)
         self.taskManagerWidget.status.connect(self.setStatus)
         overlay = self.screen.overlay
@@ -159,6 +160,8 @@ class QHOT(QtWidgets.QMainWindow):
         overlay.trapRemoved.connect(self.traps.unregisterTrap)
         overlay.trapAdded.connect(self._onTrapAdded)
         overlay.trapRemoved.connect(self._onTrapRemoved)
+        overlay.trapsChanged.connect(self._onTrapsChanged)
+        overlay.trapsChanged.connect(self.traps.updateTraps)
         self.cgh.recalculate.connect(self._scheduleCompute)
         self.menuAddTrap.trapRequested.connect(self._onTrapRequested)
 
@@ -169,45 +172,21 @@ class QHOT(QtWidgets.QMainWindow):
 
     @QtCore.pyqtSlot(QTrap)
     def _onTrapAdded(self, trap: QTrap) -> None:
-        '''Connect each new trap's changed signals and schedule a compute.
+        '''Schedule a compute for a newly added trap.
 
-        For groups, the group's own ``changed`` is connected to handle
-        translation (individual leaves do not emit ``changed`` on group
-        moves).  Each leaf's ``changed`` and ``structureChanged`` are
-        also connected to handle independent leaf changes.
+        Later changes of the trap reach ``_onTrapsChanged`` through
+        the overlay's ``trapsChanged`` changeset.
         '''
-        if isinstance(trap, QTrapGroup):
-            trap.changed.connect(self._scheduleCompute)
-        for leaf in trap.leaves():
-            leaf.changed.connect(self._scheduleCompute)
-            if hasattr(leaf, 'structureChanged'):
-                leaf.structureChanged.connect(self._scheduleCompute)
         self._scheduleCompute()
 
     @QtCore.pyqtSlot(QTrap)
     def _onTrapRemoved(self, trap: QTrap) -> None:
-        '''Disconnect compute signals and schedule a hologram recompute.
+        '''Schedule a hologram recompute after a trap is removed.'''
+        self._scheduleCompute()
 
-        Disconnects signals connected in ``_onTrapAdded`` so that
-        undo/redo cycles do not accumulate duplicate connections.
-        '''
-        if isinstance(trap, QTrapGroup):
-            try:
-                trap.changed.disconnect(self._scheduleCompute)
-            except (TypeError, RuntimeError):
-                logger.debug('could not disconnect changed from %r', trap)
-        for leaf in trap.leaves():
-            try:
-                leaf.changed.disconnect(self._scheduleCompute)
-            except (TypeError, RuntimeError):
-                logger.debug('could not disconnect changed from %r', leaf)
-            if hasattr(leaf, 'structureChanged'):
-                try:
-                    leaf.structureChanged.disconnect(self._scheduleCompute)
-                except (TypeError, RuntimeError):
-                    logger.debug(
-                        'could not disconnect structureChanged from %r',
-                        leaf)
+    @QtCore.pyqtSlot(object)
+    def _onTrapsChanged(self, traps: frozenset[QTrap]) -> None:
+        '''Schedule one compute for a changeset of modified traps.'''
         self._scheduleCompute()
 
     @QtCore.pyqtSlot(QtCore.QPointF, QTrap)
@@ -218,21 +197,12 @@ class QHOT(QtWidgets.QMainWindow):
 
     @QtCore.pyqtSlot()
     def _scheduleCompute(self) -> None:
-        '''Mark traps as changed; the next frame will trigger recomputation.'''
-        self._trapsChanged = True
+        '''Submit a snapshot of the traps to the CGH scheduler.
 
-    @QtCore.pyqtSlot()
-    def _onFrame(self) -> None:
-        '''On each video frame, dispatch a compute if traps have changed.'''
-        if self._trapsChanged and not self._computePending:
-            self._trapsChanged = False
-            self._computePending = True
-            self._computeRequested.emit(list(self.screen.overlay._traps))
-
-    @QtCore.pyqtSlot(object)
-    def _onHologramReady(self, _phase) -> None:
-        '''Clear the pending flag so the next frame may trigger a compute.'''
-        self._computePending = False
+        The scheduler computes the newest submitted state at its own
+        rate, independently of the rate at which frames are rendered.
+        '''
+        self.scheduler.submit(self.screen.overlay.snapshot())
 
     @QtCore.pyqtSlot(bool)
     def dvrPlayback(self, playback: bool) -> None:
@@ -450,6 +420,16 @@ def main() -> None:
     flags) and the CGH backend (QHOT flags) from a shared parser, so
     that ``-h`` shows all options together.  The CGH backend is
     auto-selected (TorchCGH → cupyCGH → CGH) when no flag is given.
+    A ``--cache-budget`` given on the command line takes precedence
+    over the value restored from the configuration file.
+    ``--geometry-cache`` stores the CGH geometry tables in the
+    ``geometry`` subdirectory of the configuration directory.
+    Computed holograms are cached in memory, so returning to an
+    earlier trap configuration costs a lookup; ``--hologram-cache``
+    also stores them in the ``holograms`` subdirectory of the
+    configuration directory.
+    ``--cgh-rate`` sets the maximum number of holograms computed per
+    second.
     '''
     app = pg.mkQApp('QHOT')
     parser = build_parser()
@@ -457,6 +437,17 @@ def main() -> None:
     cgh = choose_cgh(parser, shape=slm.shape)
     cameraTree = choose_camera(parser).start()
     hot = QHOT(cameraTree, slm=slm, cgh=cgh)
+    args, _ = parser.parse_known_args()
+    if args.cachebudget is not None:
+        hot.cghTree.set('cachebudget', args.cachebudget)
+    if args.geometrycache:
+        hot.cgh.geometrycache = GeometryCache(
+            hot.save.configdir / 'geometry')
+    hot.cgh.hologramcache = HologramCache(
+        directory=(hot.save.configdir / 'holograms'
+                   if args.hologramcache else None))
+    if args.cghrate is not None:
+        hot.scheduler.rate = args.cghrate
     hot.show()
     pg.exec()
 
@@ -20,6 +20,21 @@ def make_trap():
     return trap
 
 
+class LiveVortex(QTrap):
+
+    '''Vortex whose structure can only be computed from its live state.'''
+
+    def __init__(self, *args, ell=0, **kwargs):
+        self.ell = ell
+        super().__init__(*args, **kwargs)
+
+    def structureKey(self):
+        return (self.ell,)
+
+    def structure(self, cgh):
+        return cgh.helical(self.ell)
+
+
 class TestInit(unittest.TestCase):
 
     def test_default_shape(self):
@@ -179,6 +194,147 @@ class TestUpdateGeometry(unittest.TestCase):
         self.assertEqual(self.cgh.field.shape, (256, 256))
 
 
+class TestGeometryTables(unittest.TestCase):
+
+    def setUp(self):
+        self.cgh = CGH(shape=(32, 48))
+
+    def test_tables_not_built_by_geometry(self):
+        self.cgh.updateGeometry()
+        self.assertEqual(self.cgh._geometryTables(), {})
+
+    def test_plain_compute_builds_no_tables(self):
+        self.cgh.compute([make_trap()])
+        self.assertEqual(self.cgh._geometryTables(), {})
+
+    def test_theta_built_on_demand(self):
+        theta = self.cgh.theta
+        self.assertEqual(theta.shape, self.cgh.shape)
+        self.assertEqual(theta.dtype, np.float32)
+        self.assertIs(self.cgh.theta, theta)
+
+    def test_theta_values(self):
+        y = np.arange(self.cgh.height) - self.cgh.ys
+        x = np.cos(np.radians(self.cgh.phis)) * \
+            (np.arange(self.cgh.width) - self.cgh.xs)
+        np.testing.assert_allclose(self.cgh.theta,
+                                   np.arctan2.outer(y, x), atol=1e-6)
+
+    def test_qr_values(self):
+        q = self.cgh.qprp
+        y = np.arange(self.cgh.height) - self.cgh.ys
+        x = np.cos(np.radians(self.cgh.phis)) * \
+            (np.arange(self.cgh.width) - self.cgh.xs)
+        np.testing.assert_allclose(self.cgh.qr,
+                                   np.hypot.outer(q * y, q * x), rtol=1e-6)
+
+    def test_qrmax_matches_qr(self):
+        self.assertAlmostEqual(self.cgh._qrmax, float(self.cgh.qr.max()),
+                               places=5)
+
+    def test_geometry_change_invalidates_tables(self):
+        theta = self.cgh.theta
+        self.cgh.xs = 3.
+        self.assertNotIn('theta', self.cgh._geometryTables())
+        self.assertIsNot(self.cgh.theta, theta)
+        self.assertEqual(self.cgh._tables_version,
+                         self.cgh.geometry_version)
+
+    def test_shape_change_resizes_tables(self):
+        self.cgh.qr
+        self.cgh.shape = (16, 24)
+        self.assertEqual(self.cgh.qr.shape, (16, 24))
+
+    def test_matrix_change_keeps_tables(self):
+        theta = self.cgh.theta
+        self.cgh.thetac = 30.
+        self.assertIs(self.cgh.theta, theta)
+
+    def test_assign_table(self):
+        theta = np.ones(self.cgh.shape, dtype=np.float32)
+        self.cgh.theta = theta
+        self.assertIs(self.cgh.theta, theta)
+
+
+class TestBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.cgh = CGH()
+
+    def test_values_applied_immediately(self):
+        with self.cgh.batch():
+            self.cgh.xs = 100.
+            self.assertEqual(self.cgh.xs, 100.)
+
+    def test_geometry_updated_once(self):
+        with patch.object(self.cgh, 'updateGeometry',
+                          wraps=self.cgh.updateGeometry) as update:
+            with self.cgh.batch():
+                self.cgh.xs = 100.
+                self.cgh.ys = 100.
+                self.cgh.wavelength = 0.532
+                update.assert_not_called()
+        update.assert_called_once()
+
+    def test_matrix_updated_once(self):
+        with patch.object(self.cgh, 'updateTransformationMatrix',
+                          wraps=self.cgh.updateTransformationMatrix) as update:
+            with self.cgh.batch():
+                self.cgh.xc = 10.
+                self.cgh.thetac = 5.
+        update.assert_called_once()
+
+    def test_recalculate_emitted_once(self):
+        spy = QtTest.QSignalSpy(self.cgh.recalculate)
+        with self.cgh.batch():
+            self.cgh.xs = 100.
+            self.cgh.xc = 10.
+        self.assertEqual(len(spy), 1)
+
+    def test_no_change_no_update(self):
+        spy = QtTest.QSignalSpy(self.cgh.recalculate)
+        with self.cgh.batch():
+            self.cgh.xs = self.cgh.xs
+        self.assertEqual(len(spy), 0)
+
+    def test_budget_only_does_not_emit(self):
+        spy = QtTest.QSignalSpy(self.cgh.recalculate)
+        with self.cgh.batch():
+            self.cgh.cachebudget = 16.
+        self.assertEqual(len(spy), 0)
+        self.assertEqual(self.cgh._budget.limit, 16 * 2**20)
+
+    def test_nested_batches_update_once(self):
+        spy = QtTest.QSignalSpy(self.cgh.recalculate)
+        with self.cgh.batch():
+            with self.cgh.batch():
+                self.cgh.xs = 100.
+            self.assertEqual(len(spy), 0)
+            self.cgh.ys = 100.
+        self.assertEqual(len(spy), 1)
+
+    def test_exception_rolls_back(self):
+        xs, version = self.cgh.xs, self.cgh.geometry_version
+        with self.assertRaises(RuntimeError):
+            with self.cgh.batch():
+                self.cgh.xs = 100.
+                raise RuntimeError
+        self.assertEqual(self.cgh.xs, xs)
+        self.assertEqual(self.cgh.geometry_version, version)
+        self.cgh.ys = 10.
+        self.assertEqual(self.cgh.geometry_version, version + 1)
+
+    def test_signals_unblocked_after_batch(self):
+        with self.cgh.batch():
+            self.cgh.xs = 100.
+        self.assertFalse(self.cgh.signalsBlocked())
+
+    def test_settings_emit_recalculate_once(self):
+        spy = QtTest.QSignalSpy(self.cgh.recalculate)
+        self.cgh.settings = {'xs': 100., 'xc': 10., 'cachebudget': 8.}
+        self.assertEqual(len(spy), 1)
+
+
 class TestProperties(unittest.TestCase):
 
     def setUp(self):
@@ -328,6 +484,120 @@ class TestQuantize(unittest.TestCase):
         field = np.ones((3, 5), dtype=complex)
         self.assertEqual(CGH.quantize(field).shape, (3, 5))
 
+    def reference(self, field):
+        return ((128./np.pi)*np.angle(field) + 127.).astype(np.uint8)
+
+    def random_field(self, shape, dtype):
+        rng = np.random.default_rng(0)
+        field = rng.normal(size=shape) + 1j*rng.normal(size=shape)
+        return field.astype(dtype)
+
+    def test_matches_reference_complex64(self):
+        field = self.random_field((100, 37), np.complex64)
+        np.testing.assert_array_equal(CGH.quantize(field, rows=16),
+                                      self.reference(field))
+
+    def test_matches_reference_complex128(self):
+        field = self.random_field((100, 37), np.complex128)
+        np.testing.assert_array_equal(CGH.quantize(field, rows=16),
+                                      self.reference(field))
+
+    def test_writes_into_out(self):
+        field = self.random_field((8, 8), np.complex64)
+        out = np.zeros((8, 8), dtype=np.uint8)
+        self.assertIs(CGH.quantize(field, out=out), out)
+        np.testing.assert_array_equal(out, self.reference(field))
+
+    def test_error_within_one_lsb(self):
+        field = self.random_field((64, 64), np.complex64)
+        error = CGH.quantizationError(field, CGH.quantize(field))
+        self.assertLess(error, np.pi/128.)
+
+    def test_error_of_exact_levels_is_zero(self):
+        phase = (np.arange(256) - 127.) * (np.pi/128.)
+        field = np.exp(1j*phase)[None, :]
+        hologram = np.arange(256, dtype=np.uint8)[None, :]
+        error = CGH.quantizationError(field, hologram)
+        self.assertAlmostEqual(error, 0.)
+
+
+class TestStructurePrimitives(unittest.TestCase):
+
+    def setUp(self):
+        self.cgh = CGH(shape=(32, 48))
+        self.theta = self.cgh.theta.astype(float)
+
+    def test_helical(self):
+        np.testing.assert_allclose(self.cgh.helical(2),
+                                   np.exp(2j * self.theta),
+                                   rtol=0, atol=1e-6)
+
+    def test_helical_shape(self):
+        self.assertEqual(self.cgh.helical(1).shape, self.cgh.shape)
+
+    def test_helical_integer_accuracy(self):
+        for ell in (1, 2, 7, 30, -1, -13, 4.):
+            error = np.abs(self.cgh.helical(ell) -
+                           np.exp(1j * ell * self.theta)).max()
+            self.assertLess(error, 2e-7 * (abs(ell) + 1), msg=f'{ell = }')
+
+    def test_helical_fractional(self):
+        np.testing.assert_allclose(self.cgh.helical(1.5),
+                                   np.exp(1.5j * self.theta),
+                                   rtol=0, atol=1e-6)
+
+    def test_helical_zero(self):
+        np.testing.assert_allclose(self.cgh.helical(0), 1.)
+
+    def test_helical_does_not_alias_phasor(self):
+        structure = self.cgh.helical(1)
+        structure *= 2.
+        np.testing.assert_allclose(np.abs(self.cgh.helical(1)), 1.,
+                                   rtol=1e-6)
+
+    def test_helical_avoids_exponential(self):
+        self.cgh.helical(1)
+        with patch.object(_cgh_mod.np, 'exp',
+                          side_effect=AssertionError) as exp:
+            self.cgh.helical(5)
+        exp.assert_not_called()
+
+    def test_bessel(self):
+        from scipy.special import jv
+        np.testing.assert_allclose(self.cgh.bessel(3., 10.),
+                                   jv(3., 10. * self.cgh.qr),
+                                   rtol=0, atol=2e-5)
+
+    def test_bessel_accuracy_bound(self):
+        from scipy.special import jv
+        bound = self.cgh.bessel_step**2 / 8. + 1e-6
+        qr = self.cgh.qr.astype(float)
+        for ell, radius in ((0., 10.), (1., 40.), (-3., 25.),
+                            (10., 60.), (2.5, 15.), (5., -20.)):
+            error = np.abs(self.cgh.bessel(ell, radius) -
+                           jv(ell, radius * qr)).max()
+            self.assertLess(error, bound, msg=f'{ell = }, {radius = }')
+
+    def test_bessel_zero_radius(self):
+        np.testing.assert_allclose(self.cgh.bessel(2., 0.), 0.)
+        np.testing.assert_allclose(self.cgh.bessel(0., 0.), 1.)
+
+    def test_bessel_dtype(self):
+        self.assertEqual(self.cgh.bessel(1., 10.).dtype, np.float32)
+
+    def test_bessel_tabulates_far_fewer_points_than_pixels(self):
+        cgh = CGH(shape=(256, 256))
+        with patch.object(_cgh_mod, 'jv', wraps=_cgh_mod.jv) as mock_jv:
+            cgh.bessel(2., 10.)
+        samples = mock_jv.call_args.args[1]
+        self.assertLess(samples.size, cgh.height * cgh.width)
+
+    def test_bessel_step(self):
+        table, scale = self.cgh._besselTable(1., 30.)
+        self.cgh.bessel_step = 0.001
+        finer, _ = self.cgh._besselTable(1., 30.)
+        self.assertGreater(len(finer), 5 * len(table))
+
 
 class TestWindow(unittest.TestCase):
 
@@ -370,6 +640,75 @@ class TestTransform(unittest.TestCase):
         self.assertAlmostEqual(result.y(), 0., places=5)
 
 
+class TestTransformPoints(unittest.TestCase):
+
+    def setUp(self):
+        self.cgh = CGH(xc=320., yc=240., zc=5., thetac=30., splay=0.01)
+        rng = np.random.default_rng(1)
+        self.r = rng.uniform(-500., 500., (20, 3))
+
+    def reference(self, r):
+        '''Single-precision mapping through QMatrix4x4.'''
+        v = self.cgh.matrix.map(QtGui.QVector3D(*r))
+        fac = 1. / (1. + self.cgh.splay*(v.z() - self.cgh.zc))
+        return np.array([v.x()*fac, v.y()*fac, v.z()])
+
+    def test_shape_and_dtype(self):
+        s = self.cgh.transformPoints(self.r)
+        self.assertEqual(s.shape, (20, 3))
+        self.assertEqual(s.dtype, np.float64)
+
+    def test_matches_qmatrix(self):
+        s = self.cgh.transformPoints(self.r)
+        expected = np.array([self.reference(r) for r in self.r])
+        np.testing.assert_allclose(s, expected, rtol=1e-5, atol=1e-3)
+
+    def test_matches_transform(self):
+        s = self.cgh.transformPoints(self.r[:1])[0]
+        v = self.cgh.transform(QtGui.QVector3D(*self.r[0]))
+        np.testing.assert_allclose([v.x(), v.y(), v.z()], s, rtol=1e-6)
+
+    def test_single_position(self):
+        self.assertEqual(self.cgh.transformPoints([1., 2., 3.]).shape,
+                         (1, 3))
+
+    def test_does_not_modify_input(self):
+        r = self.r.copy()
+        self.cgh.transformPoints(r)
+        np.testing.assert_array_equal(r, self.r)
+
+    def test_inverse_round_trip(self):
+        s = self.cgh.transformPoints(self.r)
+        np.testing.assert_allclose(self.cgh.inverseTransformPoints(s),
+                                   self.r, rtol=0, atol=1e-9)
+
+    def test_inverse_does_not_modify_input(self):
+        s = self.cgh.transformPoints(self.r)
+        t = s.copy()
+        self.cgh.inverseTransformPoints(s)
+        np.testing.assert_array_equal(s, t)
+
+    def test_inverse_matrix(self):
+        np.testing.assert_allclose(self.cgh._inverse @ self.cgh._matrix,
+                                   np.identity(4), atol=1e-12)
+
+    def test_calibration_change_updates_matrix(self):
+        before = self.cgh.transformPoints(self.r)
+        self.cgh.thetac = 45.
+        self.assertFalse(np.allclose(self.cgh.transformPoints(self.r),
+                                     before))
+
+    def test_factors_use_vectorized_transform(self):
+        traps = [make_trap() for _ in range(5)]
+        for trap, r in zip(traps, self.r):
+            trap.r = r
+        with patch.object(self.cgh, 'transformPoints',
+                          wraps=self.cgh.transformPoints) as transform, \
+                self.cgh._reading(traps):
+            self.cgh._factorsOf(traps)
+        transform.assert_called_once()
+
+
 class TestFieldOf(unittest.TestCase):
 
     def setUp(self):
@@ -457,6 +796,12 @@ class TestCompute(unittest.TestCase):
     def test_output_shape(self):
         self.assertEqual(self.cgh.compute([self.trap]).shape, self.cgh.shape)
 
+    def test_compute_alternates_output_buffers(self):
+        first = self.cgh.compute([self.trap])
+        second = self.cgh.compute([self.trap])
+        self.assertIsNot(first, second)
+        self.assertIs(self.cgh.compute([self.trap]), first)
+
     def test_emits_hologram_ready(self):
         spy = QtTest.QSignalSpy(self.cgh.hologramReady)
         self.cgh.compute([self.trap])
@@ -540,24 +885,6 @@ class TestGroupField(unittest.TestCase):
         self.cgh.fieldOf(self.group)
         self.assertIn(self.group, self.cgh._structure_cache)
 
-    def test_toplevel_ungrouped_returns_trap(self):
-        from QHOT.traps.QTweezer import QTweezer
-        solo = QTweezer(r=(5., 5., 0.), phase=0.)
-        self.assertIs(CGH._topLevel(solo), solo)
-
-    def test_toplevel_group_member_returns_group(self):
-        self.assertIs(CGH._topLevel(self.t1), self.group)
-
-    def test_toplevel_nested_member_returns_outer(self):
-        from QHOT.lib.traps.QTrapGroup import QTrapGroup
-        from QHOT.traps.QTweezer import QTweezer
-        outer = QTrapGroup(r=(0., 0., 0.))
-        inner = QTrapGroup(r=(1., 0., 0.))
-        leaf = QTweezer(r=(2., 0., 0.), phase=0.)
-        inner.addTrap(leaf)
-        outer.addTrap(inner)
-        self.assertIs(CGH._topLevel(leaf), outer)
-
     def test_group_translation_invalidates_field_cache_only(self):
         self.cgh.fieldOf(self.group)
         self.assertIn(self.group, self.cgh._field_cache)
@@ -574,6 +901,22 @@ class TestGroupField(unittest.TestCase):
         self.assertNotIn(self.t1, self.cgh._field_cache)
         self.assertNotIn(self.group, self.cgh._structure_cache)
 
+    def test_rotation_invalidates_leaves_and_structure(self):
+        self.cgh.fieldOf(self.group)
+        snap = self.group._snapshot()
+        self.group.rotate(np.pi / 2., snap)
+        self.assertNotIn(self.t1, self.cgh._field_cache)
+        self.assertNotIn(self.t2, self.cgh._field_cache)
+        self.assertNotIn(self.group, self.cgh._structure_cache)
+
+    def test_rotated_group_field_matches_fresh_computation(self):
+        self.cgh.fieldOf(self.group)
+        self.group.rotate(np.pi / 2., self.group._snapshot())
+        rotated = self.cgh.fieldOf(self.group)
+        fresh = CGH(xc=0., yc=0., zc=0., thetac=0., splay=0.)
+        np.testing.assert_allclose(rotated, fresh.fieldOf(self.group),
+                                   atol=1e-4)
+
     def test_invalidate_structure_chain_propagates_upward(self):
         from QHOT.lib.traps.QTrapGroup import QTrapGroup
         from QHOT.traps.QTweezer import QTweezer
@@ -614,5 +957,798 @@ class TestGroupField(unittest.TestCase):
         self.assertNotIn(self.group, self.cgh._structure_cache)
 
 
+class TestBatchedCompute(unittest.TestCase):
+
+    def setUp(self):
+        from QHOT.traps.QTweezer import QTweezer
+        from QHOT.traps.QVortex import QVortex
+        self.cgh = CGH(shape=(64, 96))
+        self.cgh.incremental = False
+        rng = np.random.default_rng(1)
+        self.traps = [QTweezer(r=(x, y, z), phase=p)
+                      for x, y, z, p in rng.uniform(-50., 50., (20, 4))]
+        self.vortex = QVortex(r=(10., 20., 0.), phase=0., ell=3)
+
+    def reference(self, traps):
+        self.cgh.batched = False
+        field = self.cgh._accumulate(traps).copy()
+        self.cgh.batched = True
+        return field
+
+    def test_batched_by_default(self):
+        self.assertTrue(CGH.batched)
+
+    def test_batched_matches_per_trap_sum(self):
+        expected = self.reference(self.traps)
+        field = self.cgh._accumulate(self.traps)
+        np.testing.assert_allclose(field, expected, rtol=0, atol=1e-3)
+
+    def test_batched_with_structured_trap(self):
+        traps = self.traps + [self.vortex]
+        expected = self.reference(traps)
+        field = self.cgh._accumulate(traps)
+        np.testing.assert_allclose(field, expected, rtol=0, atol=1e-3)
+
+    def test_batched_skips_fieldof_for_plain_traps(self):
+        with patch.object(self.cgh, 'fieldOf',
+                          wraps=self.cgh.fieldOf) as mock_fo:
+            self.cgh.compute(self.traps + [self.vortex])
+            self.assertEqual(mock_fo.call_count, 1)
+            self.assertIs(mock_fo.call_args.args[0], self.vortex)
+
+    def test_unbatched_calls_fieldof_per_trap(self):
+        self.cgh.batched = False
+        with patch.object(self.cgh, 'fieldOf',
+                          wraps=self.cgh.fieldOf) as mock_fo:
+            self.cgh.compute(self.traps)
+            self.assertEqual(mock_fo.call_count, len(self.traps))
+
+    def test_ramp_shapes(self):
+        r = np.zeros((len(self.traps), 3), dtype=np.float32)
+        ey, ex = self.cgh._ramps(r)
+        self.assertEqual(ey.shape, (len(self.traps), self.cgh.height))
+        self.assertEqual(ex.shape, (len(self.traps), self.cgh.width))
+        self.assertEqual(ey.dtype, np.complex64)
+
+    def test_empty_batch_zeroes_field(self):
+        self.cgh.compute(self.traps)
+        self.cgh._superpose([], self.cgh.field)
+        np.testing.assert_array_equal(self.cgh.field, 0j)
+
+    def test_group_of_tweezers_matches_unbatched(self):
+        from QHOT.lib.traps.QTrapGroup import QTrapGroup
+        group = QTrapGroup(r=(0., 0., 0.))
+        group.addTrap(self.traps[:5])
+        expected = self.reference([group])
+        self.cgh._clearCache()
+        field = self.cgh._accumulate([group])
+        np.testing.assert_allclose(field, expected, rtol=0, atol=1e-3)
+
+
+class TestFactorizedCache(unittest.TestCase):
+
+    def setUp(self):
+        from QHOT.traps.QTweezer import QTweezer
+        from QHOT.traps.QVortex import QVortex
+        self.cgh = CGH(shape=(64, 96))
+        self.tweezer = QTweezer(r=(10., 20., 5.), amplitude=0.5, phase=1.)
+        self.vortex = QVortex(r=(-10., 0., 0.), phase=0., ell=2)
+
+    def test_field_cache_holds_rank1(self):
+        from QHOT.lib.holograms.CGH import Rank1
+        self.cgh.fieldOf(self.tweezer)
+        self.assertIsInstance(self.cgh._field_cache[self.tweezer], Rank1)
+
+    def test_rank1_stores_vectors(self):
+        self.cgh.fieldOf(self.tweezer)
+        factor = self.cgh._field_cache[self.tweezer]
+        self.assertEqual(factor.ey.shape, (self.cgh.height,))
+        self.assertEqual(factor.ex.shape, (self.cgh.width,))
+
+    def test_rank1_coefficient(self):
+        self.cgh.fieldOf(self.tweezer)
+        factor = self.cgh._field_cache[self.tweezer]
+        self.assertAlmostEqual(factor.coefficient, 0.5 * np.exp(1j))
+
+    def test_full_is_outer_product(self):
+        self.cgh.fieldOf(self.tweezer)
+        f = self.cgh._field_cache[self.tweezer]
+        expected = np.outer(f.coefficient * f.ey, f.ex)
+        np.testing.assert_allclose(f.full(), expected, rtol=1e-6)
+
+    def test_plain_field_matches_direct_evaluation(self):
+        cgh = CGH(shape=(64, 96), xc=0., yc=0., zc=0., splay=0.)
+        self.tweezer.r = (10., 20., 0.)
+        ex = np.exp(cgh.iqx * np.float32(10.))
+        ey = np.exp(cgh.iqy * np.float32(20.))
+        expected = np.outer(0.5 * np.exp(1j) * ey, ex)
+        np.testing.assert_allclose(cgh.fieldOf(self.tweezer), expected,
+                                   rtol=0, atol=1e-5)
+
+    def test_cache_memory_is_vectors_only(self):
+        self.cgh.fieldOf(self.tweezer)
+        f = self.cgh._field_cache[self.tweezer]
+        nbytes = f.ey.nbytes + f.ex.nbytes
+        self.assertLess(nbytes, np.zeros(self.cgh.shape,
+                                         dtype=self.cgh.dtype).nbytes)
+
+    def test_cached_vectors_own_memory(self):
+        from QHOT.traps.QTweezer import QTweezer
+        traps = [self.tweezer, QTweezer(r=(-3., 4., 0.), phase=0.)]
+        for size in (0, 4096):
+            self.cgh.ramp_cache_size = size
+            self.cgh.compute(traps)
+            for trap in traps:
+                factor = self.cgh._field_cache[trap]
+                self.assertIsNone(factor.ey.base)
+                self.assertIsNone(factor.ex.base)
+            self.cgh.xs = float(size)
+
+    def test_structure_cached_as_full_frame(self):
+        self.cgh.fieldOf(self.vortex)
+        self.assertEqual(self.cgh._structure_cache[self.vortex].shape,
+                         self.cgh.shape)
+
+    def test_group_coefficient_is_one(self):
+        from QHOT.lib.traps.QTrapGroup import QTrapGroup
+        group = QTrapGroup(r=(0., 0., 0.), phase=2.)
+        group.addTrap(self.tweezer)
+        self.cgh.fieldOf(group)
+        self.assertEqual(self.cgh._field_cache[group].coefficient, 1.)
+
+
+class TestRampCache(unittest.TestCase):
+
+    def setUp(self):
+        from QHOT.traps.QTweezer import QTweezer
+        self.cgh = CGH(shape=(64, 96), xc=0., yc=0., zc=0., splay=0.)
+        self.trap = QTweezer(r=(10., 20., 5.), phase=0.)
+        self.ramps = self.cgh._ramp_cache
+
+    def test_vectors_cached_by_coordinates(self):
+        self.cgh.compute([self.trap])
+        self.assertIn(('x', 0., 10., 5.), self.ramps)
+        self.assertIn(('y', 0., 20., 5.), self.ramps)
+
+    def test_revisited_position_not_recomputed(self):
+        self.cgh.compute([self.trap])
+        self.trap.x = 30.
+        self.cgh.compute([self.trap])
+        self.trap.x = 10.
+        with patch.object(self.cgh, '_ramps',
+                          wraps=self.cgh._ramps) as ramps:
+            self.cgh.compute([self.trap])
+        ramps.assert_not_called()
+
+    def test_shared_coordinate_reuses_vector(self):
+        self.cgh.compute([self.trap])
+        self.trap.x = 30.
+        self.cgh.compute([self.trap])
+        factor = self.cgh._field_cache[self.trap]
+        self.assertIs(factor.ey, self.ramps.get(('y', 0., 20., 5.)))
+
+    def test_matches_uncached(self):
+        from QHOT.traps.QTweezer import QTweezer
+        other = QTweezer(r=(-7., 3., 0.), phase=1.)
+        self.cgh.compute([self.trap, other])
+        self.trap.x = -7.
+        field = self.cgh.fieldOf(self.trap)
+        uncached = CGH(shape=(64, 96), xc=0., yc=0., zc=0., splay=0.)
+        uncached.ramp_cache_size = 0
+        np.testing.assert_array_equal(field, uncached.fieldOf(self.trap))
+
+    def test_vectors_own_memory(self):
+        from QHOT.traps.QTweezer import QTweezer
+        self.cgh.compute([self.trap, QTweezer(r=(-7., 3., 0.))])
+        for key in list(self.ramps._data):
+            self.assertIsNone(self.ramps.get(key).base)
+
+    def test_disabled(self):
+        self.cgh.ramp_cache_size = 0
+        self.cgh.compute([self.trap])
+        self.assertEqual(len(self.ramps), 0)
+
+    def test_size_bounds_cache(self):
+        self.cgh.ramp_cache_size = 3
+        for x in range(5):
+            self.trap.x = float(x)
+            self.cgh.compute([self.trap])
+        self.assertEqual(len(self.ramps), 3)
+        self.assertGreater(self.ramps.evictions, 0)
+
+    def test_step_rounds_positions(self):
+        self.cgh.ramp_step = 0.5
+        self.trap.r = (10.1, 20.2, 0.)
+        rounded = self.cgh.fieldOf(self.trap)
+        self.trap.r = (10., 20., 0.)
+        self.cgh.ramp_step = 0.
+        np.testing.assert_array_equal(rounded, self.cgh.fieldOf(self.trap))
+
+    def test_nearby_positions_share_vectors(self):
+        self.cgh.ramp_step = 0.5
+        self.cgh.compute([self.trap])
+        self.trap.x = 10.1
+        with patch.object(self.cgh, '_ramps',
+                          wraps=self.cgh._ramps) as ramps:
+            self.cgh.compute([self.trap])
+        ramps.assert_not_called()
+
+    def test_geometry_change_clears_cache(self):
+        self.cgh.compute([self.trap])
+        self.cgh.xs = 5.
+        self.assertEqual(len(self.ramps), 0)
+
+    def test_statistics(self):
+        self.cgh.compute([self.trap])
+        self.cgh.fieldOf(self.trap)
+        stats = self.cgh.statistics['ramp_cache']
+        self.assertEqual(stats['entries'], 2)
+        self.assertEqual(stats['misses'], 2)
+
+    def test_step_part_of_calibration(self):
+        self.cgh.ramp_step = 0.25
+        self.assertEqual(self.cgh.calibration['ramp_step'], 0.25)
+
+
+class TestIncrementalCompute(unittest.TestCase):
+
+    def setUp(self):
+        from QHOT.traps.QTweezer import QTweezer
+        from QHOT.traps.QVortex import QVortex
+        self.cgh = CGH(shape=(64, 96))
+        rng = np.random.default_rng(3)
+        self.traps = [QTweezer(r=(x, y, z), phase=p)
+                      for x, y, z, p in rng.uniform(-50., 50., (12, 4))]
+        self.vortex = QVortex(r=(10., 20., 0.), phase=0., ell=3)
+        self.traps.append(self.vortex)
+
+    def reference(self, traps):
+        ref = CGH(shape=(64, 96))
+        ref.incremental = False
+        return ref._accumulate(traps)
+
+    def assertMatchesReference(self, traps):
+        field = self.cgh._accumulate(traps)
+        np.testing.assert_allclose(field, self.reference(traps),
+                                   rtol=0, atol=1e-3)
+
+    def test_incremental_by_default(self):
+        self.assertTrue(CGH.incremental)
+
+    def test_first_compute_records_contributions(self):
+        self.cgh.compute(self.traps)
+        self.assertEqual(len(self.cgh._contributions), len(self.traps))
+
+    def test_unchanged_traps_skip_arithmetic(self):
+        self.cgh.compute(self.traps)
+        with patch.object(self.cgh, '_product') as mock_product, \
+                patch.object(self.cgh, 'fieldOf') as mock_fo:
+            self.cgh.compute(self.traps)
+            mock_product.assert_not_called()
+            mock_fo.assert_not_called()
+
+    def test_moved_tweezer_updates_only_that_trap(self):
+        self.cgh.compute(self.traps)
+        self.traps[0].x = 30.
+        with patch.object(self.cgh, '_product',
+                          wraps=self.cgh._product) as mock_product:
+            self.cgh.compute(self.traps)
+            self.assertEqual(mock_product.call_count, 1)
+            self.assertEqual(len(mock_product.call_args.args[0]), 2)
+        self.assertEqual(self.cgh._updates, 1)
+        self.assertMatchesReference(self.traps)
+
+    def test_structure_change_is_applied(self):
+        self.cgh.compute(self.traps)
+        self.vortex.ell = 5
+        self.assertMatchesReference(self.traps)
+        self.assertEqual(self.cgh._updates, 1)
+
+    def test_added_trap_is_applied(self):
+        from QHOT.traps.QTweezer import QTweezer
+        self.cgh.compute(self.traps)
+        traps = self.traps + [QTweezer(r=(5., 5., 0.), phase=0.)]
+        self.assertMatchesReference(traps)
+
+    def test_removed_trap_is_subtracted(self):
+        self.cgh.compute(self.traps)
+        traps = self.traps[1:]
+        self.assertMatchesReference(traps)
+        self.assertNotIn(self.traps[0], self.cgh._contributions)
+
+    def test_removing_all_traps_gives_midpoint(self):
+        self.cgh.compute(self.traps)
+        np.testing.assert_array_equal(self.cgh.compute([]), 127)
+
+    def test_many_changes_trigger_rebuild(self):
+        self.cgh.compute(self.traps)
+        for trap in self.traps[:10]:
+            trap.z = 10.
+        self.assertMatchesReference(self.traps)
+        self.assertEqual(self.cgh._updates, 0)
+
+    def test_periodic_rebuild(self):
+        self.cgh.rebuild_interval = 3
+        self.cgh.compute(self.traps)
+        for n in range(3):
+            self.traps[0].x = float(n)
+            self.cgh.compute(self.traps)
+        self.assertEqual(self.cgh._updates, 3)
+        self.traps[0].x = 10.
+        self.cgh.compute(self.traps)
+        self.assertEqual(self.cgh._updates, 0)
+
+    def test_geometry_change_resets_running_sum(self):
+        self.cgh.compute(self.traps)
+        self.cgh.wavelength = 0.532
+        self.assertIsNone(self.cgh._contributions)
+
+    def test_matrix_change_resets_running_sum(self):
+        self.cgh.compute(self.traps)
+        self.cgh.xc = 100.
+        self.assertIsNone(self.cgh._contributions)
+
+    def test_disabled_discards_running_sum(self):
+        self.cgh.compute(self.traps)
+        self.cgh.incremental = False
+        self.cgh.compute(self.traps)
+        self.assertIsNone(self.cgh._contributions)
+
+    def test_group_move_is_applied(self):
+        from QHOT.lib.traps.QTrapGroup import QTrapGroup
+        group = QTrapGroup(r=(0., 0., 0.))
+        for trap in self.traps[:3]:
+            trap.z = 0.
+        group.addTrap(self.traps[:3])
+        items = [group] + self.traps[3:]
+        self.cgh.compute(items)
+        group.r = (5., 5., 0.)
+        self.assertMatchesReference(items)
+
+
+class TestCancellation(unittest.TestCase):
+
+    def setUp(self):
+        from QHOT.traps.QTweezer import QTweezer
+        from QHOT.traps.QVortex import QVortex
+        self.cgh = CGH(shape=(64, 96))
+        rng = np.random.default_rng(4)
+        self.traps = [QTweezer(r=(x, y, z), phase=p)
+                      for x, y, z, p in rng.uniform(-50., 50., (12, 4))]
+        self.vortex = QVortex(r=(10., 20., 0.), phase=0., ell=3)
+        self.traps.append(self.vortex)
+
+    def assertMatchesReference(self, traps):
+        ref = CGH(shape=(64, 96))
+        ref.incremental = False
+        np.testing.assert_allclose(self.cgh._accumulate(traps),
+                                   ref._accumulate(traps),
+                                   rtol=0, atol=1e-3)
+
+    def cancelAfter(self, n):
+        '''Return a cancellation check that fires on its n-th call.'''
+        calls = iter(range(1, 10**6))
+        return lambda: next(calls) >= n
+
+    def test_not_an_exception(self):
+        from QHOT.lib.holograms.CGH import ComputeCancelled
+        self.assertFalse(issubclass(ComputeCancelled, Exception))
+
+    def test_cancelled_compute_raises(self):
+        from QHOT.lib.holograms.CGH import ComputeCancelled
+        self.cgh.cancelled = lambda: True
+        with self.assertRaises(ComputeCancelled):
+            self.cgh.compute(self.traps)
+
+    def test_cancelled_compute_emits_nothing(self):
+        from QHOT.lib.holograms.CGH import ComputeCancelled
+        spy = QtTest.QSignalSpy(self.cgh.hologramReady)
+        self.cgh.cancelled = lambda: True
+        with self.assertRaises(ComputeCancelled):
+            self.cgh.compute(self.traps)
+        self.assertEqual(len(spy), 0)
+
+    def test_cancelled_update_keeps_running_sum(self):
+        from QHOT.lib.holograms.CGH import ComputeCancelled
+        self.cgh.compute(self.traps)
+        self.traps[0].x = 30.
+        self.vortex.ell = 5
+        self.cgh.cancelled = self.cancelAfter(2)
+        with self.assertRaises(ComputeCancelled):
+            self.cgh.compute(self.traps)
+        self.cgh.cancelled = None
+        self.assertMatchesReference(self.traps)
+
+    def test_cancelled_rebuild_is_redone(self):
+        from QHOT.lib.holograms.CGH import ComputeCancelled
+        self.cgh.cancelled = self.cancelAfter(1)
+        with self.assertRaises(ComputeCancelled):
+            self.cgh.compute(self.traps)
+        self.assertIsNone(self.cgh._contributions)
+        self.cgh.cancelled = None
+        self.assertMatchesReference(self.traps)
+
+    def test_cancelled_group_structure_not_cached(self):
+        from QHOT.lib.holograms.CGH import ComputeCancelled
+        from QHOT.lib.traps.QTrapGroup import QTrapGroup
+        group = QTrapGroup(r=(0., 0., 0.))
+        group.addTrap(self.traps[:2] + [self.vortex])
+        self.cgh.cancelled = self.cancelAfter(2)
+        with self.assertRaises(ComputeCancelled):
+            self.cgh.compute([group])
+        self.assertNotIn(group, self.cgh._structure_cache)
+
+
+class TestSnapshots(unittest.TestCase):
+
+    def setUp(self):
+        from QHOT.lib.traps.QTrapGroup import QTrapGroup
+        from QHOT.traps.QTweezer import QTweezer
+        from QHOT.traps.QVortex import QVortex
+        self.QVortex = QVortex
+        self.cgh = CGH(shape=(64, 96))
+        rng = np.random.default_rng(5)
+        self.traps = [QTweezer(r=(x, y, z), phase=p)
+                      for x, y, z, p in rng.uniform(-50., 50., (8, 4))]
+        self.group = QTrapGroup(r=(0., 0., 0.))
+        self.group.addTrap([QTweezer(r=(10., 0., 0.), phase=0.),
+                            QVortex(r=(0., 10., 0.), phase=0., ell=2)])
+        self.vortex = QVortex(r=(10., 20., 0.), phase=0., ell=3)
+        self.traps += [self.group, self.vortex]
+
+    def reference(self, snapshot):
+        ref = CGH(shape=(64, 96))
+        ref.incremental = False
+        return ref._accumulate(snapshot).copy()
+
+    def test_snapshot_matches_list(self):
+        from QHOT.lib.traps.TrapSnapshot import TrapSnapshot
+        expected = CGH(shape=(64, 96)).compute(self.traps).copy()
+        np.testing.assert_array_equal(
+            self.cgh.compute(TrapSnapshot.of(self.traps)), expected)
+
+    def test_reads_snapshot_not_traps(self):
+        from QHOT.lib.traps.TrapSnapshot import TrapSnapshot
+        snapshot = TrapSnapshot.of(self.traps)
+        expected = self.reference(snapshot)
+        self.traps[0].x += 5.
+        self.group.r = (3., 4., 0.)
+        self.vortex.amplitude = 0.5
+        np.testing.assert_allclose(self.cgh._accumulate(snapshot),
+                                   expected, rtol=0, atol=1e-3)
+
+    def test_fields_from_older_snapshot_replaced(self):
+        from QHOT.lib.traps.TrapSnapshot import TrapSnapshot
+        self.cgh.compute(self.traps)
+        older = TrapSnapshot.of(self.traps)
+        self.traps[0].x += 5.
+        self.group.rotate(0.5, self.group._snapshot())
+        self.cgh.compute(older)
+        newer = TrapSnapshot.of(self.traps)
+        np.testing.assert_allclose(self.cgh._accumulate(newer),
+                                   self.reference(newer),
+                                   rtol=0, atol=1e-3)
+
+    def test_running_sum_compares_states(self):
+        self.cgh.compute(self.traps)
+        self.cgh._field_cache.pop(self.traps[0])
+        with patch.object(self.cgh, '_product') as mock_product:
+            self.cgh.compute(self.traps)
+        mock_product.assert_not_called()
+
+    def test_structure_built_from_snapshot(self):
+        from QHOT.lib.traps.TrapSnapshot import TrapSnapshot
+        vortex = self.QVortex(r=(10., 20., 0.), phase=0., ell=2)
+        expected = CGH(shape=(64, 96)).compute([vortex]).copy()
+        snapshot = TrapSnapshot.of([vortex])
+        vortex.ell = 3
+        np.testing.assert_array_equal(self.cgh.compute(snapshot), expected)
+        key = (self.QVortex, (2,), self.cgh.geometry_version)
+        self.assertIn(key, self.cgh._shared_structures)
+
+    def test_live_structure_of_outdated_snapshot_not_cached(self):
+        from QHOT.lib.traps.TrapSnapshot import TrapSnapshot
+        trap = LiveVortex(r=(10., 20., 0.), phase=0., ell=3)
+        older = TrapSnapshot.of([trap])
+        trap.ell = 4
+        self.cgh.compute(older)
+        self.assertNotIn(trap, self.cgh._structure_cache)
+        newer = TrapSnapshot.of([trap])
+        np.testing.assert_allclose(self.cgh._accumulate(newer),
+                                   self.reference(newer),
+                                   rtol=0, atol=1e-3)
+
+
+class TestCacheBudget(unittest.TestCase):
+
+    def setUp(self):
+        from QHOT.traps.QVortex import QVortex
+        self.cgh = CGH(shape=(64, 64))
+        self.frame = np.zeros(self.cgh.shape, dtype=np.complex64).nbytes
+        self.vortices = [QVortex(r=(n, 0., 0.), phase=0., ell=n)
+                         for n in range(4)]
+
+    def test_default_budget(self):
+        self.assertAlmostEqual(self.cgh.cachebudget, 1024.)
+        self.assertEqual(self.cgh._budget.limit, 1024 * 2**20)
+
+    def test_constructor_budget(self):
+        cgh = CGH(shape=(64, 64), cachebudget=8.)
+        self.assertEqual(cgh._budget.limit, 8 * 2**20)
+
+    def test_in_properties(self):
+        self.assertIn('cachebudget', self.cgh.properties)
+
+    def test_budget_does_not_emit_recalculate(self):
+        spy = QtTest.QSignalSpy(self.cgh.recalculate)
+        self.cgh.cachebudget = 10.
+        self.assertEqual(len(spy), 0)
+
+    def test_budget_does_not_clear_caches(self):
+        self.cgh.fieldOf(self.vortices[0])
+        self.cgh.cachebudget = 10.
+        self.assertIn(self.vortices[0], self.cgh._structure_cache)
+
+    def test_settings_apply_budget(self):
+        self.cgh.settings = {'cachebudget': 2.}
+        self.assertEqual(self.cgh._budget.limit, 2 * 2**20)
+
+    def test_structure_cache_bounded_by_budget(self):
+        self.cgh.cachebudget = 2.5 * self.frame / 2**20
+        for trap in self.vortices:
+            self.cgh.fieldOf(trap)
+        self.assertLessEqual(self.cgh._budget.nbytes,
+                             self.cgh._budget.limit)
+        self.assertGreater(self.cgh._structure_cache.evictions, 0)
+        self.assertIn(self.vortices[-1], self.cgh._structure_cache)
+
+    def test_evicted_structure_is_recomputed(self):
+        self.cgh.cachebudget = 1.5 * self.frame / 2**20
+        expected = self.cgh.fieldOf(self.vortices[0])
+        self.cgh.fieldOf(self.vortices[1])
+        self.assertNotIn(self.vortices[0], self.cgh._structure_cache)
+        np.testing.assert_allclose(self.cgh.fieldOf(self.vortices[0]),
+                                   expected)
+
+    def test_compute_correct_under_eviction(self):
+        self.cgh.cachebudget = 1.5 * self.frame / 2**20
+        self.cgh.compute(self.vortices)
+        self.vortices[0].x = 10.
+        field = self.cgh._accumulate(self.vortices).copy()
+        ref = CGH(shape=(64, 64))
+        ref.incremental = False
+        np.testing.assert_allclose(field, ref._accumulate(self.vortices),
+                                   rtol=0, atol=1e-3)
+
+    def test_statistics(self):
+        self.cgh.fieldOf(self.vortices[0])
+        self.cgh.fieldOf(self.vortices[0])
+        stats = self.cgh.statistics
+        self.assertEqual(stats['structure_cache']['misses'], 1)
+        self.assertEqual(stats['structure_cache']['hits'], 1)
+        self.assertEqual(stats['budget']['limit'], self.cgh._budget.limit)
+
+    def test_statistics_timing(self):
+        self.assertEqual(self.cgh.statistics['timing'], {})
+        self.cgh.compute(self.vortices)
+        timing = self.cgh.statistics['timing']
+        self.assertEqual(set(timing), {'accumulate', 'quantize'})
+        self.assertGreaterEqual(timing['quantize'], 0.)
+
+
+class TestSharedStructures(unittest.TestCase):
+
+    def setUp(self):
+        from QHOT.traps.QVortex import QVortex
+        self.QVortex = QVortex
+        self.cgh = CGH(shape=(64, 64))
+        self.a = QVortex(r=(10., 0., 0.), ell=2)
+        self.b = QVortex(r=(-10., 5., 0.), ell=2)
+        self.shared = self.cgh._shared_structures
+
+    def structure(self, trap):
+        with self.cgh._reading([trap]):
+            return self.cgh._contributionOf(trap)[1]
+
+    def key(self, trap):
+        with self.cgh._reading([trap]):
+            return self.cgh._structureKey(trap)
+
+    def test_identical_traps_share_structure(self):
+        self.assertIs(self.structure(self.a), self.structure(self.b))
+        self.assertEqual(len(self.shared), 1)
+
+    def test_different_traps_do_not_share(self):
+        c = self.QVortex(r=(0., 0., 0.), ell=3)
+        self.assertIsNot(self.structure(self.a), self.structure(c))
+        self.assertEqual(len(self.shared), 2)
+
+    def test_shared_structure_charged_once(self):
+        structure = self.structure(self.a)
+        self.structure(self.b)
+        self.assertEqual(self.cgh._structure_cache.nbytes, 0)
+        self.assertEqual(self.cgh._budget.nbytes,
+                         self.cgh._field_cache.nbytes + structure.nbytes)
+
+    def test_shared_structure_is_not_recomputed(self):
+        self.structure(self.a)
+        with patch.object(self.QVortex, 'structureFrom') as structure:
+            self.structure(self.b)
+        structure.assert_not_called()
+
+    def test_parameter_change_reuses_structure(self):
+        c = self.QVortex(r=(0., 0., 0.), ell=3)
+        expected = self.structure(c)
+        self.structure(self.a)
+        self.a.ell = 3
+        self.assertIs(self.structure(self.a), expected)
+
+    def test_references(self):
+        self.structure(self.a)
+        self.structure(self.b)
+        key = self.key(self.a)
+        self.assertEqual(self.shared.references(key), 2)
+        self.cgh._structure_cache.pop(self.a)
+        self.assertEqual(self.shared.references(key), 1)
+
+    def test_geometry_change_invalidates_structures(self):
+        key = self.key(self.a)
+        self.structure(self.a)
+        self.cgh.updateGeometry()
+        self.assertNotEqual(self.key(self.a), key)
+        self.assertEqual(len(self.shared), 0)
+
+    def test_geometry_version(self):
+        version = self.cgh.geometry_version
+        self.cgh.updateGeometry()
+        self.assertEqual(self.cgh.geometry_version, version + 1)
+
+    def test_ring_traps_keyed_by_radius(self):
+        from QHOT.traps.QRingTrap import QRingTrap
+        a = QRingTrap(r=(0., 0., 0.), radius=10., ell=1)
+        b = QRingTrap(r=(5., 0., 0.), radius=20., ell=1)
+        c = QRingTrap(r=(9., 0., 0.), radius=10., ell=1)
+        self.assertIsNot(self.structure(a), self.structure(b))
+        self.assertIs(self.structure(a), self.structure(c))
+
+    def test_compute_matches_unshared(self):
+        traps = [self.a, self.b]
+        field = self.cgh._accumulate(traps).copy()
+        ref = CGH(shape=(64, 64))
+        expected = sum(ref.fieldOf(trap) for trap in traps)
+        np.testing.assert_allclose(field, expected, rtol=0, atol=1e-4)
+
+    def test_statistics(self):
+        self.structure(self.a)
+        self.structure(self.b)
+        stats = self.cgh.statistics['shared_structures']
+        self.assertEqual(stats['entries'], 1)
+        self.assertEqual(stats['referenced'], 1)
+        self.assertEqual(stats['hits'], 1)
+
+
+class TestComputeMany(unittest.TestCase):
+
+    def setUp(self):
+        from QHOT.traps.QTweezer import QTweezer
+        from QHOT.traps.QVortex import QVortex
+        from QHOT.lib.traps.QTrapGroup import QTrapGroup
+        self.cgh = CGH(shape=(32, 48))
+        self.tweezers = [QTweezer(r=(3. * n, -2. * n, 0.), phase=n)
+                         for n in range(4)]
+        self.vortex = QVortex(r=(-5., 2., 1.), ell=2, phase=0.)
+        self.group = QTrapGroup()
+        self.group.addTrap([QTweezer(r=(8., 8., 0.), phase=0.),
+                            QTweezer(r=(12., 8., 0.), phase=1.)])
+        self.traps = self.tweezers + [self.vortex, self.group]
+
+    def trajectory(self, length=5):
+        from QHOT.lib.traps.TrapSnapshot import TrapSnapshot
+        states = []
+        for t in range(length):
+            self.tweezers[0].x = 3. + t
+            self.vortex.y = 2. - t
+            states.append(TrapSnapshot.of(self.traps))
+        return states
+
+    def sequential(self, states):
+        cgh = CGH(shape=(32, 48))
+        return np.stack([cgh.compute(state).copy() for state in states])
+
+    def assertHologramsEqual(self, first, second):
+        difference = np.abs(first.astype(int) - second.astype(int))
+        difference = np.minimum(difference, 256 - difference)
+        self.assertLessEqual(difference.max(), 1)
+        self.assertLess(np.mean(difference > 0), 1e-3)
+
+    def test_matches_sequential_compute(self):
+        states = self.trajectory()
+        holograms = self.cgh.computeMany(states)
+        self.assertEqual(holograms.shape, (5, 32, 48))
+        self.assertEqual(holograms.dtype, np.uint8)
+        self.assertHologramsEqual(holograms, self.sequential(states))
+
+    def test_unrelated_states(self):
+        from QHOT.traps.QTweezer import QTweezer
+        states = [[QTweezer(r=(n, -n, 0.), phase=0.)] for n in range(3)]
+        states.append(self.traps)
+        holograms = self.cgh.computeMany(states)
+        self.assertHologramsEqual(holograms, self.sequential(states))
+
+    def test_repeated_state(self):
+        states = self.trajectory(1) * 3
+        holograms = self.cgh.computeMany(states)
+        np.testing.assert_array_equal(holograms[1], holograms[0])
+        np.testing.assert_array_equal(holograms[2], holograms[0])
+
+    def test_stacks(self):
+        self.cgh.stack_size = 2
+        states = self.trajectory()
+        holograms = self.cgh.computeMany(states)
+        self.assertHologramsEqual(holograms, self.sequential(states))
+
+    def test_uneven_strips(self):
+        self.cgh.strip_rows = 5
+        states = self.trajectory()
+        holograms = self.cgh.computeMany(states)
+        self.assertHologramsEqual(holograms, self.sequential(states))
+
+    def test_rebuild_within_stack(self):
+        self.cgh.strip_rows = 8
+        self.cgh.rebuild_interval = 2
+        states = self.trajectory(2) + [self.traps[:2]] + self.trajectory(3)
+        holograms = self.cgh.computeMany(states)
+        self.assertHologramsEqual(holograms, self.sequential(states))
+
+    def test_lists_of_traps(self):
+        holograms = self.cgh.computeMany([self.traps])
+        expected = CGH(shape=(32, 48)).compute(self.traps)
+        np.testing.assert_array_equal(holograms[0], expected)
+
+    def test_empty_state(self):
+        holograms = self.cgh.computeMany([[]])
+        np.testing.assert_array_equal(holograms, 127)
+
+    def test_no_states(self):
+        self.assertEqual(self.cgh.computeMany([]).shape, (0, 32, 48))
+
+    def test_output_array(self):
+        out = np.zeros((5, 32, 48), dtype=np.uint8)
+        self.assertIs(self.cgh.computeMany(self.trajectory(), out=out), out)
+        self.assertTrue(out.any())
+
+    def test_rejects_wrong_output(self):
+        out = np.zeros((4, 32, 48), dtype=np.uint8)
+        with self.assertRaises(ValueError):
+            self.cgh.computeMany(self.trajectory(), out=out)
+
+    def test_memory_mapped_file(self):
+        import tempfile
+        from pathlib import Path
+        states = self.trajectory()
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / 'holograms.npy'
+            holograms = self.cgh.computeMany(states, out=path)
+            self.assertIsInstance(holograms, np.memmap)
+            holograms.flush()
+            np.testing.assert_array_equal(np.load(path), holograms)
+            del holograms
+
+    def test_does_not_emit(self):
+        spy = QtTest.QSignalSpy(self.cgh.hologramReady)
+        self.cgh.computeMany(self.trajectory())
+        self.assertEqual(len(spy), 0)
+
+    def test_running_sum_untouched(self):
+        self.cgh.compute(self.traps)
+        phase = self.cgh.phase.copy()
+        self.cgh.computeMany(self.trajectory())
+        np.testing.assert_array_equal(self.cgh.phase, phase)
+        self.tweezers[1].y = 5.
+        expected = CGH(shape=(32, 48)).compute(self.traps)
+        np.testing.assert_array_equal(self.cgh.compute(self.traps),
+                                      expected)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -8,7 +8,8 @@ import importlib as _importlib
 app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
 
 from QHOT.lib.chooser import (build_parser, cgh_parser, choose_cgh,
-                               choose_slm, _CGH_BACKENDS)
+                               choose_slm, _CGH_BACKENDS,
+                               _AUTO_DETECT_ORDER)
 from QHOT.lib.holograms.CGH import CGH
 from QHOT.lib.QSLM import QSLM
 _chooser_mod = _importlib.import_module('QHOT.lib.chooser')
@@ -66,11 +67,48 @@ class TestCghParser(unittest.TestCase):
         self.assertFalse(args.torch)
         self.assertTrue(args.cupy)
 
+    def test_parse_threaded_flag(self):
+        args, _ = cgh_parser().parse_known_args(['-j'])
+        self.assertTrue(args.threaded)
+        self.assertFalse(args.torch)
+
     def test_no_flags_defaults_false(self):
         args, _ = cgh_parser().parse_known_args([])
         self.assertFalse(args.torch)
         self.assertFalse(args.cupy)
 
+    def test_cache_budget_option(self):
+        args, _ = cgh_parser().parse_known_args(['--cache-budget', '256'])
+        self.assertEqual(args.cachebudget, 256.)
+
+    def test_cache_budget_defaults_none(self):
+        args, _ = cgh_parser().parse_known_args([])
+        self.assertIsNone(args.cachebudget)
+
+    def test_geometry_cache_option(self):
+        args, _ = cgh_parser().parse_known_args(['--geometry-cache'])
+        self.assertTrue(args.geometrycache)
+
+    def test_geometry_cache_defaults_false(self):
+        args, _ = cgh_parser().parse_known_args([])
+        self.assertFalse(args.geometrycache)
+
+    def test_hologram_cache_option(self):
+        args, _ = cgh_parser().parse_known_args(['--hologram-cache'])
+        self.assertTrue(args.hologramcache)
+
+    def test_hologram_cache_defaults_false(self):
+        args, _ = cgh_parser().parse_known_args([])
+        self.assertFalse(args.hologramcache)
+
+    def test_cgh_rate_option(self):
+        args, _ = cgh_parser().parse_known_args(['--cgh-rate', '60'])
+        self.assertEqual(args.cghrate, 60.)
+
+    def test_cgh_rate_defaults_none(self):
+        args, _ = cgh_parser().parse_known_args([])
+        self.assertIsNone(args.cghrate)
+
 
 class TestChooseCghAutoDetect(unittest.TestCase):
 
@@ -127,6 +165,13 @@ class TestChooseCghAutoDetect(unittest.TestCase):
             choose_cgh(shape=(256, 256))
         fake_cls.assert_called_once_with(shape=(256, 256))
 
+    def test_cache_budget_forwarded_to_backend(self):
+        with patch.object(_chooser_mod, 'importlib') as mock_importlib, \
+                patch('sys.argv', ['qhot', '--cache-budget', '64']):
+            mock_importlib.import_module.side_effect = ImportError('none')
+            result = choose_cgh(shape=(32, 32))
+        self.assertEqual(result.cachebudget, 64.)
+
 
 class TestChooseCghExplicit(unittest.TestCase):
 
@@ -148,6 +193,21 @@ class TestChooseCghExplicit(unittest.TestCase):
         # process we verify the flag plumbing via parse_known_args.
         self.assertIsInstance(result, CGH)
 
+    def test_explicit_threaded_flag_uses_threaded(self):
+        from QHOT.lib.holograms.ThreadedCGH import ThreadedCGH
+        with patch('sys.argv', ['qhot', '-j']):
+            result = choose_cgh(shape=(32, 32))
+        self.assertIsInstance(result, ThreadedCGH)
+        result.stop()
+
+    def test_explicit_numba_flag_falls_back_without_numba(self):
+        import QHOT.lib.holograms.NumbaCGH as numba_mod
+        with patch.object(numba_mod, 'numba', None), \
+                patch.object(_chooser_mod, '_AUTO_DETECT_ORDER', ()), \
+                patch('sys.argv', ['qhot', '-n']):
+            result = choose_cgh(shape=(32, 32))
+        self.assertEqual(type(result), CGH)
+
     def test_explicit_flag_falls_back_on_failure(self):
         # Simulate -t requested but torch not available.
         parser = cgh_parser()
@@ -181,6 +241,15 @@ class TestBackendRegistry(unittest.TestCase):
     def test_cupy_entry_has_correct_flag(self):
         self.assertEqual(_CGH_BACKENDS['cupy'].flag, '-u')
 
+    def test_threaded_entry_has_correct_flag(self):
+        self.assertEqual(_CGH_BACKENDS['threaded'].flag, '-j')
+
+    def test_numba_entry_has_correct_flag(self):
+        self.assertEqual(_CGH_BACKENDS['numba'].flag, '-n')
+
+    def test_threaded_not_auto_detected(self):
+        self.assertNotIn('threaded', _AUTO_DETECT_ORDER)
+
     def test_all_entries_have_module(self):
         for entry in _CGH_BACKENDS.values():
             self.assertTrue(entry.module)
@@ -0,0 +1,49 @@
+'''Unit tests for the on-disk cache helpers.'''
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+import numpy as np
+from QHOT.lib.holograms.diskcache import save_npy, settings_key
+
+
+class TestSettingsKey(unittest.TestCase):
+
+    def test_order_independent(self):
+        self.assertEqual(settings_key(dict(a=1., b=2.)),
+                         settings_key(dict(b=2., a=1.)))
+
+    def test_arrays_hashed_by_value(self):
+        self.assertEqual(settings_key(dict(shape=np.array([4, 5]))),
+                         settings_key(dict(shape=[4, 5])))
+
+    def test_prefix_distinguishes(self):
+        self.assertNotEqual(settings_key(dict(a=1.), 1),
+                            settings_key(dict(a=1.), 2))
+
+
+class TestSaveNpy(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / 'table.npy'
+        self.array = np.arange(6, dtype=np.uint8).reshape(2, 3)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_round_trip(self):
+        save_npy(self.path, self.array)
+        np.testing.assert_array_equal(np.load(self.path), self.array)
+        self.assertEqual(list(self.path.parent.iterdir()), [self.path])
+
+    def test_failure_is_logged(self):
+        with patch('os.replace', side_effect=OSError('full')):
+            with self.assertLogs('QHOT.lib.holograms.diskcache',
+                                 level='WARNING'):
+                save_npy(self.path, self.array)
+        self.assertEqual(list(self.path.parent.iterdir()), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
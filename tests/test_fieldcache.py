@@ -0,0 +1,300 @@
+'''Unit tests for FieldCache and CacheBudget.'''
+import gc
+import unittest
+import numpy as np
+from QHOT.lib.holograms.FieldCache import (CacheBudget, FieldCache,
+                                           SharedFieldCache, nbytes)
+
+
+class Key:
+    '''Weak-referenceable, hashable cache key.'''
+
+
+def block(n):
+    return np.zeros(n, dtype=np.uint8)
+
+
+class TestNbytes(unittest.TestCase):
+
+    def test_array(self):
+        self.assertEqual(nbytes(block(10)), 10)
+
+    def test_tuple_sums_elements(self):
+        self.assertEqual(nbytes((block(10), block(5), 1j)), 15)
+
+    def test_scalar_is_zero(self):
+        self.assertEqual(nbytes(1.), 0)
+
+
+class TestFieldCacheMapping(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = FieldCache()
+        self.key = Key()
+
+    def test_set_and_get(self):
+        value = block(4)
+        self.cache[self.key] = value
+        self.assertIs(self.cache[self.key], value)
+
+    def test_contains(self):
+        self.assertNotIn(self.key, self.cache)
+        self.cache[self.key] = block(4)
+        self.assertIn(self.key, self.cache)
+
+    def test_contains_unhashable_weakref_returns_false(self):
+        self.assertNotIn(1, self.cache)
+
+    def test_missing_key_raises(self):
+        with self.assertRaises(KeyError):
+            self.cache[self.key]
+
+    def test_get_default(self):
+        self.assertIsNone(self.cache.get(self.key))
+
+    def test_pop(self):
+        value = block(4)
+        self.cache[self.key] = value
+        self.assertIs(self.cache.pop(self.key), value)
+        self.assertNotIn(self.key, self.cache)
+        self.assertEqual(self.cache.nbytes, 0)
+
+    def test_pop_missing_returns_default(self):
+        self.assertEqual(self.cache.pop(self.key, 'x'), 'x')
+
+    def test_clear(self):
+        self.cache[self.key] = block(4)
+        self.cache.clear()
+        self.assertEqual(len(self.cache), 0)
+        self.assertEqual(self.cache.nbytes, 0)
+
+    def test_nbytes_tracks_replacement(self):
+        self.cache[self.key] = block(4)
+        self.cache[self.key] = block(10)
+        self.assertEqual(self.cache.nbytes, 10)
+
+    def test_entry_removed_when_key_collected(self):
+        self.cache[self.key] = block(4)
+        del self.key
+        gc.collect()
+        self.assertEqual(len(self.cache), 0)
+        self.assertEqual(self.cache.nbytes, 0)
+
+    def test_iter_yields_live_keys(self):
+        self.cache[self.key] = block(4)
+        self.assertEqual(list(self.cache), [self.key])
+
+
+class TestFieldCacheStats(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = FieldCache()
+        self.key = Key()
+
+    def test_store_counts_miss(self):
+        self.cache[self.key] = block(4)
+        self.assertEqual(self.cache.misses, 1)
+
+    def test_read_counts_hit(self):
+        self.cache[self.key] = block(4)
+        self.cache[self.key]
+        self.cache.get(self.key)
+        self.assertEqual(self.cache.hits, 2)
+
+    def test_contains_has_no_side_effects(self):
+        self.cache[self.key] = block(4)
+        self.assertIn(self.key, self.cache)
+        self.assertEqual(self.cache.hits, 0)
+
+    def test_stats_keys(self):
+        self.assertEqual(set(self.cache.stats),
+                         {'entries', 'nbytes', 'hits', 'misses',
+                          'evictions'})
+
+    def test_reset_stats(self):
+        self.cache[self.key] = block(4)
+        self.cache.resetStats()
+        self.assertEqual(self.cache.misses, 0)
+
+
+class TestCacheBudget(unittest.TestCase):
+
+    def setUp(self):
+        self.budget = CacheBudget(100)
+        self.cache = FieldCache(self.budget)
+        self.keys = [Key() for _ in range(4)]
+
+    def test_unlimited_by_default(self):
+        self.assertIsNone(CacheBudget().limit)
+
+    def test_zero_means_unlimited(self):
+        self.assertIsNone(CacheBudget(0).limit)
+
+    def test_evicts_least_recently_used(self):
+        a, b, c = self.keys[:3]
+        self.cache[a] = block(40)
+        self.cache[b] = block(40)
+        self.cache[a]
+        self.cache[c] = block(40)
+        self.assertIn(a, self.cache)
+        self.assertNotIn(b, self.cache)
+        self.assertIn(c, self.cache)
+        self.assertEqual(self.cache.evictions, 1)
+
+    def test_stays_within_budget(self):
+        for key in self.keys:
+            self.cache[key] = block(40)
+        self.assertLessEqual(self.budget.nbytes, 100)
+
+    def test_keeps_single_oversized_entry(self):
+        self.cache[self.keys[0]] = block(400)
+        self.assertIn(self.keys[0], self.cache)
+
+    def test_shrinking_limit_evicts(self):
+        for key in self.keys[:2]:
+            self.cache[key] = block(40)
+        self.budget.limit = 50
+        self.assertEqual(len(self.cache), 1)
+        self.assertIn(self.keys[1], self.cache)
+
+    def test_shared_across_caches(self):
+        other = FieldCache(self.budget)
+        self.cache[self.keys[0]] = block(60)
+        other[self.keys[1]] = block(60)
+        self.assertNotIn(self.keys[0], self.cache)
+        self.assertIn(self.keys[1], other)
+        self.assertEqual(self.budget.nbytes, 60)
+
+
+class TestFieldCacheHooks(unittest.TestCase):
+
+    def setUp(self):
+        self.released = []
+        self.cache = FieldCache(sizeof=lambda value: 7,
+                                release=self.released.append)
+        self.key = Key()
+
+    def test_sizeof_charges_entries(self):
+        self.cache[self.key] = block(100)
+        self.assertEqual(self.cache.nbytes, 7)
+
+    def test_pop_releases(self):
+        value = block(10)
+        self.cache[self.key] = value
+        self.cache.pop(self.key)
+        self.assertIs(self.released[0], value)
+
+    def test_overwrite_releases_old_value(self):
+        value = block(10)
+        self.cache[self.key] = value
+        self.cache[self.key] = block(10)
+        self.assertEqual(len(self.released), 1)
+        self.assertIs(self.released[0], value)
+
+    def test_clear_releases(self):
+        self.cache[self.key] = block(10)
+        self.cache.clear()
+        self.assertEqual(len(self.released), 1)
+        self.assertEqual(self.cache.nbytes, 0)
+
+    def test_collected_key_releases(self):
+        self.cache[self.key] = block(10)
+        del self.key
+        gc.collect()
+        self.assertEqual(len(self.released), 1)
+
+
+class TestSharedFieldCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = SharedFieldCache()
+
+    def test_add_returns_value(self):
+        value = block(10)
+        self.assertIs(self.cache.add('a', value), value)
+        self.assertIn('a', self.cache)
+
+    def test_acquire_missing(self):
+        self.assertIsNone(self.cache.acquire('a'))
+        self.assertEqual(self.cache.references('a'), 0)
+
+    def test_acquire_shares_value(self):
+        value = self.cache.add('a', block(10))
+        self.assertIs(self.cache.acquire('a'), value)
+        self.assertEqual(self.cache.references('a'), 2)
+
+    def test_release_drops_reference(self):
+        value = self.cache.add('a', block(10))
+        self.cache.release(value)
+        self.assertEqual(self.cache.references('a'), 0)
+        self.assertIn('a', self.cache)
+
+    def test_release_ignores_foreign_values(self):
+        self.cache.add('a', block(10))
+        self.cache.release(block(10))
+        self.assertEqual(self.cache.references('a'), 1)
+
+    def test_holds(self):
+        value = self.cache.add('a', block(10))
+        self.assertTrue(self.cache.holds(value))
+        self.assertFalse(self.cache.holds(block(10)))
+
+    def test_counts_bytes_once(self):
+        self.cache.add('a', block(10))
+        self.cache.acquire('a')
+        self.assertEqual(self.cache.nbytes, 10)
+
+    def test_stats(self):
+        value = self.cache.add('a', block(10))
+        self.cache.acquire('a')
+        self.cache.add('b', block(10))
+        self.cache.release(value)
+        self.cache.release(value)
+        stats = self.cache.stats
+        self.assertEqual(stats['entries'], 2)
+        self.assertEqual(stats['referenced'], 1)
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 2)
+
+    def test_clear(self):
+        self.cache.add('a', block(10))
+        self.cache.clear()
+        self.assertEqual(len(self.cache), 0)
+        self.assertEqual(self.cache.nbytes, 0)
+
+
+class TestSharedFieldCacheBudget(unittest.TestCase):
+
+    def setUp(self):
+        self.budget = CacheBudget(200)
+        self.cache = SharedFieldCache(self.budget)
+
+    def test_referenced_entries_are_not_evicted(self):
+        for key in 'abc':
+            self.cache.add(key, block(100))
+        self.assertEqual(len(self.cache), 3)
+        self.assertEqual(self.cache.evictions, 0)
+
+    def test_unreferenced_entries_are_evicted_oldest_first(self):
+        a = self.cache.add('a', block(100))
+        b = self.cache.add('b', block(100))
+        self.cache.release(a)
+        self.cache.release(b)
+        self.cache.add('c', block(100))
+        self.assertNotIn('a', self.cache)
+        self.assertIn('b', self.cache)
+        self.assertEqual(self.cache.evictions, 1)
+
+    def test_shares_budget_with_field_cache(self):
+        other = FieldCache(self.budget)
+        first, second = Key(), Key()
+        other[first] = block(100)
+        other[second] = block(100)
+        self.cache.add('a', block(100))
+        self.assertNotIn(first, other)
+        self.assertIn(second, other)
+        self.assertIn('a', self.cache)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,146 @@
+'''Unit tests for GeometryCache.'''
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+import numpy as np
+from pyqtgraph.Qt import QtWidgets
+from QHOT.lib.holograms.CGH import CGH
+from QHOT.lib.holograms.GeometryCache import GeometryCache
+
+app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+
+class TestKey(unittest.TestCase):
+
+    def test_deterministic(self):
+        settings = dict(xs=1., shape=(4, 5))
+        self.assertEqual(GeometryCache.key(settings),
+                         GeometryCache.key(dict(settings)))
+
+    def test_order_independent(self):
+        self.assertEqual(GeometryCache.key(dict(a=1., b=2.)),
+                         GeometryCache.key(dict(b=2., a=1.)))
+
+    def test_distinguishes_values(self):
+        self.assertNotEqual(GeometryCache.key(dict(xs=1.)),
+                            GeometryCache.key(dict(xs=1.0001)))
+
+    def test_numpy_scalars_match_floats(self):
+        self.assertEqual(GeometryCache.key(dict(xs=np.float64(2.))),
+                         GeometryCache.key(dict(xs=2.)))
+
+
+class TestStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = GeometryCache(Path(self.tmp.name) / 'geometry')
+        self.key = GeometryCache.key(dict(xs=1.))
+        self.table = np.arange(12, dtype=np.float32).reshape(3, 4)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_creates_directory(self):
+        self.assertTrue(self.cache.directory.is_dir())
+
+    def test_default_directory_is_in_config_dir(self):
+        home = Path(self.tmp.name)
+        with patch('pathlib.Path.home', return_value=home):
+            cache = GeometryCache()
+        self.assertEqual(cache.directory, home / '.qhot' / 'geometry')
+
+    def test_load_missing(self):
+        self.assertIsNone(self.cache.load(self.key, 'theta'))
+
+    def test_round_trip_is_memory_mapped(self):
+        self.cache.save(self.key, 'theta', self.table)
+        table = self.cache.load(self.key, 'theta')
+        self.assertIsInstance(table, np.memmap)
+        self.assertFalse(table.flags.writeable)
+        np.testing.assert_array_equal(table, self.table)
+
+    def test_no_temporary_files_left(self):
+        self.cache.save(self.key, 'theta', self.table)
+        names = [p.name for p in self.cache.directory.iterdir()]
+        self.assertEqual(names, [self.cache.path(self.key, 'theta').name])
+
+    def test_fetch_builds_once(self):
+        build = MagicMock(return_value=self.table)
+        self.cache.fetch(self.key, 'theta', build)
+        table = self.cache.fetch(self.key, 'theta', build)
+        build.assert_called_once()
+        np.testing.assert_array_equal(table, self.table)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_corrupt_file_is_rebuilt(self):
+        self.cache.path(self.key, 'theta').write_bytes(b'not a table')
+        with self.assertLogs('QHOT.lib.holograms.GeometryCache',
+                             level='WARNING'):
+            table = self.cache.fetch(self.key, 'theta',
+                                     lambda: self.table)
+        np.testing.assert_array_equal(table, self.table)
+
+    def test_clear(self):
+        self.cache.save(self.key, 'theta', self.table)
+        self.cache.clear()
+        self.assertIsNone(self.cache.load(self.key, 'theta'))
+
+
+class TestCGHIntegration(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.directory = Path(self.tmp.name)
+        self.cgh = CGH(shape=(32, 48))
+        self.cgh.geometrycache = GeometryCache(self.directory)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_disabled_by_default(self):
+        self.assertIsNone(CGH(shape=(8, 8)).geometrycache)
+
+    def test_tables_stored(self):
+        self.cgh.theta
+        self.cgh.qr
+        self.cgh.helical(2)
+        names = sorted(p.name.split('-')[0]
+                       for p in self.directory.glob('*.npy'))
+        self.assertEqual(names, ['phasor', 'qr', 'theta'])
+
+    def test_new_session_loads_tables(self):
+        expected = self.cgh.qr.copy()
+        cgh = CGH(shape=(32, 48))
+        cgh.geometrycache = GeometryCache(self.directory)
+        qr = cgh.qr
+        self.assertIsInstance(qr, np.memmap)
+        np.testing.assert_array_equal(qr, expected)
+        self.assertEqual(cgh.geometrycache.hits, 1)
+
+    def test_calibration_change_uses_new_key(self):
+        self.cgh.qr
+        self.cgh.xs = self.cgh.xs + 5.
+        self.cgh.qr
+        self.assertEqual(len(list(self.directory.glob('qr-*.npy'))), 2)
+
+    def test_matrix_change_reuses_tables(self):
+        self.cgh.qr
+        self.cgh.thetac = 10.
+        self.cgh.xc = 5.
+        self.assertEqual(len(list(self.directory.glob('qr-*.npy'))), 1)
+
+    def test_structures_match_uncached(self):
+        from QHOT.traps.QRingTrap import QRingTrap
+        trap = QRingTrap(r=(3., 4., 0.), radius=8., ell=2.)
+        self.cgh.fieldOf(trap)
+        cgh = CGH(shape=(32, 48))
+        cgh.geometrycache = GeometryCache(self.directory)
+        np.testing.assert_allclose(cgh.fieldOf(trap),
+                                   CGH(shape=(32, 48)).fieldOf(trap),
+                                   rtol=0, atol=1e-6)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,262 @@
+'''Unit tests for HologramCache.'''
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+import numpy as np
+from pyqtgraph.Qt import QtTest, QtWidgets
+from QHOT.lib.holograms.CGH import CGH
+from QHOT.lib.holograms.HologramCache import HologramCache
+from QHOT.lib.traps.QTrap import QTrap
+from QHOT.lib.traps.QTrapGroup import QTrapGroup
+from QHOT.lib.traps.TrapSnapshot import TrapSnapshot
+from QHOT.traps.QTweezer import QTweezer
+from QHOT.traps.QVortex import QVortex
+
+app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+
+class LiveVortex(QTrap):
+
+    '''Vortex whose structure can only be computed from its live state.'''
+
+    def __init__(self, *args, ell=0, **kwargs):
+        self.ell = ell
+        super().__init__(*args, **kwargs)
+
+    def structureKey(self):
+        return (self.ell,)
+
+    def structure(self, cgh):
+        return cgh.helical(self.ell)
+
+
+class TestKey(unittest.TestCase):
+
+    def setUp(self):
+        self.traps = [QTweezer(r=(1., 2., 0.), phase=0.),
+                      QVortex(r=(5., 3., 1.), ell=2, phase=1.)]
+        self.calibration = CGH(shape=(8, 8)).calibration
+
+    def key(self, traps, **changes):
+        calibration = dict(self.calibration, **changes)
+        return HologramCache.key(TrapSnapshot.of(traps), calibration)
+
+    def test_deterministic(self):
+        self.assertEqual(self.key(self.traps), self.key(self.traps))
+
+    def test_order_independent(self):
+        self.assertEqual(self.key(self.traps), self.key(self.traps[::-1]))
+
+    def test_equal_scene_of_other_traps(self):
+        others = [QTweezer(r=(1., 2., 0.), phase=0.),
+                  QVortex(r=(5., 3., 1.), ell=2, phase=1.)]
+        self.assertEqual(self.key(self.traps), self.key(others))
+
+    def test_grouping_ignored(self):
+        key = self.key(self.traps)
+        group = QTrapGroup()
+        group.addTrap(self.traps)
+        self.assertEqual(self.key([group]), key)
+
+    def test_distinguishes_positions(self):
+        key = self.key(self.traps)
+        self.traps[0].x = 1.0001
+        self.assertNotEqual(self.key(self.traps), key)
+
+    def test_distinguishes_parameters(self):
+        key = self.key(self.traps)
+        self.traps[1].ell = 3
+        self.assertNotEqual(self.key(self.traps), key)
+
+    def test_distinguishes_types(self):
+        key = self.key(self.traps[:1])
+        other = QVortex(r=(1., 2., 0.), ell=0, phase=0.)
+        self.assertNotEqual(self.key([other]), key)
+
+    def test_distinguishes_calibration(self):
+        self.assertNotEqual(self.key(self.traps),
+                            self.key(self.traps, xs=1.))
+
+
+class TestStore(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = HologramCache()
+        self.hologram = np.arange(12, dtype=np.uint8).reshape(3, 4)
+
+    def test_get_missing(self):
+        self.assertIsNone(self.cache.get('key'))
+        self.assertEqual(self.cache.misses, 1)
+
+    def test_round_trip(self):
+        self.cache.put('key', self.hologram)
+        np.testing.assert_array_equal(self.cache.get('key'), self.hologram)
+        self.assertEqual(self.cache.hits, 1)
+
+    def test_stores_read_only_copy(self):
+        self.cache.put('key', self.hologram)
+        self.hologram[0, 0] = 99
+        stored = self.cache.get('key')
+        self.assertEqual(stored[0, 0], 0)
+        self.assertFalse(stored.flags.writeable)
+
+    def test_evicts_least_recently_used(self):
+        self.cache.budget = 2 * self.hologram.nbytes / 2**20
+        self.cache.put('a', self.hologram)
+        self.cache.put('b', self.hologram)
+        self.cache.get('a')
+        self.cache.put('c', self.hologram)
+        self.assertEqual(set(self.cache._data), {'a', 'c'})
+        self.assertEqual(self.cache.evictions, 1)
+        self.assertEqual(self.cache.nbytes, 2 * self.hologram.nbytes)
+
+    def test_unlimited_budget(self):
+        self.cache.budget = 0.
+        for n in range(10):
+            self.cache.put(str(n), self.hologram)
+        self.assertEqual(len(self.cache), 10)
+
+    def test_hitrate(self):
+        self.assertEqual(self.cache.hitrate, 0.)
+        self.cache.get('key')
+        self.cache.put('key', self.hologram)
+        self.cache.get('key')
+        self.assertEqual(self.cache.stats['hitrate'], 0.5)
+
+    def test_reset_stats(self):
+        self.cache.get('key')
+        self.cache.resetStats()
+        self.assertEqual(self.cache.misses, 0)
+
+
+class TestDisk(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.directory = Path(self.tmp.name) / 'holograms'
+        self.cache = HologramCache(directory=self.directory)
+        self.hologram = np.arange(12, dtype=np.uint8).reshape(3, 4)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_memory_only_by_default(self):
+        self.assertIsNone(HologramCache().path('key'))
+
+    def test_creates_directory(self):
+        self.assertTrue(self.directory.is_dir())
+
+    def test_new_session_loads_hologram(self):
+        self.cache.put('key', self.hologram)
+        cache = HologramCache(directory=self.directory)
+        np.testing.assert_array_equal(cache.get('key'), self.hologram)
+        self.assertEqual((cache.loads, cache.hits), (1, 0))
+        cache.get('key')
+        self.assertEqual(cache.hits, 1)
+
+    def test_no_temporary_files_left(self):
+        self.cache.put('key', self.hologram)
+        names = [p.name for p in self.directory.iterdir()]
+        self.assertEqual(names, [self.cache.path('key').name])
+
+    def test_corrupt_file_is_a_miss(self):
+        self.cache.path('key').write_bytes(b'not a hologram')
+        with self.assertLogs('QHOT.lib.holograms.HologramCache',
+                             level='WARNING'):
+            self.assertIsNone(self.cache.get('key'))
+
+    def test_clear(self):
+        self.cache.put('key', self.hologram)
+        self.cache.clear()
+        self.assertEqual(len(self.cache), 0)
+        self.assertEqual(list(self.directory.iterdir()), [])
+
+
+class TestCGHIntegration(unittest.TestCase):
+
+    def setUp(self):
+        self.cgh = CGH(shape=(32, 48))
+        self.cgh.hologramcache = HologramCache()
+        self.traps = [QTweezer(r=(3., 4., 0.), phase=0.),
+                      QVortex(r=(-5., 2., 1.), ell=2, phase=0.)]
+
+    def test_disabled_by_default(self):
+        self.assertIsNone(CGH(shape=(8, 8)).hologramcache)
+        self.assertNotIn('hologram_cache', CGH(shape=(8, 8)).statistics)
+
+    def test_revisited_scene_not_computed(self):
+        first = self.cgh.compute(self.traps).copy()
+        self.traps[0].x = 10.
+        self.cgh.compute(self.traps)
+        self.traps[0].x = 3.
+        with patch.object(self.cgh, '_render') as render:
+            hologram = self.cgh.compute(self.traps)
+        render.assert_not_called()
+        np.testing.assert_array_equal(hologram, first)
+
+    def test_hit_emits_hologram(self):
+        self.cgh.compute(self.traps)
+        spy = QtTest.QSignalSpy(self.cgh.hologramReady)
+        self.cgh.compute(self.traps)
+        self.assertEqual(len(spy), 1)
+
+    def test_hit_uses_output_buffer(self):
+        first = self.cgh.compute(self.traps)
+        second = self.cgh.compute(self.traps)
+        self.assertIsNot(first, second)
+        self.assertTrue(second.flags.writeable)
+
+    def test_running_sum_survives_hits(self):
+        self.cgh.compute(self.traps)
+        self.traps[1].x = 0.
+        self.cgh.compute(self.traps)
+        self.traps[1].x = -5.
+        self.cgh.compute(self.traps)
+        self.traps[0].y = 7.
+        expected = CGH(shape=(32, 48)).compute(self.traps)
+        np.testing.assert_array_equal(self.cgh.compute(self.traps),
+                                      expected)
+
+    def test_calibration_change_recomputes(self):
+        self.cgh.compute(self.traps)
+        self.cgh.xs = 2.
+        with patch.object(self.cgh, '_render',
+                          wraps=self.cgh._render) as render:
+            self.cgh.compute(self.traps)
+        render.assert_called_once()
+
+    def test_cache_budget_not_part_of_key(self):
+        self.cgh.compute(self.traps)
+        self.cgh.cachebudget = 16.
+        self.cgh.compute(self.traps)
+        self.assertEqual(self.cgh.hologramcache.hits, 1)
+
+    def test_edit_after_snapshot_does_not_poison_cache(self):
+        vortex = self.traps[1]
+        expected = CGH(shape=(32, 48)).compute(self.traps).copy()
+        snapshot = TrapSnapshot.of(self.traps)
+        vortex.ell = 3
+        self.cgh.compute(snapshot)
+        self.cgh.compute(self.traps)
+        vortex.ell = 2
+        hologram = self.cgh.compute(self.traps)
+        self.assertEqual(self.cgh.hologramcache.hits, 1)
+        np.testing.assert_array_equal(hologram, expected)
+
+    def test_live_structures_not_cached(self):
+        trap = LiveVortex(r=(3., 4., 0.), phase=0., ell=2)
+        self.cgh.compute([trap])
+        self.cgh.compute([trap])
+        self.assertEqual(len(self.cgh.hologramcache), 0)
+        self.assertEqual(self.cgh.hologramcache.hits, 0)
+
+    def test_statistics_report_hitrate(self):
+        self.cgh.compute(self.traps)
+        self.cgh.compute(self.traps)
+        stats = self.cgh.statistics['hologram_cache']
+        self.assertEqual(stats['hitrate'], 0.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
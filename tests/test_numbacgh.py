@@ -0,0 +1,106 @@
+'''Unit tests for NumbaCGH.'''
+import unittest
+import numpy as np
+from pyqtgraph.Qt import QtWidgets
+
+from QHOT.lib.holograms.CGH import CGH
+import QHOT.lib.holograms.NumbaCGH as mod
+
+app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+skip_no_numba = unittest.skipUnless(mod.numba is not None,
+                                    'numba not installed')
+
+
+def random_vectors(rng, n, size):
+    phase = rng.uniform(-np.pi, np.pi, (size, n))
+    return np.exp(1j*phase).astype(np.complex64)
+
+
+def split(v):
+    return np.stack((v.real, v.imag)).astype(np.float32)
+
+
+class TestFusedKernel(unittest.TestCase):
+    '''Exercise the kernel as plain Python on small frames.'''
+
+    shape = (6, 9)
+
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        h, w = self.shape
+        self.eyt = random_vectors(rng, 3, h)
+        self.ext = random_vectors(rng, 3, w)
+        self.syt = random_vectors(rng, 2, h)
+        self.sxt = random_vectors(rng, 2, w)
+        self.structures = [random_vectors(rng, w, h) for _ in range(2)]
+
+    def field(self):
+        field = self.eyt @ self.ext.T
+        for m, structure in enumerate(self.structures):
+            field += np.outer(self.syt[:, m], self.sxt[:, m]) * structure
+        return field
+
+    def test_matches_quantized_field(self):
+        out = np.zeros(self.shape, dtype=np.uint8)
+        mod._fused(split(self.eyt), split(self.ext),
+                   split(self.syt), split(self.sxt), self.structures, out)
+        difference = np.abs(out.astype(int) -
+                            CGH.quantize(self.field()).astype(int))
+        self.assertTrue(np.all((difference <= 1) | (difference == 255)))
+
+    def test_no_traps_gives_midpoint(self):
+        h, w = self.shape
+        ey = np.zeros((2, h, 0), dtype=np.float32)
+        ex = np.zeros((2, w, 0), dtype=np.float32)
+        out = np.zeros(self.shape, dtype=np.uint8)
+        mod._fused(ey, ex, ey, ex, [], out)
+        np.testing.assert_array_equal(out, 127)
+
+
+class TestNumbaCGHInit(unittest.TestCase):
+
+    def test_raises_without_numba(self):
+        from unittest.mock import patch
+        with patch.object(mod, 'numba', None):
+            with self.assertRaises(ImportError):
+                mod.NumbaCGH()
+
+
+@skip_no_numba
+class TestNumbaCompute(unittest.TestCase):
+
+    shape = (48, 64)
+
+    def setUp(self):
+        from QHOT.traps.QTweezer import QTweezer
+        from QHOT.traps.QVortex import QVortex
+        rng = np.random.default_rng(5)
+        self.traps = [QTweezer(r=(x, y, z), phase=p)
+                      for x, y, z, p in rng.uniform(-50., 50., (12, 4))]
+        self.traps.append(QVortex(r=(10., 20., 0.), phase=0., ell=3))
+        self.cgh = mod.NumbaCGH(shape=self.shape)
+
+    def test_not_incremental(self):
+        self.assertFalse(self.cgh.incremental)
+
+    def test_matches_cgh(self):
+        ref = CGH(shape=self.shape)
+        expected = ref.compute(self.traps).astype(int)
+        difference = np.abs(self.cgh.compute(self.traps).astype(int) -
+                            expected)
+        self.assertTrue(np.all((difference <= 1) | (difference == 255)))
+
+    def test_empty_gives_midpoint(self):
+        np.testing.assert_array_equal(self.cgh.compute([]), 127)
+
+    def test_group(self):
+        from QHOT.lib.traps.QTrapGroup import QTrapGroup
+        group = QTrapGroup(r=(0., 0., 0.))
+        group.addTrap(self.traps[:4])
+        phase = self.cgh.compute([group] + self.traps[4:])
+        self.assertEqual(phase.shape, self.shape)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,199 @@
+'''Unit tests for QCGHScheduler.'''
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+from pyqtgraph.Qt import QtCore, QtTest, QtWidgets
+
+from QHOT.lib.holograms.CGH import CGH
+from QHOT.lib.holograms.QCGHScheduler import QCGHScheduler
+from QHOT.lib.traps.TrapSnapshot import TrapSnapshot
+from QHOT.traps.QTweezer import QTweezer
+from QHOT.traps.QVortex import QVortex
+
+
+app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+
+class SchedulerCase(unittest.TestCase):
+
+    def setUp(self):
+        self.cgh = CGH(shape=(32, 48))
+        self.scheduler = QCGHScheduler(self.cgh)
+        self.traps = [QTweezer(r=(float(n), 0., 0.)) for n in range(3)]
+        self.vortex = QVortex(r=(5., 5., 0.), ell=2)
+        self.spy = QtTest.QSignalSpy(self.cgh.hologramReady)
+
+
+class TestSubmit(SchedulerCase):
+
+    def test_nothing_pending_initially(self):
+        self.assertFalse(self.scheduler.pending)
+
+    def test_submit_is_pending(self):
+        self.scheduler.submit(self.traps)
+        self.assertTrue(self.scheduler.pending)
+
+    def test_newest_state_wins(self):
+        self.scheduler.submit(self.traps)
+        self.scheduler.submit(self.traps[:1])
+        with patch.object(self.cgh, 'compute') as compute:
+            self.scheduler.process()
+        compute.assert_called_once_with(TrapSnapshot.of(self.traps[:1]))
+
+    def test_replaced_state_counted_as_dropped(self):
+        self.scheduler.submit(self.traps)
+        self.scheduler.submit(self.traps)
+        self.assertEqual(self.scheduler.stats['submitted'], 2)
+        self.assertEqual(self.scheduler.stats['dropped'], 1)
+
+    def test_submission_is_recorded(self):
+        expected = TrapSnapshot.of(self.traps)
+        self.scheduler.submit(self.traps)
+        self.traps[0].x = 10.
+        with patch.object(self.cgh, 'compute') as compute:
+            self.scheduler.process()
+        compute.assert_called_once_with(expected)
+
+    def test_snapshot_submitted_as_is(self):
+        snapshot = TrapSnapshot.of(self.traps)
+        self.scheduler.submit(snapshot)
+        with patch.object(self.cgh, 'compute') as compute:
+            self.scheduler.process()
+        self.assertIs(compute.call_args.args[0], snapshot)
+
+
+class TestProcess(SchedulerCase):
+
+    def test_idle_process_does_nothing(self):
+        self.scheduler.process()
+        self.assertEqual(len(self.spy), 0)
+
+    def test_computes_submitted_state(self):
+        self.scheduler.submit(self.traps)
+        self.scheduler.process()
+        self.assertEqual(len(self.spy), 1)
+        self.assertFalse(self.scheduler.pending)
+        self.assertEqual(self.scheduler.stats['computed'], 1)
+
+    def test_state_computed_once(self):
+        self.scheduler.submit(self.traps)
+        self.scheduler.process()
+        self.scheduler.process()
+        self.assertEqual(len(self.spy), 1)
+
+    def test_cancellation_hook_removed_after_compute(self):
+        self.scheduler.submit(self.traps)
+        self.scheduler.process()
+        self.assertIsNone(self.cgh.cancelled)
+
+    def test_failure_is_contained(self):
+        self.scheduler.submit(self.traps)
+        with patch.object(self.cgh, 'compute', side_effect=ValueError), \
+                self.assertLogs('QHOT.lib.holograms.QCGHScheduler',
+                                level='WARNING'):
+            self.scheduler.process()
+        self.assertIsNone(self.cgh.cancelled)
+        self.assertEqual(self.scheduler.stats['computed'], 0)
+
+
+class TestCancellation(SchedulerCase):
+
+    def submitDuring(self, traps, times=1):
+        '''Submit ``traps`` from within the next ``times`` computations.'''
+        original = self.cgh._contributionOf
+        remaining = [times]
+
+        def contribution(trap):
+            if remaining[0] > 0 and not self.scheduler.pending:
+                remaining[0] -= 1
+                self.scheduler.submit(traps)
+            return original(trap)
+        return patch.object(self.cgh, '_contributionOf',
+                            side_effect=contribution)
+
+    def test_superseded_compute_abandoned(self):
+        newest = self.traps + [self.vortex]
+        self.scheduler.submit([self.vortex])
+        with self.submitDuring(newest):
+            self.scheduler.process()
+        self.assertEqual(self.scheduler.stats['abandoned'], 1)
+        self.assertEqual(self.scheduler.stats['computed'], 1)
+        self.assertEqual(len(self.spy), 1)
+
+    def test_newest_state_computed_after_cancellation(self):
+        newest = self.traps + [self.vortex]
+        self.scheduler.submit([self.vortex])
+        with self.submitDuring(newest):
+            self.scheduler.process()
+        expected = CGH(shape=(32, 48)).compute(newest)
+        np.testing.assert_array_equal(self.spy[0][0], expected)
+
+    def test_consecutive_cancellations_limited(self):
+        self.scheduler.submit([self.vortex])
+        with self.submitDuring([self.vortex], times=5):
+            self.scheduler.process()
+        self.assertEqual(self.scheduler.stats['abandoned'], 1)
+        self.assertEqual(self.scheduler.stats['computed'], 1)
+        self.assertTrue(self.scheduler.pending)
+
+    def test_streak_resets_after_completion(self):
+        self.scheduler.submit([self.vortex])
+        with self.submitDuring([self.vortex], times=5):
+            self.scheduler.process()
+            self.vortex.ell = 4
+            self.scheduler.submit([self.vortex])
+            self.scheduler.process()
+        self.assertEqual(self.scheduler.stats['abandoned'], 2)
+
+    def test_reset_stats(self):
+        self.scheduler.submit(self.traps)
+        self.scheduler.process()
+        self.scheduler.resetStats()
+        self.assertEqual(set(self.scheduler.stats.values()), {0})
+
+
+class TestRate(SchedulerCase):
+
+    def test_default_rate(self):
+        self.assertEqual(self.scheduler.rate, 30.)
+        self.assertEqual(self.scheduler._timer.interval(), 33)
+
+    def test_rate_sets_interval(self):
+        self.scheduler.rate = 100.
+        self.assertEqual(self.scheduler._timer.interval(), 10)
+
+    def test_rate_must_be_positive(self):
+        with self.assertRaises(ValueError):
+            self.scheduler.rate = 0.
+
+    def test_timer_processes_submissions(self):
+        self.scheduler.rate = 200.
+        self.scheduler.start()
+        self.scheduler.submit(self.traps)
+        self.assertTrue(self.spy.wait(1000))
+        self.scheduler.stop()
+        self.assertFalse(self.scheduler._timer.isActive())
+
+
+class TestThread(SchedulerCase):
+
+    def test_computes_in_cgh_thread(self):
+        thread = QtCore.QThread()
+        self.cgh.moveToThread(thread)
+        self.scheduler.moveToThread(thread)
+        thread.started.connect(self.scheduler.start)
+        thread.finished.connect(self.scheduler.stop)
+        thread.start()
+        try:
+            self.scheduler.rate = 100.
+            self.scheduler.submit(self.traps)
+            self.assertTrue(self.spy.wait(2000))
+        finally:
+            thread.quit()
+            thread.wait()
+        self.assertEqual(self.scheduler.stats['computed'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -48,6 +48,9 @@ class TestProperties(unittest.TestCase):
     def test_does_not_contain_shape(self):
         self.assertNotIn('shape', self.widget.properties)
 
+    def test_contains_cache_budget(self):
+        self.assertIn('cachebudget', self.widget.properties)
+
 
 class TestGet(unittest.TestCase):
 
@@ -153,12 +156,19 @@ class TestUpdateCGH(unittest.TestCase):
 
     def test_known_field_updates_cgh(self):
         self.widget.updateCGH(None, [self._make_change('wavelength', 0.532)])
+        self.widget.flush()
         self.assertAlmostEqual(self.cgh.wavelength, 0.532, places=4)
 
+    def test_cache_budget_updates_cgh(self):
+        self.widget.updateCGH(None, [self._make_change('cachebudget', 16.)])
+        self.widget.flush()
+        self.assertEqual(self.cgh._budget.limit, 16 * 2**20)
+
     def test_non_value_change_ignored(self):
         original = self.cgh.wavelength
         self.widget.updateCGH(None, [self._make_change('wavelength', 0.532,
                                                         change='childAdded')])
+        self.widget.flush()
         self.assertEqual(self.cgh.wavelength, original)
 
     def test_unknown_field_logs_warning(self):
@@ -174,6 +184,70 @@ class TestUpdateCGH(unittest.TestCase):
             self.fail(f'updateCGH raised unexpectedly: {e}')
 
 
+class TestCoalescing(unittest.TestCase):
+
+    def setUp(self):
+        self.cgh = CGH()
+        self.widget = QCGHTree(cgh=self.cgh)
+        self.widget.flush()
+
+    def test_change_is_deferred(self):
+        original = self.cgh.xs
+        self.widget.set('xs', original + 10.)
+        self.assertEqual(self.cgh.xs, original)
+        self.assertTrue(self.widget._timer.isActive())
+
+    def test_flush_applies_change(self):
+        self.widget.set('xs', 100.)
+        self.widget.flush()
+        self.assertEqual(self.cgh.xs, 100.)
+        self.assertFalse(self.widget._timer.isActive())
+
+    def test_burst_rebuilds_geometry_once(self):
+        with patch.object(self.cgh, 'updateGeometry',
+                          wraps=self.cgh.updateGeometry) as update:
+            for value in (100., 101., 102.):
+                self.widget.set('xs', value)
+            self.widget.set('ys', 50.)
+            self.widget.set('phis', 4.)
+            self.widget.flush()
+        update.assert_called_once()
+        self.assertEqual(self.cgh.xs, 102.)
+        self.assertEqual(self.cgh.ys, 50.)
+
+    def test_burst_emits_recalculate_once(self):
+        from pyqtgraph.Qt import QtTest
+        spy = QtTest.QSignalSpy(self.cgh.recalculate)
+        self.widget.set('xs', 100.)
+        self.widget.set('thetac', 10.)
+        self.widget.flush()
+        self.assertEqual(len(spy), 1)
+
+    def test_timer_flushes(self):
+        from pyqtgraph.Qt import QtTest
+        self.widget.set('xs', 100.)
+        QtTest.QTest.qWait(self.widget.interval + 100)
+        self.assertEqual(self.cgh.xs, 100.)
+
+    def test_settings_apply_in_one_batch(self):
+        with patch.object(self.cgh, 'updateGeometry',
+                          wraps=self.cgh.updateGeometry) as update:
+            self.widget.settings = dict(xs=10., ys=20., wavelength=0.8)
+            self.widget.flush()
+        update.assert_called_once()
+
+    def test_flush_without_changes_does_nothing(self):
+        from pyqtgraph.Qt import QtTest
+        spy = QtTest.QSignalSpy(self.cgh.recalculate)
+        self.widget.flush()
+        self.assertEqual(len(spy), 0)
+
+    def test_changing_cgh_flushes_pending_changes(self):
+        self.widget.set('xs', 100.)
+        self.widget.cgh = CGH()
+        self.assertEqual(self.cgh.xs, 100.)
+
+
 class TestUpdateTree(unittest.TestCase):
 
     def test_populates_from_cgh(self):
@@ -118,6 +118,7 @@ class TestStructureMethod(unittest.TestCase):
     def setUp(self):
         self.cgh = CGH(shape=(32, 32), xc=0., yc=0., zc=0.,
                        thetac=0., splay=0.)
+        self.cgh.bessel_step = 0.001
 
     def test_returns_ndarray(self):
         trap = QRingTrap(radius=10., ell=0., phase=0.)
@@ -151,6 +152,12 @@ class TestStructureMethod(unittest.TestCase):
         r2 = trap2.structure(self.cgh)
         self.assertFalse(np.allclose(r1, r2))
 
+    def test_structure_from_parameters(self):
+        trap = QRingTrap(radius=5., ell=1., phase=0.)
+        result = QRingTrap.structureFrom(self.cgh, (12., 2.))
+        trap.radius, trap.ell = 12., 2.
+        np.testing.assert_array_equal(result, trap.structure(self.cgh))
+
 
 class TestAppearance(unittest.TestCase):
 
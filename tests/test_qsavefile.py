@@ -71,6 +71,11 @@ class TestMakeDirs(_Base):
     def test_classname_is_lowercase_parent_class(self):
         self.assertEqual(self.save.classname, 'qmainwindow')
 
+    def test_config_dir_of_class(self):
+        with patch('pathlib.Path.home', return_value=self.home):
+            self.assertEqual(QSaveFile.configDir('QHOT'),
+                             self.home / '.qhot')
+
 
 # ---------------------------------------------------------------------------
 # timestamp()
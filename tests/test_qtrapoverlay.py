@@ -7,6 +7,7 @@ from QHOT.lib.traps.QTrap import QTrap
 from QHOT.lib.traps.QTrapGroup import QTrapGroup
 from QHOT.lib.traps.QTrapOverlay import QTrapOverlay
 from QHOT.traps.QTweezer import QTweezer
+from QHOT.traps.QVortex import QVortex
 
 
 app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
@@ -264,6 +265,7 @@ class TestOnTrapChanged(unittest.TestCase):
         trap = QTrap(r=(1., 2., 0.), phase=0.)
         overlay.addTrap(trap)
         trap.r = (5., 6., 0.)
+        overlay.flush()
         spot = overlay.points()[0]
         self.assertAlmostEqual(spot._data['x'], 5.)
         self.assertAlmostEqual(spot._data['y'], 6.)
@@ -450,20 +452,15 @@ class TestRemoveTrapFromPosition(unittest.TestCase):
         self.overlay.addTrap(self.trap)
 
     def test_removes_nearest_trap(self):
-        spot = self.overlay.points()[0]
-        with patch.object(self.overlay, 'pointsAt', return_value=[spot]):
-            self.overlay.removeTrap(QtCore.QPointF(5., 5.))
+        self.overlay.removeTrap(QtCore.QPointF(5., 5.))
         self.assertNotIn(self.trap, self.overlay._traps)
 
     def test_returns_true_when_trap_found(self):
-        spot = self.overlay.points()[0]
-        with patch.object(self.overlay, 'pointsAt', return_value=[spot]):
-            result = self.overlay.removeTrap(QtCore.QPointF(5., 5.))
+        result = self.overlay.removeTrap(QtCore.QPointF(5., 5.))
         self.assertTrue(result)
 
     def test_returns_false_when_no_trap(self):
-        with patch.object(self.overlay, 'pointsAt', return_value=[]):
-            result = self.overlay.removeTrap(QtCore.QPointF(99., 99.))
+        result = self.overlay.removeTrap(QtCore.QPointF(99., 99.))
         self.assertFalse(result)
 
 
@@ -475,14 +472,11 @@ class TestTrapAt(unittest.TestCase):
         self.overlay.addTrap(self.trap)
 
     def test_returns_trap_at_position(self):
-        spot = self.overlay.points()[0]
-        with patch.object(self.overlay, 'pointsAt', return_value=[spot]):
-            result = self.overlay.trapAt(QtCore.QPointF(5., 5.))
+        result = self.overlay.trapAt(QtCore.QPointF(5., 5.))
         self.assertIs(result, self.trap)
 
     def test_returns_none_when_no_trap(self):
-        with patch.object(self.overlay, 'pointsAt', return_value=[]):
-            result = self.overlay.trapAt(QtCore.QPointF(99., 99.))
+        result = self.overlay.trapAt(QtCore.QPointF(99., 99.))
         self.assertIsNone(result)
 
 
@@ -495,15 +489,12 @@ class TestTrapsIn(unittest.TestCase):
         self.overlay.addTrap([self.t1, self.t2])
 
     def test_returns_traps_in_rect(self):
-        spots = list(self.overlay.points())
-        with patch.object(self.overlay, 'pointsAt', return_value=spots):
-            result = self.overlay.trapsIn(QtCore.QRectF(0., 0., 10., 10.))
+        result = self.overlay.trapsIn(QtCore.QRectF(0., 0., 10., 10.))
         self.assertIn(self.t1, result)
         self.assertIn(self.t2, result)
 
     def test_returns_empty_when_none_in_rect(self):
-        with patch.object(self.overlay, 'pointsAt', return_value=[]):
-            result = self.overlay.trapsIn(QtCore.QRectF(50., 50., 10., 10.))
+        result = self.overlay.trapsIn(QtCore.QRectF(50., 50., 10., 10.))
         self.assertEqual(result, [])
 
 
@@ -731,33 +722,26 @@ class TestSelectGroup(unittest.TestCase):
 
     def test_returns_false_when_no_trap(self):
         overlay = make_overlay()
-        with patch.object(overlay, 'pointsAt', return_value=[]):
-            self.assertFalse(overlay.selectGroup(QtCore.QPointF(0., 0.)))
+        self.assertFalse(overlay.selectGroup(QtCore.QPointF(0., 0.)))
 
     def test_returns_true_when_trap_found(self):
         overlay = make_overlay()
         trap = QTrap(r=(5., 5., 0.), phase=0.)
         overlay.addTrap(trap)
-        spot = overlay.points()[0]
-        with patch.object(overlay, 'pointsAt', return_value=[spot]):
-            self.assertTrue(overlay.selectGroup(QtCore.QPointF(5., 5.)))
+        self.assertTrue(overlay.selectGroup(QtCore.QPointF(5., 5.)))
 
     def test_selected_is_set(self):
         overlay = make_overlay()
         trap = QTrap(r=(5., 5., 0.), phase=0.)
         overlay.addTrap(trap)
-        spot = overlay.points()[0]
-        with patch.object(overlay, 'pointsAt', return_value=[spot]):
-            overlay.selectGroup(QtCore.QPointF(5., 5.))
+        overlay.selectGroup(QtCore.QPointF(5., 5.))
         self.assertIs(overlay._selected, trap)
 
     def test_brush_changes_to_selected(self):
         overlay = make_overlay()
         trap = QTrap(r=(5., 5., 0.), phase=0.)
         overlay.addTrap(trap)
-        spot = overlay.points()[0]
-        with patch.object(overlay, 'pointsAt', return_value=[spot]):
-            overlay.selectGroup(QtCore.QPointF(5., 5.))
+        overlay.selectGroup(QtCore.QPointF(5., 5.))
         self.assertEqual(overlay.points()[0].brush(),
                          overlay.brush[overlay.State.SELECTED])
 
@@ -1154,6 +1138,136 @@ class TestReshapeSignals(unittest.TestCase):
             self.assertNotIn(leaf, self.overlay._traps)
 
 
+class TestIncrementalSpots(unittest.TestCase):
+
+    def setUp(self):
+        self.overlay = make_overlay()
+        self.traps = [QTweezer(r=(float(n), 2.*n, 0.)) for n in range(6)]
+        self.overlay.addTrap(self.traps)
+
+    def assertConsistent(self):
+        points = self.overlay.points()
+        self.assertEqual(len(points), len(self.overlay._traps))
+        for n, trap in enumerate(self.overlay._traps):
+            self.assertEqual(trap._index, n)
+            self.assertIs(points[n].data(), trap)
+            self.assertAlmostEqual(points[n].pos().x(), trap.x)
+            self.assertAlmostEqual(points[n].pos().y(), trap.y)
+
+    def test_swap_remove_moves_last_trap(self):
+        self.overlay.removeTrap(self.traps[1])
+        self.assertIs(self.overlay._traps[1], self.traps[5])
+        self.assertConsistent()
+
+    def test_remove_last_trap(self):
+        self.overlay.removeTrap(self.traps[5])
+        self.assertConsistent()
+
+    def test_remove_several(self):
+        for n in (0, 3, 5, 2):
+            self.overlay.removeTrap(self.traps[n])
+        self.assertEqual(set(self.overlay._traps),
+                         {self.traps[1], self.traps[4]})
+        self.assertConsistent()
+
+    def test_remove_group_with_interleaved_leaves(self):
+        group = QTrapGroup()
+        members = [QTweezer(r=(10., float(n), 0.)) for n in range(3)]
+        group.addTrap(members)
+        self.overlay.addTrap(group)
+        self.overlay.addTrap(QTweezer(r=(20., 20., 0.)))
+        self.overlay.removeTrap(group)
+        self.assertEqual(len(self.overlay._traps), 7)
+        self.assertConsistent()
+
+    def test_removal_does_not_rebuild(self):
+        with patch.object(self.overlay, '_rebuildSpots') as rebuild:
+            self.overlay.removeTrap(self.traps[2])
+        rebuild.assert_not_called()
+
+    def test_reshape_does_not_rebuild(self):
+        from QHOT.traps.QTrapArray import QTrapArray
+        array = QTrapArray(shape=(2, 2), separation=10.)
+        self.overlay.addTrap(array)
+        with patch.object(self.overlay, '_rebuildSpots') as rebuild:
+            array.nx = 3
+        rebuild.assert_not_called()
+        self.assertEqual(len(self.overlay._traps), 12)
+        self.assertConsistent()
+
+    def test_moves_after_removal_update_correct_spot(self):
+        self.overlay.removeTrap(self.traps[0])
+        self.traps[5].x = 50.
+        self.overlay.flush()
+        self.assertConsistent()
+
+
+class TestSpatialIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.overlay = make_overlay()
+        self.traps = [QTweezer(r=(100.*n, 50., 0.)) for n in range(5)]
+        self.overlay.addTrap(self.traps)
+
+    def test_all_leaves_indexed(self):
+        self.assertEqual(len(self.overlay._grid), 5)
+
+    def test_trap_at_picks_nearest(self):
+        near = QTweezer(r=(204., 50., 0.))
+        self.overlay.addTrap(near)
+        self.assertIs(self.overlay.trapAt(QtCore.QPointF(201., 50.)),
+                      self.traps[2])
+        self.assertIs(self.overlay.trapAt(QtCore.QPointF(205., 50.)),
+                      near)
+
+    def test_traps_in_rect(self):
+        rect = QtCore.QRectF(150., 0., 200., 100.)
+        self.assertEqual(set(self.overlay.trapsIn(rect)),
+                         {self.traps[2], self.traps[3]})
+
+    def test_traps_in_unnormalized_rect(self):
+        rect = QtCore.QRectF(350., 100., -200., -100.)
+        self.assertEqual(set(self.overlay.trapsIn(rect)),
+                         {self.traps[2], self.traps[3]})
+
+    def test_moved_trap_found_at_new_position(self):
+        self.traps[1].r = (1000., 1000., 0.)
+        found = self.overlay.trapAt(QtCore.QPointF(1000., 1000.))
+        self.assertIs(found, self.traps[1])
+        self.assertIsNone(self.overlay.trapAt(QtCore.QPointF(100., 50.)))
+
+    def test_moved_group_found_at_new_position(self):
+        group = QTrapGroup(r=(0., 0., 0.))
+        self.overlay.removeTrap(self.traps[0])
+        group.addTrap(self.traps[0])
+        self.overlay.addTrap(group)
+        group.r = (0., 500., 0.)
+        self.assertIs(self.overlay.groupAt(QtCore.QPointF(0., 550.)),
+                      group)
+
+    def test_removed_trap_not_found(self):
+        self.overlay.removeTrap(self.traps[3])
+        self.assertNotIn(self.traps[3], self.overlay._grid)
+        self.assertIsNone(self.overlay.trapAt(QtCore.QPointF(300., 50.)))
+
+    def test_reshaped_leaves_indexed(self):
+        from QHOT.traps.QTrapArray import QTrapArray
+        array = QTrapArray(shape=(2, 2), separation=10.)
+        self.overlay.addTrap(array)
+        array.nx = 3
+        self.assertEqual(len(self.overlay._grid), 11)
+        leaf = next(array.leaves())
+        self.assertIs(self.overlay.groupAt(QtCore.QPointF(leaf.x, leaf.y)),
+                      array)
+
+    def test_clear_empties_index(self):
+        self.overlay.clearTraps()
+        self.assertEqual(len(self.overlay._grid), 0)
+
+    def test_hit_size_scales_with_view(self):
+        self.assertEqual(self.overlay._hitSize(), (8., 8.))
+
+
 class TestSaveLoad(unittest.TestCase):
 
     def setUp(self):
@@ -1326,6 +1440,7 @@ class TestRotationGesture(unittest.TestCase):
         event = MagicMock()
         event.buttons.return_value = self.overlay.button['left']
         self.overlay.mouseMove(event, pos)
+        self.overlay.flush()
         spot1 = self.overlay.points()[self.t1._index]
         self.assertAlmostEqual(spot1._data['x'], 0., places=5)
         self.assertAlmostEqual(spot1._data['y'], 4., places=5)
@@ -1420,9 +1535,7 @@ class TestLockedTrapIgnored(unittest.TestCase):
         self.trap.locked = True
 
     def test_select_group_skips_locked(self):
-        spot = self.overlay.points()[0]
-        with patch.object(self.overlay, 'pointsAt', return_value=[spot]):
-            result = self.overlay.selectGroup(QtCore.QPointF(5., 5.))
+        result = self.overlay.selectGroup(QtCore.QPointF(5., 5.))
         self.assertTrue(result)
         self.assertIsNone(self.overlay._selected)
 
@@ -1627,5 +1740,125 @@ class TestToggleMarkBinding(unittest.TestCase):
         self.assertEqual(overlay._handler[sig], overlay.toggleMark)
 
 
+class TestStore(unittest.TestCase):
+
+    def setUp(self):
+        self.overlay = make_overlay()
+        self.a = QTweezer(r=(1., 2., 0.))
+        self.b = QTweezer(r=(3., 4., 0.))
+        self.group = QTrapGroup(r=(2., 3., 0.))
+        self.group.addTrap([self.a, self.b])
+        self.overlay.addTrap(self.group)
+
+    def test_traps_share_overlay_store(self):
+        for trap in (self.group, self.a, self.b):
+            self.assertIs(trap._store, self.overlay.store)
+
+    def test_store_holds_positions(self):
+        r = self.overlay.store.positions([self.a, self.b])
+        np.testing.assert_array_equal(r, [[1., 2., 0.], [3., 4., 0.]])
+
+    def test_group_translation_updates_store(self):
+        self.group.r = (12., 3., 0.)
+        r = self.overlay.store.positions([self.a, self.b])
+        np.testing.assert_array_equal(r[:, 0], [11., 13.])
+
+    def test_removal_releases_slots(self):
+        self.overlay.removeTrap(self.group)
+        self.assertEqual(len(self.overlay.store), 0)
+        self.assertIsNot(self.a._store, self.overlay.store)
+        np.testing.assert_array_equal(self.a.r, [1., 2., 0.])
+
+
+class TestChangeset(unittest.TestCase):
+
+    def setUp(self):
+        self.overlay = make_overlay()
+        self.a = QTweezer(r=(1., 0., 0.))
+        self.b = QTweezer(r=(-1., 0., 0.))
+        self.group = QTrapGroup(r=(0., 0., 0.))
+        self.group.addTrap([self.a, self.b])
+        self.lone = QTweezer(r=(5., 5., 0.))
+        self.overlay.addTrap([self.group, self.lone])
+        self.spy = QtTest.QSignalSpy(self.overlay.trapsChanged)
+
+    def test_changes_coalesced(self):
+        self.lone.x = 6.
+        self.lone.y = 7.
+        self.group.r = (1., 0., 0.)
+        self.assertEqual(len(self.spy), 0)
+        self.overlay.flush()
+        self.assertEqual(len(self.spy), 1)
+        self.assertEqual(self.spy[0][0], {self.lone, self.group})
+
+    def test_flushed_on_next_event_loop_turn(self):
+        self.lone.x = 6.
+        QtCore.QCoreApplication.processEvents()
+        self.assertEqual(len(self.spy), 1)
+
+    def test_rotation_reports_descendants(self):
+        snap = self.group._snapshot()
+        self.group.rotate(np.pi / 2., snap)
+        self.overlay.flush()
+        self.assertEqual(len(self.spy), 1)
+        self.assertEqual(self.spy[0][0], {self.group, self.a, self.b})
+
+    def test_structure_change_reported(self):
+        vortex = QVortex(r=(0., 0., 0.))
+        self.overlay.addTrap(vortex)
+        vortex.ell = 3
+        self.overlay.flush()
+        self.assertIn(vortex, self.spy[0][0])
+
+    def test_removed_traps_omitted(self):
+        self.lone.x = 6.
+        self.overlay.removeTrap(self.lone)
+        self.overlay.flush()
+        self.assertEqual(len(self.spy), 0)
+
+    def test_empty_flush_is_silent(self):
+        self.overlay.flush()
+        self.assertEqual(len(self.spy), 0)
+
+    def test_group_move_updates_leaf_spots(self):
+        self.group.r = (10., 20., 0.)
+        self.overlay.flush()
+        points = self.overlay.points()
+        for trap in (self.a, self.b):
+            spot = points[trap._index]
+            self.assertAlmostEqual(spot.pos().x(), trap.x)
+            self.assertAlmostEqual(spot.pos().y(), trap.y)
+
+    def test_nested_group_leaves_updated(self):
+        leaf = QTweezer(r=(1., 1., 0.))
+        inner = QTrapGroup(r=(0., 0., 0.))
+        inner.addTrap(leaf)
+        outer = QTrapGroup(r=(0., 0., 0.))
+        outer.addTrap(inner)
+        self.overlay.addTrap(outer)
+        outer.r = (3., 4., 0.)
+        self.overlay.flush()
+        spot = self.overlay.points()[leaf._index]
+        self.assertAlmostEqual(spot.pos().x(), 4.)
+        self.assertAlmostEqual(spot.pos().y(), 5.)
+
+    def test_spots_moved_in_one_update(self):
+        self.group.r = (10., 20., 0.)
+        self.lone.x = 9.
+        with patch.object(self.overlay, '_moveSpots',
+                          wraps=self.overlay._moveSpots) as move, \
+                patch.object(self.overlay, 'updateSpots') as update:
+            self.overlay.flush()
+        move.assert_called_once()
+        self.assertEqual(len(move.call_args.args[0]), 3)
+        update.assert_not_called()
+
+    def test_bounds_follow_spots(self):
+        self.overlay.dataBounds(0)
+        self.lone.x = 100.
+        self.overlay.flush()
+        self.assertGreaterEqual(self.overlay.dataBounds(0)[1], 100.)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -297,6 +297,18 @@ class TestQTrapWidgetGroups(unittest.TestCase):
         self.t1.x = 99.
         self.assertAlmostEqual(leaf_widget.wid['x'].value, 99., places=2)
 
+    def test_update_traps_refreshes_leaves_of_moved_group(self):
+        self.widget.registerTrap(self.grp)
+        self.grp.r = (12.5, 3.5, 4.5)
+        self.widget.updateTraps(frozenset({self.grp}))
+        leaf_widget = self.widget._trap_widgets[self.t1]
+        self.assertAlmostEqual(leaf_widget.wid['x'].value, 11., places=2)
+
+    def test_update_traps_ignores_unregistered(self):
+        other = QTrap(phase=0.)
+        self.widget.updateTraps(frozenset({other}))
+        self.assertNotIn(other, self.widget._trap_widgets)
+
     def test_unregister_group_disconnects_leaves(self):
         self.widget.registerTrap(self.grp)
         leaf_widget = self.widget._trap_widgets[self.t1]
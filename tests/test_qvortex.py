@@ -110,6 +110,12 @@ class TestStructureMethod(unittest.TestCase):
         expected = np.exp(1j * self.cgh.theta)
         np.testing.assert_array_almost_equal(result, expected)
 
+    def test_structure_from_parameters(self):
+        trap = QVortex(ell=3, phase=0.)
+        result = QVortex.structureFrom(self.cgh, (2,))
+        trap.ell = 2
+        np.testing.assert_array_equal(result, trap.structure(self.cgh))
+
 
 class TestAppearance(unittest.TestCase):
 
@@ -0,0 +1,59 @@
+'''Unit tests for RampCache.'''
+import unittest
+import numpy as np
+from QHOT.lib.holograms.RampCache import RampCache
+
+
+class TestRampCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = RampCache(size=2)
+        self.vector = np.ones(4, dtype=np.complex64)
+
+    def test_get_missing(self):
+        self.assertIsNone(self.cache.get(('x', 0., 1., 0.)))
+        self.assertEqual(self.cache.misses, 1)
+
+    def test_round_trip(self):
+        self.cache['a'] = self.vector
+        self.assertIs(self.cache.get('a'), self.vector)
+        self.assertEqual(self.cache.hits, 1)
+
+    def test_evicts_least_recently_used(self):
+        self.cache['a'] = self.vector
+        self.cache['b'] = self.vector
+        self.cache.get('a')
+        self.cache['c'] = self.vector
+        self.assertIn('a', self.cache)
+        self.assertNotIn('b', self.cache)
+        self.assertEqual(self.cache.evictions, 1)
+
+    def test_shrinking_size_evicts(self):
+        self.cache['a'] = self.vector
+        self.cache['b'] = self.vector
+        self.cache.size = 1
+        self.assertEqual(len(self.cache), 1)
+        self.assertIn('b', self.cache)
+
+    def test_zero_size_holds_nothing(self):
+        self.cache.size = 0
+        self.cache['a'] = self.vector
+        self.assertEqual(len(self.cache), 0)
+
+    def test_clear(self):
+        self.cache['a'] = self.vector
+        self.cache.clear()
+        self.assertEqual(len(self.cache), 0)
+
+    def test_stats(self):
+        self.cache.get('a')
+        self.cache['a'] = self.vector
+        self.cache.get('a')
+        self.assertEqual(self.cache.stats, dict(entries=1, hits=1,
+                                                misses=1, evictions=0))
+        self.cache.resetStats()
+        self.assertEqual(self.cache.misses, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+'''Unit tests for SpotGrid.'''
+import unittest
+
+import numpy as np
+
+from QHOT.lib.traps.SpotGrid import SpotGrid
+
+
+class TestUpdate(unittest.TestCase):
+
+    def setUp(self):
+        self.grid = SpotGrid(spacing=10.)
+        self.grid.update('abc', np.array([[1., 1.], [15., 1.], [-5., 25.]]))
+
+    def test_len(self):
+        self.assertEqual(len(self.grid), 3)
+
+    def test_contains(self):
+        self.assertIn('a', self.grid)
+        self.assertNotIn('d', self.grid)
+
+    def test_move_within_cell(self):
+        self.grid.update('a', np.array([[9., 9.]]))
+        self.assertEqual(self.grid.candidates(0., 0., 1., 1.), ['a'])
+
+    def test_move_across_cells(self):
+        self.grid.update('a', np.array([[55., 55., 3.]]))
+        self.assertEqual(self.grid.candidates(0., 0., 9., 9.), [])
+        self.assertEqual(self.grid.candidates(50., 50., 51., 51.), ['a'])
+        self.assertEqual(len(self.grid), 3)
+
+    def test_empty_update(self):
+        self.grid.update([], np.empty((0, 3)))
+        self.assertEqual(len(self.grid), 3)
+
+
+class TestRemove(unittest.TestCase):
+
+    def setUp(self):
+        self.grid = SpotGrid(spacing=10.)
+        self.grid.update('ab', np.array([[1., 1.], [2., 2.]]))
+
+    def test_remove(self):
+        self.grid.remove('a')
+        self.assertEqual(self.grid.candidates(0., 0., 5., 5.), ['b'])
+
+    def test_remove_missing_ignored(self):
+        self.grid.remove('z')
+        self.assertEqual(len(self.grid), 2)
+
+    def test_empty_cells_dropped(self):
+        self.grid.remove('ab')
+        self.assertEqual(self.grid._cells, {})
+
+    def test_clear(self):
+        self.grid.clear()
+        self.assertEqual(len(self.grid), 0)
+
+
+class TestCandidates(unittest.TestCase):
+
+    def setUp(self):
+        self.grid = SpotGrid(spacing=10.)
+        xy = np.array([[5., 5.], [25., 5.], [5., 45.], [-15., -15.]])
+        self.grid.update('abcd', xy)
+
+    def test_single_cell(self):
+        self.assertEqual(self.grid.candidates(1., 1., 2., 2.), ['a'])
+
+    def test_cells_overlapping_rect(self):
+        found = self.grid.candidates(0., 0., 29., 9.)
+        self.assertEqual(sorted(found), ['a', 'b'])
+
+    def test_negative_coordinates(self):
+        self.assertEqual(self.grid.candidates(-11., -11., -10., -10.),
+                         ['d'])
+
+    def test_large_rect_scans_occupied_cells(self):
+        found = self.grid.candidates(-1e6, -1e6, 1e6, 1e6)
+        self.assertEqual(sorted(found), ['a', 'b', 'c', 'd'])
+
+    def test_empty_region(self):
+        self.assertEqual(self.grid.candidates(100., 100., 200., 200.), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,161 @@
+'''Unit tests for ThreadedCGH.'''
+import unittest
+import numpy as np
+from pyqtgraph.Qt import QtWidgets
+
+from QHOT.lib.holograms.CGH import CGH
+from QHOT.lib.holograms.ThreadedCGH import ThreadedCGH
+
+app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+
+class TestThreadedCGHInit(unittest.TestCase):
+
+    def test_is_cgh(self):
+        self.assertIsInstance(ThreadedCGH(shape=(32, 32)), CGH)
+
+    def test_workers_argument(self):
+        self.assertEqual(ThreadedCGH(shape=(32, 32), workers=3).workers, 3)
+
+    def test_default_workers(self):
+        self.assertGreaterEqual(ThreadedCGH(shape=(32, 32)).workers, 1)
+
+    def test_tiles_cover_rows(self):
+        cgh = ThreadedCGH(shape=(100, 40))
+        rows = np.arange(cgh.height)
+        covered = np.concatenate([rows[tile] for tile in cgh._tiles])
+        np.testing.assert_array_equal(covered, rows)
+
+    def test_tiles_follow_shape(self):
+        cgh = ThreadedCGH(shape=(32, 32))
+        cgh.shape = (200, 32)
+        self.assertEqual(cgh._tiles[-1].stop, 224)
+
+    def test_stop_shuts_down_pool(self):
+        cgh = ThreadedCGH(shape=(32, 32))
+        cgh.compute([])
+        pool = cgh._pool
+        cgh.stop()
+        self.assertIsNone(cgh._pool)
+        with self.assertRaises(RuntimeError):
+            pool.submit(print)
+
+    def test_compute_after_stop(self):
+        from QHOT.traps.QTweezer import QTweezer
+        traps = [QTweezer(r=(5., -3., 0.), phase=0.)]
+        cgh = ThreadedCGH(shape=(32, 32))
+        cgh.stop()
+        expected = ThreadedCGH(shape=(32, 32)).compute(traps)
+        np.testing.assert_array_equal(cgh.compute(traps), expected)
+        cgh.stop()
+
+
+class TestThreadedCompute(unittest.TestCase):
+
+    shape = (70, 96)
+
+    def setUp(self):
+        from QHOT.traps.QTweezer import QTweezer
+        from QHOT.traps.QVortex import QVortex
+        from QHOT.traps.QRingTrap import QRingTrap
+        rng = np.random.default_rng(5)
+        self.traps = [QTweezer(r=(x, y, z), phase=p)
+                      for x, y, z, p in rng.uniform(-50., 50., (12, 4))]
+        self.vortex = QVortex(r=(10., 20., 0.), phase=0., ell=3)
+        self.ring = QRingTrap(r=(-20., 5., 0.), phase=1.)
+        self.traps += [self.vortex, self.ring]
+        self.cgh = ThreadedCGH(shape=self.shape, workers=4)
+        self.cgh.tilerows = 16
+        self.cgh.updateGeometry()
+
+    def tearDown(self):
+        self.cgh.stop()
+
+    def reference(self, traps):
+        ref = CGH(shape=self.shape)
+        ref.incremental = False
+        return ref._accumulate(traps)
+
+    def assertMatchesReference(self, traps):
+        np.testing.assert_allclose(self.cgh._accumulate(traps),
+                                   self.reference(traps),
+                                   rtol=0, atol=1e-3)
+
+    def test_matches_cgh(self):
+        self.assertMatchesReference(self.traps)
+
+    def assertHologramMatchesReference(self, traps):
+        phase = self.cgh.compute(traps).astype(int)
+        expected = CGH.quantize(self.reference(traps)).astype(int)
+        difference = np.abs(phase - expected)
+        self.assertTrue(np.all((difference <= 1) | (difference == 255)))
+        self.assertLess(np.count_nonzero(difference), 0.01*phase.size)
+
+    def test_hologram_matches_cgh(self):
+        self.assertHologramMatchesReference(self.traps)
+
+    def test_updated_hologram_matches_cgh(self):
+        self.cgh.compute(self.traps)
+        self.traps[0].x = 30.
+        self.vortex.ell = 5
+        self.assertHologramMatchesReference(self.traps)
+        self.assertEqual(self.cgh._updates, 1)
+        self.assertHologramMatchesReference(self.traps[1:])
+
+    def test_accumulated_field_is_rendered(self):
+        self.cgh.compute(self.traps)
+        np.testing.assert_allclose(self.cgh._accumulator,
+                                   self.reference(self.traps),
+                                   rtol=0, atol=1e-3)
+
+    def test_unbatched_matches_cgh(self):
+        self.cgh.batched = False
+        self.assertMatchesReference(self.traps)
+
+    def group(self):
+        from QHOT.lib.traps.QTrapGroup import QTrapGroup
+        group = QTrapGroup(r=(0., 0., 0.))
+        for trap in self.traps[:4]:
+            trap.z = 0.
+        group.addTrap(self.traps[:4])
+        return group
+
+    def test_group_matches_cgh(self):
+        self.assertHologramMatchesReference(
+            [self.group()] + self.traps[4:])
+
+    def test_trap_array_matches_cgh(self):
+        from QHOT.traps.QTrapArray import QTrapArray
+        array = QTrapArray(r=(5., -5., 0.), shape=(3, 2), separation=12.)
+        self.assertHologramMatchesReference([array] + self.traps[4:])
+
+    def test_updated_group_matches_cgh(self):
+        traps = [self.group()] + self.traps[4:]
+        self.cgh.compute(traps)
+        self.traps[1].x = 25.
+        self.assertHologramMatchesReference(traps)
+        self.assertEqual(self.cgh._updates, 1)
+
+    def test_incremental_update_matches_cgh(self):
+        self.cgh.compute(self.traps)
+        self.traps[0].x = 30.
+        self.vortex.ell = 5
+        self.assertMatchesReference(self.traps)
+        self.assertEqual(self.cgh._updates, 1)
+
+    def test_removed_trap_is_subtracted(self):
+        self.cgh.compute(self.traps)
+        self.assertMatchesReference(self.traps[1:-1])
+
+    def test_emits_hologram_ready(self):
+        received = []
+        self.cgh.hologramReady.connect(received.append)
+        phase = self.cgh.compute(self.traps)
+        self.assertIs(received[0], phase)
+
+    def test_empty_gives_midpoint(self):
+        np.testing.assert_array_equal(self.cgh.compute([]), 127)
+
+
+if __name__ == '__main__':
+    unittest.main()
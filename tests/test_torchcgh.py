@@ -89,9 +89,25 @@ class TestTorchFieldOf(unittest.TestCase):
         result = self.cgh.fieldOf(self.trap)
         self.assertEqual(result.device.type, self.cgh.device.type)
 
-    def test_field_cache_is_tensor(self):
+    def test_field_cache_holds_device_vectors(self):
         self.cgh.fieldOf(self.trap)
-        self.assertIsInstance(self.cgh._field_cache[self.trap], torch.Tensor)
+        factor = self.cgh._field_cache[self.trap]
+        self.assertIsInstance(factor.ey, torch.Tensor)
+        self.assertIsInstance(factor.ex, torch.Tensor)
+        self.assertEqual(factor.ey.device.type, self.cgh.device.type)
+
+    def test_field_cache_vectors_own_memory(self):
+        self.cgh.ramp_cache_size = 0
+        self.cgh.fieldOf(self.trap)
+        factor = self.cgh._field_cache[self.trap]
+        self.assertIsNone(factor.ey._base)
+        self.assertIsNone(factor.ex._base)
+
+    def test_cached_ramps_own_memory(self):
+        self.cgh.fieldOf(self.trap)
+        factor = self.cgh._field_cache[self.trap]
+        self.assertIsNone(factor.ey._base)
+        self.assertIsNone(factor.ex._base)
 
     def test_result_is_cached(self):
         self.cgh.fieldOf(self.trap)
@@ -191,6 +207,59 @@ class TestTorchCompute(unittest.TestCase):
                            if c.args[0] is group]
             self.assertEqual(len(group_calls), 1)
 
+    def test_quantize_on_device_matches_cgh(self):
+        from QHOT.lib.holograms.CGH import CGH
+        rng = np.random.default_rng(4)
+        field = (rng.normal(size=self.cgh.shape) +
+                 1j*rng.normal(size=self.cgh.shape)).astype(np.complex64)
+        self.cgh._torch_field.copy_(torch.as_tensor(field))
+        out = torch.empty(self.cgh.shape, dtype=torch.uint8,
+                          device=self.cgh.device)
+        self.cgh._quantizeOnDevice(slice(None), out)
+        difference = np.abs(out.cpu().numpy().astype(int) -
+                            CGH.quantize(field).astype(int))
+        self.assertTrue(np.all((difference <= 1) | (difference == 255)))
+
+    def test_quantize_minus_pi_wraps(self):
+        self.cgh._torch_field.fill_(complex(-1., -0.))
+        out = torch.empty(self.cgh.shape, dtype=torch.uint8,
+                          device=self.cgh.device)
+        self.cgh._quantizeOnDevice(slice(0, 1), out[0:1])
+        self.assertEqual(int(out[0, 0]), 255)
+
+    def test_result_is_reused_host_buffer(self):
+        first = self.cgh.compute([self.trap])
+        second = self.cgh.compute([self.trap])
+        self.assertIsNot(first, second)
+        self.assertIs(self.cgh.compute([self.trap]), first)
+
+    def test_host_buffer_shares_tensor_memory(self):
+        phase = self.cgh.compute([self.trap])
+        self.assertEqual(phase.ctypes.data,
+                         self.cgh._hosts[0].data_ptr())
+
+    def test_timing_reports_transfer(self):
+        self.cgh.compute([self.trap])
+        timing = self.cgh.statistics['timing']
+        for stage in ('accumulate', 'quantize', 'transfer'):
+            self.assertIn(stage, timing)
+            self.assertGreaterEqual(timing[stage], 0.)
+
+    def test_cached_hologram_fills_host_buffer(self):
+        from QHOT.lib.holograms.HologramCache import HologramCache
+        self.cgh.hologramcache = HologramCache()
+        expected = self.cgh.compute([self.trap]).copy()
+        phase = self.cgh.compute([self.trap])
+        self.assertEqual(self.cgh.hologramcache.hits, 1)
+        self.assertEqual(phase.ctypes.data,
+                         self.cgh._hosts[0].data_ptr())
+        np.testing.assert_array_equal(phase, expected)
+
+    def test_bands_cover_rows(self):
+        rows = np.arange(self.cgh.height)
+        covered = np.concatenate([rows[b] for b in self.cgh._bands])
+        np.testing.assert_array_equal(covered, rows)
+
 
 @skip_no_torch
 class TestTorchBless(unittest.TestCase):
@@ -244,5 +313,195 @@ class TestTorchGeometryChange(unittest.TestCase):
         self.assertEqual(self.cgh._tiqy.shape[0], self.cgh.height)
 
 
+@skip_no_torch
+class TestTorchBatchedCompute(unittest.TestCase):
+
+    def setUp(self):
+        from QHOT.lib.holograms.CGH import CGH
+        from QHOT.lib.holograms.TorchCGH import TorchCGH
+        from QHOT.traps.QTweezer import QTweezer
+        self.cgh = TorchCGH(shape=(64, 96))
+        self.ref = CGH(shape=(64, 96))
+        rng = np.random.default_rng(2)
+        self.traps = [QTweezer(r=(x, y, z), phase=p)
+                      for x, y, z, p in rng.uniform(-50., 50., (20, 4))]
+
+    def test_batched_matches_cpu_reference(self):
+        expected = self.ref._accumulate(self.traps)
+        field = self.cgh._accumulate(self.traps).cpu().numpy()
+        np.testing.assert_allclose(field, expected, rtol=0, atol=1e-3)
+
+    def test_incremental_update_matches_cpu_reference(self):
+        self.cgh.compute(self.traps)
+        self.traps[0].x = 25.
+        field = self.cgh._accumulate(self.traps).cpu().numpy()
+        self.assertEqual(self.cgh._updates, 1)
+        expected = self.ref._accumulate(self.traps)
+        np.testing.assert_allclose(field, expected, rtol=0, atol=1e-3)
+
+    def test_batched_matches_unbatched(self):
+        self.cgh.incremental = False
+        self.cgh.batched = False
+        expected = self.cgh._accumulate(self.traps).cpu().numpy().copy()
+        self.cgh.batched = True
+        field = self.cgh._accumulate(self.traps).cpu().numpy()
+        np.testing.assert_allclose(field, expected, rtol=0, atol=1e-3)
+
+    def test_ramps_on_device(self):
+        r = np.zeros((len(self.traps), 3), dtype=np.float32)
+        ey, ex = self.cgh._ramps(r)
+        self.assertEqual(ey.device.type, self.cgh.device.type)
+        self.assertEqual(tuple(ex.shape), (len(self.traps), self.cgh.width))
+
+    def test_fieldof_matches_cpu_reference(self):
+        from QHOT.traps.QVortex import QVortex
+        trap = QVortex(r=(10., -20., 5.), phase=0.5, ell=4)
+        expected = self.ref.fieldOf(trap)
+        field = self.cgh.fieldOf(trap).cpu().numpy()
+        np.testing.assert_allclose(field, expected, rtol=0, atol=1e-4)
+
+
+@skip_no_torch
+class TestTorchStructures(unittest.TestCase):
+
+    def setUp(self):
+        from QHOT.lib.holograms.CGH import CGH
+        from QHOT.lib.holograms.TorchCGH import TorchCGH
+        self.cgh = TorchCGH(shape=(64, 96))
+        self.ref = CGH(shape=(64, 96))
+
+    def test_tables_built_lazily(self):
+        self.cgh.updateGeometry()
+        self.assertEqual(self.cgh._geometryTables(), {})
+        self.cgh.helical(2)
+        self.assertIn('phasor', self.cgh._geometryTables())
+
+    def test_tables_match_cpu_reference(self):
+        np.testing.assert_allclose(self.cgh.theta.cpu().numpy(),
+                                   self.ref.theta, atol=1e-6)
+        np.testing.assert_allclose(self.cgh.qr.cpu().numpy(),
+                                   self.ref.qr, rtol=1e-6)
+
+    def test_theta_on_device(self):
+        self.assertIsInstance(self.cgh.theta, torch.Tensor)
+        self.assertEqual(self.cgh.theta.device.type, self.cgh.device.type)
+
+    def test_qr_on_device(self):
+        self.assertIsInstance(self.cgh.qr, torch.Tensor)
+        self.assertEqual(tuple(self.cgh.qr.shape), self.cgh.shape)
+
+    def test_geometry_change_rebuilds_coordinates(self):
+        self.cgh.shape = (32, 48)
+        self.assertEqual(tuple(self.cgh.theta.shape), (32, 48))
+
+    def test_helical_matches_cpu_reference(self):
+        structure = self.cgh.helical(3).cpu().numpy()
+        np.testing.assert_allclose(structure, self.ref.helical(3),
+                                   rtol=0, atol=1e-5)
+
+    def test_helical_orders_match_cpu_reference(self):
+        for ell in (1, -1, -4, 2.5):
+            structure = self.cgh.helical(ell).cpu().numpy()
+            np.testing.assert_allclose(structure, self.ref.helical(ell),
+                                       rtol=0, atol=1e-5)
+
+    def test_helical_does_not_alias_phasor(self):
+        structure = self.cgh.helical(1)
+        structure *= 2.
+        np.testing.assert_allclose(self.cgh.helical(1).abs().cpu().numpy(),
+                                   1., rtol=1e-6)
+
+    def test_bessel_matches_cpu_reference(self):
+        for ell, radius in ((0., 10.), (3., 25.), (-7., 4.5)):
+            amplitude = self.cgh.bessel(ell, radius).cpu().numpy()
+            np.testing.assert_allclose(amplitude,
+                                       self.ref.bessel(ell, radius),
+                                       rtol=0, atol=1e-4)
+
+    def test_bessel_zero_radius(self):
+        amplitude = self.cgh.bessel(0., 0.).cpu().numpy()
+        np.testing.assert_allclose(amplitude, 1.)
+
+    def test_bessel_tabulates_far_fewer_points_than_pixels(self):
+        from unittest.mock import patch
+        import importlib
+        mod = importlib.import_module('QHOT.lib.holograms.CGH')
+        with patch.object(mod, 'jv', wraps=mod.jv) as mock_jv:
+            self.cgh.bessel(2., 10.)
+        samples = mock_jv.call_args.args[1]
+        self.assertLess(samples.size, self.cgh.height * self.cgh.width)
+
+    def test_vortex_structure_generated_on_device(self):
+        from QHOT.traps.QVortex import QVortex
+        structure = QVortex(ell=2).structure(self.cgh)
+        self.assertIsInstance(structure, torch.Tensor)
+        self.assertEqual(structure.device.type, self.cgh.device.type)
+
+    def test_ring_structure_matches_cpu_reference(self):
+        from QHOT.traps.QRingTrap import QRingTrap
+        trap = QRingTrap(r=(5., 5., 0.), radius=12., ell=3.)
+        structure = trap.structure(self.cgh)
+        self.assertIsInstance(structure, torch.Tensor)
+        np.testing.assert_allclose(structure.cpu().numpy(),
+                                   trap.structure(self.ref),
+                                   rtol=0, atol=1e-4)
+
+    def test_ring_fieldof_matches_cpu_reference(self):
+        from QHOT.traps.QRingTrap import QRingTrap
+        trap = QRingTrap(r=(10., -20., 0.), phase=0.5, radius=8., ell=2.)
+        field = self.cgh.fieldOf(trap).cpu().numpy()
+        np.testing.assert_allclose(field, self.ref.fieldOf(trap),
+                                   rtol=0, atol=1e-4)
+
+
+@skip_no_torch
+class TestTorchCacheBudget(unittest.TestCase):
+
+    def setUp(self):
+        from QHOT.lib.holograms.TorchCGH import TorchCGH
+        from QHOT.traps.QVortex import QVortex
+        self.cgh = TorchCGH(shape=(64, 64))
+        self.vortices = [QVortex(r=(n, 0., 0.), phase=0., ell=n)
+                         for n in range(4)]
+
+    def test_device_tensors_are_accounted(self):
+        self.cgh.fieldOf(self.vortices[0])
+        frame = 64 * 64 * 8
+        self.assertGreaterEqual(self.cgh._budget.nbytes, frame)
+
+    def test_device_cache_bounded_by_budget(self):
+        self.cgh.cachebudget = 2.5 * 64 * 64 * 8 / 2**20
+        for trap in self.vortices:
+            self.cgh.fieldOf(trap)
+        self.assertLessEqual(self.cgh._budget.nbytes,
+                             self.cgh._budget.limit)
+        self.assertGreater(self.cgh.statistics['structure_cache']
+                           ['evictions'], 0)
+
+
+
+@skip_no_torch
+class TestTorchComputeMany(unittest.TestCase):
+
+    def test_matches_sequential_compute(self):
+        from QHOT.lib.holograms.TorchCGH import TorchCGH
+        from QHOT.lib.traps.TrapSnapshot import TrapSnapshot
+        from QHOT.traps.QTweezer import QTweezer
+        from QHOT.traps.QVortex import QVortex
+        traps = [QTweezer(r=(3., 4., 0.), phase=0.),
+                 QTweezer(r=(-6., 1., 0.), phase=1.),
+                 QVortex(r=(-5., 2., 1.), ell=2, phase=0.)]
+        states = []
+        for t in range(4):
+            traps[0].x = 3. + t
+            states.append(TrapSnapshot.of(traps))
+        cgh = TorchCGH(shape=(32, 48))
+        expected = np.stack([cgh.compute(state).copy() for state in states])
+        holograms = TorchCGH(shape=(32, 48)).computeMany(states)
+        difference = np.abs(holograms.astype(int) - expected.astype(int))
+        self.assertLessEqual(np.minimum(difference, 256 - difference).max(),
+                             1)
+
+
 if __name__ == '__main__':
     unittest.main()
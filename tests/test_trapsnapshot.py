@@ -0,0 +1,243 @@
+'''Unit tests for TrapSnapshot.'''
+import unittest
+from unittest.mock import MagicMock
+
+import numpy as np
+from pyqtgraph.Qt import QtWidgets
+
+from QHOT.lib.traps.QTrap import QTrap
+from QHOT.lib.traps.QTrapGroup import QTrapGroup
+from QHOT.lib.traps.QTrapOverlay import QTrapOverlay
+from QHOT.lib.traps.TrapSnapshot import TrapSnapshot
+from QHOT.lib.traps.TrapStore import TrapStore
+from QHOT.traps.QTweezer import QTweezer
+from QHOT.traps.QVortex import QVortex
+
+
+app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+
+class SnapshotCase(unittest.TestCase):
+
+    def setUp(self):
+        self.a = QTweezer(r=(1., 0., 0.), amplitude=0.5, phase=1.)
+        self.b = QTweezer(r=(0., 2., 0.), phase=0.)
+        self.group = QTrapGroup(r=(0., 0., 0.))
+        self.group.addTrap([self.a, self.b])
+        self.vortex = QVortex(r=(5., 5., 1.), ell=3, phase=0.)
+
+
+class TestOf(SnapshotCase):
+
+    def test_records_state(self):
+        snapshot = TrapSnapshot.of([self.vortex])
+        record = snapshot.records[0]
+        np.testing.assert_array_equal(record['r'], [5., 5., 1.])
+        self.assertEqual(record['amplitude'], 1.)
+        self.assertIs(TrapStore.typeOf(record['kind']), QVortex)
+        self.assertTrue(record['leaf'])
+
+    def test_member_records_whole_group(self):
+        snapshot = TrapSnapshot.of([self.a])
+        self.assertEqual(snapshot.items, (self.group, self.a, self.b))
+
+    def test_group_recorded_once(self):
+        snapshot = TrapSnapshot.of([self.a, self.b, self.vortex])
+        self.assertEqual(len(snapshot), 4)
+        self.assertEqual(snapshot.topLevelItems, [self.group, self.vortex])
+
+    def test_parent_rows(self):
+        snapshot = TrapSnapshot.of([self.group])
+        np.testing.assert_array_equal(snapshot.records['parent'],
+                                      [-1, 0, 0])
+        self.assertFalse(snapshot.records['leaf'][0])
+
+    def test_nested_member_resolves_to_outer(self):
+        outer = QTrapGroup(r=(0., 0., 0.))
+        inner = QTrapGroup(r=(1., 0., 0.))
+        leaf = QTweezer(r=(2., 0., 0.), phase=0.)
+        inner.addTrap(leaf)
+        outer.addTrap(inner)
+        snapshot = TrapSnapshot.of([leaf])
+        self.assertEqual(snapshot.topLevelItems, [outer])
+        self.assertEqual(snapshot.children(inner), [leaf])
+
+    def test_structure_parameters(self):
+        snapshot = TrapSnapshot.of([self.vortex, self.a])
+        self.assertEqual(snapshot.structureOf(self.vortex), (3,))
+        self.assertIsNone(snapshot.structureOf(self.a))
+
+    def test_unstored_trap(self):
+        trap = MagicMock(spec=QTrap)
+        trap.r = np.array([1., 2., 3.])
+        trap.amplitude = 1.
+        trap.phase = 0.
+        snapshot = TrapSnapshot.of([trap])
+        np.testing.assert_array_equal(snapshot.positions, [[1., 2., 3.]])
+        self.assertEqual(snapshot.records['parent'][0], -1)
+
+    def test_empty(self):
+        snapshot = TrapSnapshot.of([])
+        self.assertEqual(len(snapshot), 0)
+        self.assertEqual(snapshot.topLevelItems, [])
+
+
+class TestImmutable(SnapshotCase):
+
+    def test_records_read_only(self):
+        snapshot = TrapSnapshot.of([self.vortex])
+        with self.assertRaises(ValueError):
+            snapshot.records['r'][0] = 0.
+
+    def test_later_changes_not_recorded(self):
+        snapshot = TrapSnapshot.of([self.group])
+        self.group.r = (10., 10., 0.)
+        self.a.amplitude = 2.
+        self.assertEqual(snapshot.state(self.a), (1., 0., 0., 0.5, 1.))
+
+    def test_equal_state_compares_equal(self):
+        other = QVortex(r=(5., 5., 1.), ell=3, phase=0.)
+        first = TrapSnapshot.of([self.vortex])
+        second = TrapSnapshot.of([other])
+        self.assertEqual(first, second)
+        self.assertEqual(hash(first), hash(second))
+
+    def test_different_state_compares_unequal(self):
+        first = TrapSnapshot.of([self.vortex])
+        self.vortex.ell = 4
+        self.assertNotEqual(first, TrapSnapshot.of([self.vortex]))
+
+    def test_usable_as_key(self):
+        holograms = {TrapSnapshot.of([self.vortex]): 'hologram'}
+        self.assertIn(TrapSnapshot.of([self.vortex]), holograms)
+
+    def test_repr(self):
+        self.assertEqual(repr(TrapSnapshot.of([self.group])),
+                         'TrapSnapshot(traps=3, leaves=2)')
+
+
+class TestCoefficients(SnapshotCase):
+
+    def test_leaf_coefficient(self):
+        snapshot = TrapSnapshot.of([self.a])
+        self.assertAlmostEqual(snapshot.coefficients[snapshot.row(self.a)],
+                               0.5 * np.exp(1j))
+
+    def test_group_coefficient_is_one(self):
+        self.group.amplitude = 2.
+        snapshot = TrapSnapshot.of([self.group])
+        self.assertEqual(snapshot.coefficients[0], 1.)
+
+
+class TestStructureOf(SnapshotCase):
+
+    def test_translation_keeps_group_structure(self):
+        before = TrapSnapshot.of([self.group]).structureOf(self.group)
+        self.group.r = (3.1, -7.3, 0.)
+        after = TrapSnapshot.of([self.group]).structureOf(self.group)
+        self.assertEqual(before, after)
+
+    def test_rotation_changes_group_structure(self):
+        before = TrapSnapshot.of([self.group]).structureOf(self.group)
+        self.group.rotate(0.5, self.group._snapshot())
+        after = TrapSnapshot.of([self.group]).structureOf(self.group)
+        self.assertNotEqual(before, after)
+
+    def test_member_amplitude_changes_group_structure(self):
+        before = TrapSnapshot.of([self.group]).structureOf(self.group)
+        self.b.amplitude = 0.25
+        after = TrapSnapshot.of([self.group]).structureOf(self.group)
+        self.assertNotEqual(before, after)
+
+    def test_descendants(self):
+        snapshot = TrapSnapshot.of([self.group])
+        np.testing.assert_array_equal(np.sort(snapshot.descendants(0)),
+                                      [1, 2])
+
+
+class TestChangedSince(SnapshotCase):
+
+    def setUp(self):
+        super().setUp()
+        self.items = [self.group, self.vortex]
+        self.before = TrapSnapshot.of(self.items)
+
+    def changed(self):
+        after = TrapSnapshot.of(self.items)
+        return dict(zip(after.items, after.changedSince(self.before)))
+
+    def test_unchanged(self):
+        self.assertFalse(any(self.changed().values()))
+
+    def test_moved_trap(self):
+        self.vortex.x = 7.
+        changed = self.changed()
+        self.assertTrue(changed[self.vortex])
+        self.assertFalse(changed[self.group])
+
+    def test_changed_phase(self):
+        self.a.phase = 2.
+        self.assertTrue(self.changed()[self.a])
+
+    def test_changed_parameters(self):
+        self.vortex.ell = 5
+        self.assertTrue(self.changed()[self.vortex])
+
+    def test_new_trap(self):
+        trap = QTweezer(r=(0., 0., 0.))
+        self.items.append(trap)
+        self.assertTrue(self.changed()[trap])
+
+    def test_empty_previous(self):
+        self.before = TrapSnapshot.of([])
+        self.assertTrue(all(self.changed().values()))
+
+
+class TestDigest(SnapshotCase):
+
+    def test_row_order_ignored(self):
+        self.assertEqual(TrapSnapshot.of([self.group, self.vortex]).digest,
+                         TrapSnapshot.of([self.vortex, self.group]).digest)
+
+    def test_groups_ignored(self):
+        loose = [QTweezer(r=(1., 0., 0.), amplitude=0.5, phase=1.),
+                 QTweezer(r=(0., 2., 0.), phase=0.)]
+        self.assertEqual(TrapSnapshot.of([self.group]).digest,
+                         TrapSnapshot.of(loose).digest)
+
+    def test_state_changes_digest(self):
+        digest = TrapSnapshot.of([self.vortex]).digest
+        self.vortex.phase = 0.5
+        self.assertNotEqual(TrapSnapshot.of([self.vortex]).digest, digest)
+
+    def test_empty(self):
+        self.assertIsInstance(TrapSnapshot.of([]).digest, str)
+
+
+class TestFromStore(unittest.TestCase):
+
+    def setUp(self):
+        self.overlay = QTrapOverlay()
+        self.traps = [QTweezer(r=(float(n), 0., 0.)) for n in range(3)]
+        self.overlay.addTrap(self.traps)
+
+    def test_records_every_trap(self):
+        snapshot = self.overlay.snapshot()
+        self.assertEqual(set(snapshot.items), set(self.traps))
+
+    def test_matches_of(self):
+        snapshot = self.overlay.snapshot()
+        self.assertEqual(snapshot, TrapSnapshot.of(snapshot.items))
+
+    def test_group_hierarchy(self):
+        group = QTrapGroup(r=(0., 0., 0.))
+        leaf = QTweezer(r=(1., 1., 0.))
+        group.addTrap(leaf)
+        self.overlay.addTrap(group)
+        snapshot = self.overlay.snapshot()
+        self.assertEqual(snapshot.children(group), [leaf])
+        self.assertIn(group, snapshot.topLevelItems)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,179 @@
+'''Unit tests for TrapStore.'''
+import unittest
+
+import numpy as np
+from pyqtgraph.Qt import QtWidgets
+
+from QHOT.lib.traps.QTrap import QTrap
+from QHOT.lib.traps.QTrapGroup import QTrapGroup
+from QHOT.lib.traps.TrapStore import TrapStore
+
+
+app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+
+class TestPrivateStore(unittest.TestCase):
+
+    def setUp(self):
+        self.trap = QTrap(r=(1., 2., 3.), amplitude=0.5, phase=0.25)
+
+    def test_trap_owns_private_store(self):
+        self.assertIsInstance(self.trap._store, TrapStore)
+        self.assertEqual(len(self.trap._store), 1)
+
+    def test_state_in_slot(self):
+        store, slot = self.trap._store, self.trap._slot
+        np.testing.assert_array_equal(store.r[slot], [1., 2., 3.])
+        self.assertEqual(store.amplitude[slot], 0.5)
+        self.assertEqual(store.phase[slot], 0.25)
+
+    def test_type_code(self):
+        store, slot = self.trap._store, self.trap._slot
+        self.assertIs(TrapStore.typeOf(store.kind[slot]), QTrap)
+
+    def test_setters_write_through(self):
+        self.trap.x = 7.
+        self.trap.amplitude = 2.
+        store, slot = self.trap._store, self.trap._slot
+        self.assertEqual(store.r[slot, 0], 7.)
+        self.assertEqual(store.amplitude[slot], 2.)
+
+    def test_amplitude_is_float(self):
+        self.assertIs(type(self.trap.amplitude), float)
+
+
+class TestGroupStore(unittest.TestCase):
+
+    def setUp(self):
+        self.a = QTrap(r=(1., 0., 0.))
+        self.b = QTrap(r=(0., 1., 0.))
+        self.group = QTrapGroup()
+        self.group.addTrap([self.a, self.b])
+
+    def test_children_share_group_store(self):
+        self.assertIs(self.a._store, self.group._store)
+        self.assertIs(self.b._store, self.group._store)
+
+    def test_parent_indices(self):
+        store = self.group._store
+        self.assertEqual(store.parent[self.a._slot], self.group._slot)
+        self.assertEqual(store.parent[self.group._slot], -1)
+
+    def test_leaf_flags(self):
+        store = self.group._store
+        self.assertTrue(store.leaf[self.a._slot])
+        self.assertFalse(store.leaf[self.group._slot])
+        self.assertEqual(sorted(store.leaves.tolist()),
+                         sorted([self.a._slot, self.b._slot]))
+
+    def test_positions_preserved(self):
+        np.testing.assert_array_equal(self.a.r, [1., 0., 0.])
+        np.testing.assert_array_equal(self.b.r, [0., 1., 0.])
+
+    def test_removed_trap_moves_to_private_store(self):
+        store = self.group._store
+        self.group.removeTrap(self.a)
+        self.assertIsNot(self.a._store, store)
+        self.assertEqual(len(store), 2)
+        np.testing.assert_array_equal(self.a.r, [1., 0., 0.])
+
+    def test_descendants(self):
+        inner = QTrapGroup()
+        c = QTrap()
+        inner.addTrap(c)
+        self.group.addTrap(inner)
+        store = self.group._store
+        found = store.descendants(self.group._slot).tolist()
+        self.assertEqual(sorted(found),
+                         sorted([self.a._slot, self.b._slot,
+                                 inner._slot, c._slot]))
+
+    def test_descendants_of_several_slots(self):
+        inner = QTrapGroup()
+        c = QTrap()
+        inner.addTrap(c)
+        other = QTrapGroup()
+        d = QTrap()
+        other.addTrap(d)
+        self.group.addTrap([inner, other])
+        store = self.group._store
+        found = store.descendants([inner._slot, other._slot]).tolist()
+        self.assertEqual(sorted(found), sorted([c._slot, d._slot]))
+
+    def test_constructor_parent(self):
+        c = QTrap(parent=self.group)
+        self.assertIs(c._store, self.group._store)
+
+    def test_roots(self):
+        store = self.group._store
+        self.assertEqual(store.root[self.a._slot], self.group._slot)
+        self.assertEqual(store.root[self.group._slot], self.group._slot)
+        self.assertIs(store.rootOf(self.b), self.group)
+
+    def test_roots_follow_reparenting(self):
+        outer = QTrapGroup()
+        outer.addTrap(self.group)
+        store = outer._store
+        self.assertIs(store.rootOf(self.a), outer)
+        self.assertIs(store.rootOf(self.group), outer)
+        self.group.setParent(None)
+        self.assertIs(self.group._store.rootOf(self.a), self.group)
+
+    def test_removed_trap_is_own_root(self):
+        self.group.removeTrap(self.a)
+        self.assertIs(self.a._store.rootOf(self.a), self.a)
+
+
+class TestAllocation(unittest.TestCase):
+
+    def test_grows(self):
+        store = TrapStore(2)
+        traps = [QTrap(r=(n, 0., 0.)) for n in range(5)]
+        for trap in traps:
+            store.adopt(trap)
+        self.assertGreaterEqual(store.capacity, 5)
+        np.testing.assert_array_equal(store.positions(traps)[:, 0],
+                                      np.arange(5))
+
+    def test_reuses_released_slots(self):
+        store = TrapStore(4)
+        trap = QTrap()
+        store.adopt(trap)
+        slot = trap._slot
+        trap.setParent(None)
+        other = QTrap()
+        store.adopt(other)
+        self.assertEqual(other._slot, slot)
+        self.assertIs(store.items[slot], other)
+
+    def test_release_clears_slot(self):
+        store = TrapStore(4)
+        trap = QTrap()
+        store.adopt(trap)
+        slot = trap._slot
+        trap.setParent(None)
+        self.assertEqual(store.kind[slot], -1)
+        self.assertIsNone(store.items[slot])
+        self.assertEqual(len(store.slots), 0)
+
+
+class TestGather(unittest.TestCase):
+
+    def test_shared_store(self):
+        group = QTrapGroup()
+        traps = [QTrap(r=(n, 2.*n, 0.)) for n in range(3)]
+        group.addTrap(traps)
+        r = TrapStore.gather(traps)
+        np.testing.assert_array_equal(r, [t.r for t in traps])
+
+    def test_mixed_stores(self):
+        traps = [QTrap(r=(n, 0., 1.)) for n in range(3)]
+        r = TrapStore.gather(traps)
+        np.testing.assert_array_equal(r, [t.r for t in traps])
+
+    def test_empty(self):
+        self.assertEqual(TrapStore.gather([]).shape, (0, 3))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,8 +4,6 @@ from QHOT.lib.traps.QTrap import QTrap
 from QHOT.lib.letterSymbol import letterSymbol
 from pyqtgraph.Qt import QtCore
 from typing import TYPE_CHECKING
-import numpy as np
-from scipy.special import jv
 
 if TYPE_CHECKING:
     from QHOT.lib.holograms.CGH import CGH
@@ -77,22 +75,53 @@ class QRingTrap(QTrap):
         self._ell = float(ell)
         self.structureChanged.emit()
 
+    def structureKey(self) -> tuple[float, float]:
+        '''Return the parameters that determine the structure field.
+
+        Ring traps with equal keys share one cached structure field.
+        '''
+        return (self.radius, self.ell)
+
+    @classmethod
+    def structureFrom(cls, cgh: CGH,
+                      parameters: tuple[float, float]) -> Field:
+        '''Compute the ring structure for given parameters.
+
+        ``CGH`` builds structures from the parameters recorded in a
+        trap snapshot, so a hologram reflects the radius and charge at
+        the time of the snapshot even if they have been edited since.
+
+        Parameters
+        ----------
+        cgh : CGH
+            The hologram engine.  The mask is generated by
+            ``cgh.bessel`` and ``cgh.helical`` in the backend's own
+            array type.
+        parameters : tuple[float, float]
+            ``(radius, ell)``, as returned by ``structureKey``.
+
+        Returns
+        -------
+        Field
+            Complex structure mask of shape ``cgh.shape``.
+        '''
+        radius, ell = parameters
+        return cgh.bessel(ell, radius) * cgh.helical(ell)
+
     def structure(self, cgh: CGH) -> Field:
         '''Compute the Bessel-function amplitude and helical phase structure.
 
         Parameters
         ----------
         cgh : CGH
-            The hologram engine providing the radial coordinate array
-            ``qr`` and angular coordinate array ``theta``.
+            The hologram engine.
 
         Returns
         -------
         Field
             Complex structure mask of shape ``cgh.shape``.
         '''
-        return (jv(self.ell, self.radius * cgh.qr)
-                * np.exp(1j * self.ell * cgh.theta))
+        return self.structureFrom(cgh, self.structureKey())
 
 
 if __name__ == '__main__':  # pragma: no cover
@@ -4,7 +4,6 @@ from QHOT.lib.traps.QTrap import QTrap
 from QHOT.lib.letterSymbol import letterSymbol
 from pyqtgraph.Qt import QtCore
 from typing import TYPE_CHECKING
-import numpy as np
 
 if TYPE_CHECKING:
     from QHOT.lib.holograms.CGH import CGH
@@ -58,21 +57,51 @@ class QVortex(QTrap):
         self._ell = int(ell)
         self.structureChanged.emit()
 
+    def structureKey(self) -> tuple[int]:
+        '''Return the parameters that determine the structure field.
+
+        Vortices with equal keys share one cached structure field.
+        '''
+        return (self.ell,)
+
+    @classmethod
+    def structureFrom(cls, cgh: CGH, parameters: tuple[int]) -> Field:
+        '''Compute the helical phase structure for given parameters.
+
+        ``CGH`` builds structures from the parameters recorded in a
+        trap snapshot, so a hologram reflects the charge at the time
+        of the snapshot even if it has been edited since.
+
+        Parameters
+        ----------
+        cgh : CGH
+            The hologram engine.  The mask is generated by
+            ``cgh.helical`` in the backend's own array type.
+        parameters : tuple[int]
+            ``(ell,)``, as returned by ``structureKey``.
+
+        Returns
+        -------
+        Field
+            Complex phase mask of shape ``cgh.shape``.
+        '''
+        ell, = parameters
+        return cgh.helical(ell)
+
     def structure(self, cgh: CGH) -> Field:
         '''Compute the helical phase structure ``exp(i ell θ)``.
 
         Parameters
         ----------
         cgh : CGH
-            The hologram engine providing the angular coordinate
-            array ``theta``.
+            The hologram engine.
 
         Returns
         -------
         Field
             Complex phase mask of shape ``cgh.shape``.
         '''
-        return np.exp(1j * self.ell * cgh.theta)
+        return self.structureFrom(cgh, self.structureKey())
 
 
 if __name__ == '__main__':  # pragma: no cover